@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from google.protobuf.internal import api_implementation
+from pslx.schema.snapshots_pb2 import NodeSnapshot
+from pslx.schema.storage_pb2 import ProtoTable
+from pslx.util.file_util import FileUtil
+from pslx.util.proto_util import ProtoUtil
+
+
+def build_table_file(file_name, num_entries):
+    table = ProtoTable()
+    for index in range(num_entries):
+        value = NodeSnapshot()
+        value.node_name = 'node_' + str(index)
+        for child_index in range(10):
+            value.children_names.append('/LOCAL/pslx/benchmark/child_' + str(index) + '_' + str(child_index))
+        table.data[str(index)].CopyFrom(ProtoUtil.message_to_any(message=value))
+    with open(file_name, 'wb') as outfile:
+        outfile.write(table.SerializeToString())
+
+
+def load_with_bytes_copy(file_name):
+    with open(file_name, 'rb') as infile:
+        data = infile.read()
+    table = ProtoTable()
+    table.ParseFromString(data)
+    return table
+
+
+def load_with_mmap(file_name):
+    return FileUtil.read_proto_from_local_file(proto_type=ProtoTable, local_file_name=file_name)
+
+
+def load_with_file_util(file_name):
+    return FileUtil.read_proto_from_file(proto_type=ProtoTable, file_name=file_name)
+
+
+def run_once(load_function, file_name, num_repeats, result_queue):
+    start_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_time = time.time()
+    num_loaded = len(load_function(file_name).data)
+    latencies = [time.time() - start_time]
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for _ in range(num_repeats - 1):
+        start_time = time.time()
+        load_function(file_name)
+        latencies.append(time.time() - start_time)
+    result_queue.put((num_loaded, statistics.median(latencies), peak_rss - start_rss))
+
+
+def benchmark(load_function, file_name, num_repeats):
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=run_once, args=(load_function, file_name, num_repeats, result_queue))
+    process.start()
+    result = result_queue.get()
+    process.join()
+    return result
+
+
+if __name__ == "__main__":
+    num_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    num_repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table_file = os.path.join(tmp_dir, 'data.pb')
+        build_table_file(file_name=table_file, num_entries=num_entries)
+        print('File size: ' + str(os.path.getsize(table_file) // 1024) + ' KB with ' + str(num_entries) + ' entries.')
+        print('Protobuf backend: ' + api_implementation.Type() + ', memory map in read_proto_from_file: ' +
+              str(FileUtil.is_mmap_read_enabled()) + '.')
+        for name, function in [('bytes copy', load_with_bytes_copy), ('mmap', load_with_mmap),
+                               ('read_proto_from_file', load_with_file_util)]:
+            num_loaded, latency, peak_rss_delta = benchmark(
+                load_function=function,
+                file_name=table_file,
+                num_repeats=num_repeats
+            )
+            print(name + ': loaded ' + str(num_loaded) + ' entries in ' + '%.3f' % latency + ' seconds (median of ' +
+                  str(num_repeats) + '), peak RSS increase ' + str(peak_rss_delta) + ' KB.')
@@ -0,0 +1,72 @@
+import statistics
+import sys
+import time
+import numpy as np
+from google.protobuf.internal import api_implementation
+from pslx.schema.enums_pb2 import Status
+from pslx.schema.snapshots_pb2 import OperatorSnapshot
+from pslx.util.proto_util import ProtoUtil
+
+
+def build_any_messages(num_entries):
+    any_messages = {}
+    for index in range(num_entries):
+        value = OperatorSnapshot()
+        value.operator_name = 'operator_' + str(index)
+        if index % 2 == 0:
+            value.status = Status.SUCCEEDED
+            value.start_time = str(index)
+        value.node_snapshot.node_name = 'node_' + str(index)
+        value.node_snapshot.children_names.append('child_' + str(index))
+        any_messages[str(index)] = ProtoUtil.message_to_any(message=value)
+    return any_messages
+
+
+def to_columns_with_getattr(message_type, any_messages, fields):
+    messages = []
+    for any_message in any_messages.values():
+        proto_message = message_type()
+        proto_message.ParseFromString(any_message.value)
+        messages.append(proto_message)
+    columns = {'key': np.array(list(any_messages.keys()), dtype=object)}
+    for field in fields:
+        dtype = ProtoUtil.get_column_dtype(field_descriptor=message_type.DESCRIPTOR.fields_by_name[field])
+        if dtype is not object:
+            columns[field] = np.fromiter((getattr(message, field) for message in messages), dtype=dtype,
+                                         count=len(messages))
+            continue
+        column = np.empty(len(messages), dtype=object)
+        for index, message in enumerate(messages):
+            column[index] = getattr(message, field)
+        columns[field] = column
+    return columns
+
+
+def to_columns_with_proto_util(message_type, any_messages, fields):
+    return ProtoUtil.any_messages_to_columns(message_type=message_type, any_messages=any_messages, fields=fields)
+
+
+def benchmark(to_columns_function, any_messages, fields, num_repeats):
+    latencies = []
+    for _ in range(num_repeats):
+        start_time = time.time()
+        to_columns_function(OperatorSnapshot, any_messages, fields)
+        latencies.append(time.time() - start_time)
+    return statistics.median(latencies)
+
+
+if __name__ == "__main__":
+    num_entries = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    num_repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    any_messages = build_any_messages(num_entries=num_entries)
+    print('Protobuf backend: ' + api_implementation.Type() + ', ' + str(num_entries) + ' entries.')
+    for fields in [[field.name for field in OperatorSnapshot.DESCRIPTOR.fields], ['operator_name', 'status']]:
+        for name, function in [('getattr per row', to_columns_with_getattr),
+                               ('any_messages_to_columns', to_columns_with_proto_util)]:
+            latency = benchmark(
+                to_columns_function=function,
+                any_messages=any_messages,
+                fields=fields,
+                num_repeats=num_repeats
+            )
+            print(name + ' (' + str(len(fields)) + ' fields): ' + str(round(latency, 3)) + ' s')
@@ -0,0 +1,36 @@
+import sys
+import time
+from pslx.core.node_base import OrderedNodeBase
+from pslx.core.tree_base import TreeBase
+
+
+def build_tree(num_children, num_grandchildren):
+    root_node = OrderedNodeBase(node_name='root')
+    tree = TreeBase(root=root_node)
+    for i in range(num_children):
+        child_node = OrderedNodeBase(node_name='child_' + str(i))
+        tree.add_node(parent_node=root_node, child_node=child_node)
+        for j in range(num_grandchildren):
+            grandchild_node = OrderedNodeBase(node_name='child_' + str(i) + '_' + str(j))
+            tree.add_node(parent_node=child_node, child_node=grandchild_node)
+    return tree
+
+
+if __name__ == "__main__":
+    num_children = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    num_grandchildren = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    num_rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    start_time = time.time()
+    tree = build_tree(num_children=num_children, num_grandchildren=num_grandchildren)
+    print('Built a tree of ' + str(tree.get_num_nodes()) + ' nodes in ' + '%.3f' % (time.time() - start_time) +
+          ' seconds.')
+
+    start_time = time.time()
+    for _ in range(num_rounds):
+        tree.trim_tree(max_capacity=tree.get_num_nodes())
+        tree.get_num_nodes()
+        tree.get_leftmost_leaf()
+        tree.get_rightmost_leaf()
+    print(str(num_rounds) + ' rounds of trim_tree, get_num_nodes and leaf lookups took ' +
+          '%.3f' % (time.time() - start_time) + ' seconds.')
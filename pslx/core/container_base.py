@@ -7,6 +7,7 @@ from pslx.core.graph_base import GraphBase
 import pslx.core.exception as exception
 from pslx.core.operator_base import OperatorBase
 from pslx.micro_service.container_backend.client import ContainerBackendRPCClient
+from pslx.schema.enums_pb2 import CompressionType
 from pslx.schema.enums_pb2 import DataModelType
 from pslx.schema.enums_pb2 import Signal
 from pslx.schema.enums_pb2 import Status
@@ -160,10 +161,18 @@ class ContainerBase(GraphBase):
 
         FileUtil.write_proto_to_file(
             proto=snapshot,
-            file_name=output_file_name
+            file_name=output_file_name,
+            compression_type=ProtoUtil.get_value_by_name(
+                enum_type=CompressionType,
+                name=EnvUtil.get_pslx_env_variable(var='PSLX_SNAPSHOT_COMPRESSION_TYPE')
+            )
         )
         if self._max_num_snapshot > 0:
-            all_files = sorted(FileUtil.list_files_in_dir(FileUtil.dir_name(output_file_name)))
+            snapshot_prefix = self._container_name + '_SNAPSHOT_'
+            all_files = sorted(
+                file_name for file_name in FileUtil.list_files_in_dir(FileUtil.dir_name(output_file_name))
+                if FileUtil.base_name(file_name).startswith(snapshot_prefix) and file_name.endswith('.pb')
+            )
             for file_name in all_files[:-(self._max_num_snapshot-1)]:
                 FileUtil.remove_file(file_name)
 
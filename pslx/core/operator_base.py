@@ -3,8 +3,9 @@ from galaxy_py import glogging
 from pslx.core.base import DummyLogger
 from pslx.core.exception import OperatorFailureException, FileNotExistException
 from pslx.core.node_base import OrderedNodeBase
-from pslx.schema.enums_pb2 import DataModelType, Status, Signal
+from pslx.schema.enums_pb2 import CompressionType, DataModelType, Status, Signal
 from pslx.schema.snapshots_pb2 import OperatorSnapshot, OperatorContentPlain
+from pslx.util.env_util import EnvUtil
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 from pslx.util.timezone_util import TimezoneUtil, TimeSleepObj
@@ -187,7 +188,11 @@ class OperatorBase(OrderedNodeBase):
 
             FileUtil.write_proto_to_file(
                 proto=snapshot,
-                file_name=output_file
+                file_name=output_file,
+                compression_type=ProtoUtil.get_value_by_name(
+                    enum_type=CompressionType,
+                    name=EnvUtil.get_pslx_env_variable(var='PSLX_SNAPSHOT_COMPRESSION_TYPE')
+                )
             )
         return snapshot
 
@@ -12,6 +12,10 @@ class TreeBase(Base):
             {root.get_node_name(): root}
         )
         self._max_dict_size = max_dict_size
+        self._node_name_to_subtree_size_dict = {}
+        self._leftmost_leaf = None
+        self._rightmost_leaf = None
+        self._count_subtree(node=root)
 
     def get_root_node(self):
         return self._root
@@ -22,11 +26,54 @@ class TreeBase(Base):
     def set_root_node(self, root):
         for child in self._root.get_children_nodes():
             root.add_child(child)
-            self._root.delete(child)
+            self._root.delete_child(child)
 
         self._root = root
+        self._node_name_to_subtree_size_dict = {}
+        self._count_subtree(node=root)
+        self._reset_leaves()
         return
 
+    def _count_subtree(self, node):
+        if node.get_num_children() == 0:
+            self._node_name_to_subtree_size_dict[node.get_node_name()] = 1
+            return 1
+        search_stack, postorder_nodes = [node], []
+        while search_stack:
+            search_node = search_stack.pop()
+            postorder_nodes.append(search_node)
+            search_stack.extend(search_node.get_children_nodes())
+        for search_node in postorder_nodes[::-1]:
+            self._node_name_to_subtree_size_dict[search_node.get_node_name()] = 1 + sum(
+                self._node_name_to_subtree_size_dict[child_node.get_node_name()]
+                for child_node in search_node.get_children_nodes()
+            )
+        return self._node_name_to_subtree_size_dict[node.get_node_name()]
+
+    def _update_ancestors_subtree_size(self, node, delta):
+        while node is not None:
+            node_name = node.get_node_name()
+            if node_name not in self._node_name_to_subtree_size_dict:
+                self._count_subtree(node=self._root)
+                return
+            self._node_name_to_subtree_size_dict[node_name] += delta
+            node = next(iter(node.get_parents().values()), None)
+
+    def _reset_leaves(self):
+        self._leftmost_leaf, self._rightmost_leaf = None, None
+
+    def _delete_node(self, parent_node, child_node):
+        num_nodes = self.get_num_nodes_subtree(node=child_node)
+        child_node.delete_parent(parent_node=parent_node)
+        self._update_ancestors_subtree_size(node=parent_node, delta=-num_nodes)
+        search_stack = [child_node]
+        while search_stack:
+            search_node = search_stack.pop()
+            self._node_name_to_subtree_size_dict.pop(search_node.get_node_name(), None)
+            self._node_name_to_node_dict.pop(search_node.get_node_name(), None)
+            search_stack.extend(search_node.get_children_nodes())
+        self._reset_leaves()
+
     def add_node(self, parent_node, child_node, order=SortOrder.ORDER):
         self._SYS_LOGGER.info(
             "Adding parent node [" + parent_node.get_node_name() + "] to " + child_node.get_node_name() + '.')
@@ -34,7 +81,12 @@ class TreeBase(Base):
         if parent_node != self._root:
             assert parent_node.get_num_parents() != 0
 
+        existing_child_node = parent_node.get_child(child_name=child_node.get_node_name())
+        if existing_child_node is not None:
+            self._delete_node(parent_node=parent_node, child_node=existing_child_node)
         parent_node.add_child(child_node, order=order)
+        self._update_ancestors_subtree_size(node=parent_node, delta=self._count_subtree(node=child_node))
+        self._reset_leaves()
         if parent_node.get_node_name() in self._node_name_to_node_dict:
             self._SYS_LOGGER.info(
                 parent_node.get_node_name() + " already exists.")
@@ -55,6 +107,11 @@ class TreeBase(Base):
 
         self._clean_dict()
 
+    def delete_node(self, node):
+        assert node != self._root
+        for parent_node in node.get_parents_nodes():
+            self._delete_node(parent_node=parent_node, child_node=node)
+
     def _clean_dict(self):
         while len(self._node_name_to_node_dict) > self._max_dict_size > 0:
             self._node_name_to_node_dict.popitem(last=False)
@@ -79,6 +136,8 @@ class TreeBase(Base):
         return self.get_num_nodes_subtree(node=self._root)
 
     def get_num_nodes_subtree(self, node):
+        if node.get_node_name() in self._node_name_to_subtree_size_dict:
+            return self._node_name_to_subtree_size_dict[node.get_node_name()]
         if node.get_num_children() == 0:
             return 1
         else:
@@ -133,7 +192,7 @@ class TreeBase(Base):
         if max_capacity < 1 + node.get_num_children():
             num_children_to_trim = 1 + node.get_num_children() - max_capacity
             for child_node in node.get_children_nodes()[::-1][:num_children_to_trim]:
-                child_node.delete_parent(parent_node=node)
+                self._delete_node(parent_node=node, child_node=child_node)
             return
         else:
             children_nodes = node.get_children_nodes()
@@ -153,8 +212,7 @@ class TreeBase(Base):
 
             for index in range(len(children_nodes) - 1, pivot_index, -1):
                 child_node = children_nodes[index]
-                child_node.delete_parent(parent_node=node)
-                self._node_name_to_node_dict.pop(child_node.get_node_name(), None)
+                self._delete_node(parent_node=node, child_node=child_node)
             return
 
     def _trim_tree_from_left(self, node, max_capacity=-1):
@@ -170,7 +228,7 @@ class TreeBase(Base):
         if max_capacity < 1 + node.get_num_children():
             num_children_to_trim = 1 + node.get_num_children() - max_capacity
             for child_node in node.get_children_nodes()[:num_children_to_trim]:
-                child_node.delete_parent(parent_node=node)
+                self._delete_node(parent_node=node, child_node=child_node)
             return
         else:
             children_nodes = node.get_children_nodes()
@@ -190,8 +248,7 @@ class TreeBase(Base):
 
             for index in range(pivot_index):
                 child_node = children_nodes[index]
-                child_node.delete_parent(parent_node=node)
-                self._node_name_to_node_dict.pop(child_node.get_node_name(), None)
+                self._delete_node(parent_node=node, child_node=child_node)
             return
 
     def trim_tree(self, max_capacity=-1, from_right=True):
@@ -223,16 +280,20 @@ class TreeBase(Base):
         return leaf_node_names
 
     def get_rightmost_leaf(self):
-        node = self._root
-        while node.get_num_children() > 0:
-            node = node.get_children_nodes()[-1]
-        return node.get_node_name()
+        if self._rightmost_leaf is None:
+            node = self._root
+            while node.get_num_children() > 0:
+                node = next(reversed(node.get_children().values()))
+            self._rightmost_leaf = node
+        return self._rightmost_leaf.get_node_name()
 
     def get_leftmost_leaf(self):
-        node = self._root
-        while node.get_num_children() > 0:
-            node = node.get_children_nodes()[0]
-        return node.get_node_name()
+        if self._leftmost_leaf is None:
+            node = self._root
+            while node.get_num_children() > 0:
+                node = next(iter(node.get_children().values()))
+            self._leftmost_leaf = node
+        return self._leftmost_leaf.get_node_name()
 
     def get_height(self):
         node = self._root
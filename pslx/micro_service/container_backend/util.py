@@ -1,5 +1,6 @@
 from pslx.schema.storage_pb2 import ContainerBackendValue
 from pslx.storage.proto_table_storage import ProtoTableStorage
+from pslx.tool.file_lock_tool import FileLockTool
 from pslx.util.env_util import EnvUtil
 from pslx.util.file_util import FileUtil
 from pslx.util.timezone_util import TimezoneUtil
@@ -49,16 +50,21 @@ class ContainerBackendUtil(object):
                     key=backend_folder,
                     value=storage
                 )
-        all_data = storage.read_all()
-        if len(all_data) >= int(EnvUtil.get_pslx_env_variable('PSLX_INTERNAL_CACHE')) > 0:
-            key_to_delete = sorted(all_data.keys())[0]
-            storage.delete(key=key_to_delete)
+        with storage.batch():
+            if storage.get_num_entries() >= int(EnvUtil.get_pslx_env_variable('PSLX_INTERNAL_CACHE')) > 0:
+                storage.delete(key=storage.get_min_key())
 
-        storage.write(
-            data={storage_value.start_time: storage_value}
-        )
+            storage.write(
+                data={storage_value.start_time: storage_value}
+            )
 
         if max_num_snapshot > 0:
-            all_files = sorted(FileUtil.list_files_in_dir(backend_folder))
+            # Only the tables are counted, and the log, index and lock files of a removed table are removed with it.
+            all_files = sorted(file_name for file_name in FileUtil.list_files_in_dir(backend_folder)
+                               if file_name.endswith('.pb'))
             for file_name in all_files[:-(max_num_snapshot-1)]:
                 FileUtil.remove_file(file_name)
+                for suffix in [ProtoTableStorage.LOG_FILE_SUFFIX, ProtoTableStorage.INDEX_FILE_SUFFIX,
+                               FileLockTool.LOCK_FILE_SUFFIX]:
+                    if FileUtil.does_file_exist(file_name + suffix):
+                        FileUtil.remove_file(file_name + suffix)
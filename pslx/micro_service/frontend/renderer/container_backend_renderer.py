@@ -40,14 +40,14 @@ def get_containers_info():
         storage.initialize_from_file(
             file_name=proto_file
         )
-        raw_data = storage.read_all()
-        if not raw_data:
+        key = storage.get_max_key()
+        if key is None:
             continue
-        key = sorted(raw_data.keys())[-1]
-        val = raw_data[key]
-        result_proto = ProtoUtil.any_to_message(
-            message_type=ContainerBackendValue,
-            any_message=val
+        result_proto = storage.read(
+            params={
+                'key': key,
+                'message_type': ContainerBackendValue,
+            }
         )
         ttl = result_proto.ttl
 
@@ -95,13 +95,15 @@ def get_container_info(container_name, cell_name, start_time):
             base_name=container_name + '.pb'
         )
     )
-    raw_data = storage.read_all()
+    past_run_data = storage.read_range(
+        params={
+            'limit': 11,
+            'reverse': True,
+            'message_type': ContainerBackendValue,
+        }
+    )
     all_past_run = []
-    for key in sorted(list(raw_data.keys()), reverse=True):
-        val = ProtoUtil.any_to_message(
-            message_type=ContainerBackendValue,
-            any_message=raw_data[key]
-        )
+    for val in past_run_data.values():
         all_past_run.append(
             {
                 'start_time': val.start_time,
@@ -113,14 +115,13 @@ def get_container_info(container_name, cell_name, start_time):
                 'snapshot_cell': val.snapshot_cell,
             }
         )
-        if len(all_past_run) > 10:
-            break
 
-    key = start_time if start_time else sorted(raw_data.keys())[-1]
-    val = raw_data[key]
-    result_proto = ProtoUtil.any_to_message(
-        message_type=ContainerBackendValue,
-        any_message=val
+    key = start_time if start_time else storage.get_max_key()
+    result_proto = storage.read(
+        params={
+            'key': key,
+            'message_type': ContainerBackendValue,
+        }
     )
     container_info['log_file'] = galaxy_viewer_url + result_proto.log_file
     container_info['start_time'] = result_proto.start_time
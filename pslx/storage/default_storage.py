@@ -1,14 +1,23 @@
+import atexit
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
 from galaxy_py import gclient_ext, gclient
 from pslx.core.exception import StoragePastLineException, StorageReadException, StorageWriteException
 from pslx.schema.enums_pb2 import StorageType, ReadRuleType, WriteRuleType
 from pslx.schema.enums_pb2 import ModeType
 from pslx.storage.storage_base import StorageBase
+from pslx.tool.file_lock_tool import FileLockTool
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
 class DefaultStorage(StorageBase):
     STORAGE_TYPE = StorageType.DEFAULT_STORAGE
+    BLOCK_SIZE = 65536
+    PREPEND_FILE_SUFFIX = '.prepend'
 
     def __init__(self, logger=None):
         super().__init__(logger=logger)
@@ -16,8 +25,19 @@ class DefaultStorage(StorageBase):
         self._config = {
             'read_rule_type': ReadRuleType.READ_FROM_BEGINNING,
             'write_rule_type': WriteRuleType.WRITE_FROM_END,
+            'file_lock': False,
+            'durable': False,
         }
         self._last_read_line = 0
+        self._file_handle = None
+        self._line_state = None
+        self._legacy_size = None
+        self._is_legacy_size_checked = False
+        self._batch_config = None
+        self._batch_lock = threading.RLock()
+        self._flush_thread = None
+        self._flush_stop_event = threading.Event()
+        self._reset_pending_lines()
 
     def initialize_from_dir(self, dir_name):
         self._SYS_LOGGER.fatal("Initialize_from_dir function is not implemented for storage type "
@@ -29,14 +49,20 @@ class DefaultStorage(StorageBase):
     def initialize_from_file(self, file_name):
         self._SYS_LOGGER.info("Initialize from file " + file_name + '.')
         self._logger.info("Initialize from file " + file_name + '.')
+        if self._num_pending_lines > 0:
+            self.flush()
         self._file_name = FileUtil.normalize_file_name(file_name=file_name)
         self._last_read_line = 0
+        self._legacy_size = None
+        self._is_legacy_size_checked = False
+        self._close_file_handle()
 
     def get_file_name(self):
         return self._file_name
 
     def set_config(self, config):
         super().set_config(config=config)
+        self._close_file_handle()
         if 'override_to_prod' in self._config and self._file_name:
             self._file_name = self._file_name.replace(
                 ProtoUtil.get_name_by_value(enum_type=ModeType, value=ModeType.TEST),
@@ -50,6 +76,293 @@ class DefaultStorage(StorageBase):
 
     def start_from_first_line(self):
         self._last_read_line = 0
+        self._close_file_handle()
+
+    def _close_file_handle(self):
+        if self._file_handle:
+            self._file_handle.close()
+        self._file_handle = None
+        self._line_state = None
+
+    def _is_read_from_end(self):
+        return 'read_rule_type' in self._config and self._config['read_rule_type'] == ReadRuleType.READ_FROM_END
+
+    def _get_local_file_name(self):
+        return FileUtil.get_local_path(path=self._file_name, must_exist=True) if self._file_name else ''
+
+    def _load_legacy_size(self, local_file_name=''):
+        try:
+            if local_file_name:
+                if not os.path.isfile(local_file_name + self.PREPEND_FILE_SUFFIX):
+                    return None
+                with open(local_file_name + self.PREPEND_FILE_SUFFIX, 'r') as infile:
+                    return json.load(infile)['legacy_size']
+            self.increment_rpc_count_by(n=1)
+            prepend_info = FileUtil.read_json_from_file(file_name=self._file_name + self.PREPEND_FILE_SUFFIX)
+            return prepend_info.get('legacy_size', None)
+        except Exception as _:
+            return None
+
+    @classmethod
+    def get_logical_lines(cls, data, legacy_size=None):
+        # The lines appended after the legacy prefix of a file written from the beginning are ordered from the
+        # newest and placed before the prefix, and the trailing empty lines are removed the same as for a plain file.
+        if legacy_size is not None:
+            data = data.encode('utf-8')
+            appended_lines = data[legacy_size:].split(b'\n')
+            if not appended_lines[-1]:
+                appended_lines.pop()
+            data = b''.join([line + b'\n' for line in appended_lines[::-1]] + [data[:legacy_size]]).decode('utf-8')
+        return data.rstrip().split('\n')
+
+    @classmethod
+    def _count_lines(cls, file_handle, start, end):
+        num_line, offset, line_offset = 0, start, start
+        file_handle.seek(start)
+        while offset < end:
+            block = file_handle.read(min(cls.BLOCK_SIZE, end - offset))
+            if not block:
+                break
+            index = block.rfind(b'\n')
+            if index >= 0:
+                num_line += block.count(b'\n')
+                line_offset = offset + index + 1
+            offset += len(block)
+        return num_line, line_offset
+
+    @classmethod
+    def _skip_lines_forward(cls, file_handle, offset, num_line):
+        file_handle.seek(offset)
+        while num_line > 0:
+            block = file_handle.read(cls.BLOCK_SIZE)
+            if not block:
+                break
+            index = -1
+            while num_line > 0:
+                index = block.find(b'\n', index + 1)
+                if index < 0:
+                    break
+                num_line -= 1
+            if num_line == 0:
+                return offset + index + 1
+            offset += len(block)
+        return offset
+
+    @classmethod
+    def _skip_lines_backward(cls, file_handle, offset, num_line):
+        # The offset is the start of a line, so the newline right before it ends the previous line.
+        end, num_newline = offset, 0
+        while end > 0:
+            start = max(0, end - cls.BLOCK_SIZE)
+            file_handle.seek(start)
+            block = file_handle.read(end - start)
+            index = len(block)
+            while True:
+                index = block.rfind(b'\n', 0, index)
+                if index < 0:
+                    break
+                num_newline += 1
+                if num_newline > num_line:
+                    return start + index + 1
+            end = start
+        return 0
+
+    @classmethod
+    def _find_content_line_backward(cls, file_handle, start, end, line_index):
+        # Returns the index of the last non-empty line between start and end, where line_index is the index of the
+        # last line, or -1 if all the lines are empty.
+        if end <= start:
+            return -1
+        file_handle.seek(end - 1)
+        if file_handle.read(1) == b'\n':
+            end -= 1
+        buffer, offset = b'', end
+        while True:
+            index = buffer.rfind(b'\n')
+            if index >= 0:
+                line, buffer = buffer[index + 1:], buffer[:index]
+            elif offset > start:
+                read_size = min(cls.BLOCK_SIZE, offset - start)
+                offset -= read_size
+                file_handle.seek(offset)
+                buffer = file_handle.read(read_size) + buffer
+                continue
+            else:
+                line, buffer = buffer, None
+            if line.decode('utf-8').strip():
+                return line_index
+            if buffer is None:
+                return -1
+            line_index -= 1
+
+    def _new_line_state(self, file_handle, legacy_size):
+        line_state = {
+            'inode': os.fstat(file_handle.fileno()).st_ino,
+            'legacy_size': legacy_size,
+            'num_lines': 0,
+            'line_offset': 0,
+            'content_file_size': None,
+            'last_content_line': -1,
+            'anchor': (0, 0),
+        }
+        if legacy_size is not None:
+            num_legacy_lines, _ = self._count_lines(file_handle=file_handle, start=0, end=legacy_size)
+            line_state['num_legacy_lines'] = num_legacy_lines
+            line_state['last_content_line'] = self._find_content_line_backward(
+                file_handle=file_handle, start=0, end=legacy_size, line_index=num_legacy_lines - 1)
+            line_state['first_appended_content_line'] = None
+            line_state['appended_scan'] = (num_legacy_lines, legacy_size)
+        return line_state
+
+    def _update_line_state(self, file_handle, line_state, file_size):
+        # Only the bytes appended since the last update are scanned. Returns the number of lines of the file, the
+        # number of lines in the legacy prefix (all the lines if the file is not written from the beginning) and the
+        # number of lines appended after it.
+        num_line, line_offset = self._count_lines(file_handle=file_handle, start=line_state['line_offset'],
+                                                  end=file_size)
+        if num_line > 0:
+            line_state['num_lines'] += num_line
+            line_state['line_offset'] = line_offset
+        num_physical_lines = line_state['num_lines'] + (1 if file_size > line_state['line_offset'] else 0)
+
+        if line_state['legacy_size'] is None:
+            if line_state['content_file_size'] != file_size:
+                line_state['last_content_line'] = self._find_content_line_backward(
+                    file_handle=file_handle, start=0, end=file_size, line_index=num_physical_lines - 1)
+                line_state['content_file_size'] = file_size
+            return line_state['last_content_line'] + 1, num_physical_lines, 0
+
+        num_legacy_lines = line_state['num_legacy_lines']
+        num_appended_lines = num_physical_lines - num_legacy_lines
+        if line_state['last_content_line'] >= 0:
+            return num_appended_lines + line_state['last_content_line'] + 1, num_legacy_lines, num_appended_lines
+
+        # The legacy prefix is empty, so the oldest appended lines come last and the empty ones among them are removed.
+        first_content_line = line_state['first_appended_content_line']
+        line_index, offset = line_state['appended_scan']
+        file_handle.seek(offset)
+        while first_content_line is None and offset < file_size:
+            line = file_handle.readline()
+            if line.decode('utf-8').strip():
+                first_content_line = line_index
+            if line[-1:] != b'\n':
+                break
+            line_index, offset = line_index + 1, offset + len(line)
+            if first_content_line is None:
+                line_state['appended_scan'] = (line_index, offset)
+            else:
+                line_state['first_appended_content_line'] = first_content_line
+        if first_content_line is None:
+            return 0, num_legacy_lines, num_appended_lines
+        return num_physical_lines - first_content_line, num_legacy_lines, num_appended_lines
+
+    def _seek_line(self, file_handle, line_state, line_index):
+        anchors = [(0, 0), (line_state['num_lines'], line_state['line_offset']), line_state['anchor']]
+        if line_state['legacy_size'] is not None:
+            anchors.append((line_state['num_legacy_lines'], line_state['legacy_size']))
+        anchor_line_index, offset = min(anchors, key=lambda anchor: abs(anchor[0] - line_index))
+        if line_index >= anchor_line_index:
+            return self._skip_lines_forward(file_handle=file_handle, offset=offset,
+                                            num_line=line_index - anchor_line_index)
+        else:
+            return self._skip_lines_backward(file_handle=file_handle, offset=offset,
+                                             num_line=anchor_line_index - line_index)
+
+    def _read_physical_lines(self, file_handle, line_state, start, num_line):
+        offset = self._seek_line(file_handle=file_handle, line_state=line_state, line_index=start)
+        file_handle.seek(offset)
+        lines = []
+        for _ in range(num_line):
+            line = file_handle.readline()
+            lines.append(line.decode('utf-8').strip())
+            if line[-1:] == b'\n':
+                offset += len(line)
+                line_state['anchor'] = (start + len(lines), offset)
+        return lines
+
+    def _read_local_lines(self, file_handle, line_state, layout, start, num_line):
+        # The lines from start in the read order, where the legacy prefix is read forward and the lines appended
+        # after it backward, both reversed if reading from the end.
+        num_logical_lines, num_legacy_lines, num_appended_lines = layout
+        if num_logical_lines == 0:
+            return [''][start:start + num_line]
+        end = min(start + num_line, num_logical_lines)
+        if start >= end:
+            return []
+        if self._is_read_from_end():
+            start, end = num_logical_lines - end, num_logical_lines - start
+        lines = []
+        if start < num_appended_lines:
+            appended_end = min(end, num_appended_lines)
+            lines += self._read_physical_lines(
+                file_handle=file_handle,
+                line_state=line_state,
+                start=num_legacy_lines + num_appended_lines - appended_end,
+                num_line=appended_end - start
+            )[::-1]
+        if end > num_appended_lines:
+            legacy_start = max(start, num_appended_lines)
+            lines += self._read_physical_lines(
+                file_handle=file_handle,
+                line_state=line_state,
+                start=legacy_start - num_appended_lines,
+                num_line=end - legacy_start
+            )
+        return lines[::-1] if self._is_read_from_end() else lines
+
+    def _sync_file_handle(self, local_file_name):
+        file_stat = os.stat(local_file_name)
+        legacy_size = self._load_legacy_size(local_file_name=local_file_name)
+        if self._line_state is None or self._line_state['inode'] != file_stat.st_ino or \
+                self._line_state['line_offset'] > file_stat.st_size or \
+                self._line_state['legacy_size'] != legacy_size:
+            # The file is opened for the first time, or it is replaced, truncated or converted to be written from the
+            # beginning, so the lines are counted again.
+            self._close_file_handle()
+            self._file_handle = open(local_file_name, 'rb')
+            self._line_state = self._new_line_state(file_handle=self._file_handle, legacy_size=legacy_size)
+        return self._update_line_state(file_handle=self._file_handle, line_state=self._line_state,
+                                       file_size=file_stat.st_size)
+
+    def _read_remote_lines(self):
+        try:
+            self.increment_rpc_count_by(n=1)
+            lines = [line.strip() for line in self.get_logical_lines(data=FileUtil.read(file_name=self._file_name),
+                                                                     legacy_size=self._load_legacy_size())]
+        except Exception as _:
+            lines = []
+        return lines[::-1] if self._is_read_from_end() else lines
+
+    def _read_lines(self, start, num_line):
+        # Returns the lines from start in the read order, together with the total number of lines of the file.
+        local_file_name = self._get_local_file_name()
+        if not local_file_name:
+            lines = self._read_remote_lines()
+            return lines[start:start + num_line], len(lines)
+
+        self.increment_rpc_count_by(n=1)
+        layout = self._sync_file_handle(local_file_name=local_file_name)
+        lines = self._read_local_lines(file_handle=self._file_handle, line_state=self._line_state, layout=layout,
+                                       start=start, num_line=num_line)
+        return lines, max(layout[0], 1)
+
+    def iter_lines(self):
+        local_file_name = self._get_local_file_name()
+        if not local_file_name:
+            for line in self._read_remote_lines():
+                yield line
+            return
+
+        self.increment_rpc_count_by(n=1)
+        legacy_size = self._load_legacy_size(local_file_name=local_file_name)
+        with open(local_file_name, 'rb') as file_handle:
+            line_state = self._new_line_state(file_handle=file_handle, legacy_size=legacy_size)
+            layout = self._update_line_state(file_handle=file_handle, line_state=line_state,
+                                             file_size=os.fstat(file_handle.fileno()).st_size)
+            for start in range(0, max(layout[0], 1), 1024):
+                for line in self._read_local_lines(file_handle=file_handle, line_state=line_state, layout=layout,
+                                                   start=start, num_line=1024):
+                    yield line
 
     def read(self, params=None):
         if not params:
@@ -65,38 +378,195 @@ class DefaultStorage(StorageBase):
                                      " will be omitted since it is not useful as an input argument in this function.")
                 self._SYS_LOGGER.warning(param + " will be omitted since it is not useful as an input argument in this"
                                          + " function.")
-        try:
-            self.increment_rpc_count_by(n=1)
-            lines = FileUtil.read_lined_txt_from_file(self._file_name)
-        except Exception as _:
-            lines = []
-
-        if 'read_rule_type' in self._config and self._config['read_rule_type'] == ReadRuleType.READ_FROM_END:
-            lines = lines[::-1]
         if params['num_line'] < 0:
-            return [line.strip() for line in lines]
+            return list(self.iter_lines())
+
+        try:
+            lines, num_total_line = self._read_lines(start=self._last_read_line, num_line=params['num_line'])
+        except Exception as err:
+            self._SYS_LOGGER.error("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
+            self._logger.error("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
+            raise StorageReadException("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
 
         new_line_number = self._last_read_line + params['num_line']
-        if new_line_number > len(lines):
+        if new_line_number > num_total_line:
             self._SYS_LOGGER.error(str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                                   "] only has " + str(len(lines)) + " lines.")
+                                   "] only has " + str(num_total_line) + " lines.")
             self._logger.error(str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                               "] only has " + str(len(lines)) + " lines.")
+                               "] only has " + str(num_total_line) + " lines.")
             raise StoragePastLineException(
                 str(new_line_number) + " exceeds the file limit. [" + self.get_file_name() +
-                "] only has " + str(len(lines)) + " lines.")
+                "] only has " + str(num_total_line) + " lines.")
+        self._last_read_line = new_line_number
+        return lines
+
+    def _write_from_beginning(self, data_to_write):
+        if self._legacy_size is None:
+            self._legacy_size = self._load_legacy_size()
+        if self._legacy_size is None:
+            # The existing content, which is already ordered from the newest, becomes the legacy prefix, and the later
+            # lines are appended after it.
+            existing_data = gclient_ext.read_txt(path=self._file_name)
+            if existing_data is None:
+                existing_data = ''
+            if existing_data and existing_data[-1] != '\n':
+                gclient.write(path=self._file_name, data='\n', mode='a')
+                existing_data += '\n'
+            self._legacy_size = len(existing_data.encode('utf-8'))
+            FileUtil.write_json_to_file(
+                json_obj={'legacy_size': self._legacy_size},
+                file_name=self._file_name + self.PREPEND_FILE_SUFFIX
+            )
+        self._append_to_file(data=data_to_write + '\n')
+
+    def _write_from_end(self, data_to_write):
+        # The lines appended after a legacy prefix are read as written from the beginning, so a file that is written
+        # from the beginning cannot be written from the end. The prepend file of a local file is checked on every
+        # write, and the one of a remote file once after initialization.
+        local_file_name = FileUtil.get_local_path(path=self._file_name)
+        if self._legacy_size is None and (local_file_name or not self._is_legacy_size_checked):
+            self._legacy_size = self._load_legacy_size(local_file_name=local_file_name)
+            self._is_legacy_size_checked = True
+        if self._legacy_size is not None:
+            self._SYS_LOGGER.error("File [" + self._file_name + "] is written from the beginning, and cannot be "
+                                   "written from the end.")
+            self._logger.error("File [" + self._file_name + "] is written from the beginning, and cannot be written "
+                               "from the end.")
+            raise StorageWriteException("File [" + self._file_name + "] is written from the beginning, and cannot be "
+                                        "written from the end.")
+        self._append_to_file(data=data_to_write + '\n')
+
+    def _append_to_file(self, data):
+        if not self._config['durable']:
+            gclient.write(path=self._file_name, data=data, mode='a')
+            return
+        # Only the writes to the local file system can be synced to disk, so a durable write to a remote file fails
+        # instead of silently not being synced.
+        local_file_name = FileUtil.get_local_path(path=self._file_name)
+        if not local_file_name:
+            self._SYS_LOGGER.error("File [" + self._file_name + "] is not local, and cannot be written durably.")
+            self._logger.error("File [" + self._file_name + "] is not local, and cannot be written durably.")
+            raise StorageWriteException("File [" + self._file_name + "] is not local, and cannot be written durably.")
+        os.makedirs(os.path.dirname(local_file_name), exist_ok=True)
+        with open(local_file_name, 'a') as outfile:
+            outfile.write(data)
+            outfile.flush()
+            os.fsync(outfile.fileno())
+
+    def _write_lines(self, data_to_write):
+        if self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END:
+            self._write_from_end(data_to_write=data_to_write)
+        elif self._config['file_lock']:
+            with FileLockTool(protected_file_path=self._file_name):
+                self._write_from_beginning(data_to_write=data_to_write)
+        else:
+            self._write_from_beginning(data_to_write=data_to_write)
+
+    def _reset_pending_lines(self):
+        self._pending_lines = []
+        self._num_pending_lines = 0
+        self._num_pending_bytes = 0
+        self._pending_start_time = None
+
+    def is_batching(self):
+        return self._batch_config is not None
+
+    def get_num_pending_lines(self):
+        return self._num_pending_lines
+
+    def begin_batch(self, max_count=-1, max_bytes=-1, max_seconds=-1):
+        if self._batch_config is not None:
+            self._SYS_LOGGER.warning("File [" + str(self.get_file_name()) + "] is already in batch mode.")
+            self._stop_flush_thread()
         else:
+            atexit.register(self.flush)
+        self._batch_config = {
+            'max_count': max_count,
+            'max_bytes': max_bytes,
+            'max_seconds': max_seconds,
+        }
+        if max_seconds > 0:
+            self._flush_thread = threading.Thread(
+                target=self._run_flush_thread,
+                args=(max_seconds,),
+                name='default_storage_flush_thread',
+                daemon=True
+            )
+            self._flush_thread.start()
+
+    def end_batch(self):
+        try:
+            self.flush()
+        finally:
+            self._stop_flush_thread()
+            self._batch_config = None
+            atexit.unregister(self.flush)
+
+    @contextmanager
+    def batch(self, max_count=-1, max_bytes=-1, max_seconds=-1):
+        self.begin_batch(max_count=max_count, max_bytes=max_bytes, max_seconds=max_seconds)
+        try:
+            yield self
+        finally:
+            self.end_batch()
+
+    def flush(self):
+        with self._batch_lock:
+            if self._num_pending_lines == 0:
+                return
             try:
-                result = lines[self._last_read_line:new_line_number]
-                assert len(result) == params['num_line']
-                result = [line.strip() for line in result]
-                self._last_read_line = new_line_number
-                return result
+                self.increment_rpc_count_by(n=1)
+                self._write_lines(data_to_write='\n'.join(self._pending_lines))
+                self._reset_pending_lines()
             except Exception as err:
-                self._SYS_LOGGER.error("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
-                self._logger.error("Read file [" + self._file_name + "] got exception: " + str(err) + '.')
-                raise StorageReadException(
-                    "Read file [" + self._file_name + "] got exception: " + str(err) + '.')
+                self._SYS_LOGGER.error("Flush file [" + str(self._file_name) + "] got exception: " + str(err) + '.')
+                self._logger.error("Flush file [" + str(self._file_name) + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Flush file [" + str(self._file_name) + "] got exception: " +
+                                            str(err) + '.')
+
+    def close(self):
+        if self._batch_config is not None:
+            self.end_batch()
+        self._close_file_handle()
+
+    def _run_flush_thread(self, max_seconds):
+        while not self._flush_stop_event.wait(timeout=max_seconds):
+            with self._batch_lock:
+                if self._pending_start_time is None or time.time() - self._pending_start_time < max_seconds:
+                    continue
+                try:
+                    self.flush()
+                except StorageWriteException as _:
+                    continue
+
+    def _stop_flush_thread(self):
+        if self._flush_thread is None:
+            return
+        self._flush_stop_event.set()
+        if self._flush_thread is not threading.current_thread():
+            self._flush_thread.join()
+        self._flush_thread = None
+        self._flush_stop_event.clear()
+
+    def _should_flush(self):
+        if self._num_pending_lines >= self._batch_config['max_count'] > 0:
+            return True
+        if self._num_pending_bytes >= self._batch_config['max_bytes'] > 0:
+            return True
+        if self._batch_config['max_seconds'] > 0 and \
+                time.time() - self._pending_start_time >= self._batch_config['max_seconds']:
+            return True
+        return False
+
+    def _add_to_batch(self, data_to_write):
+        with self._batch_lock:
+            if self._num_pending_lines == 0:
+                self._pending_start_time = time.time()
+            self._pending_lines.append(data_to_write)
+            self._num_pending_lines += 1
+            self._num_pending_bytes += len(data_to_write.encode('utf-8')) + 1
+            if self._should_flush():
+                self.flush()
 
     def write(self, data, params=None):
         if not isinstance(data, str):
@@ -122,15 +592,11 @@ class DefaultStorage(StorageBase):
         else:
             data_to_write = data
         try:
-            self.increment_rpc_count_by(n=1)
-            if self._config['write_rule_type'] == WriteRuleType.WRITE_FROM_END:
-                gclient.write(path=self._file_name, data=data_to_write + '\n', mode='a')
+            if self._batch_config is not None:
+                self._add_to_batch(data_to_write=data_to_write)
             else:
-                existing_data = gclient_ext.read_txt(path=self._file_name)
-                if existing_data is None:
-                    existing_data = ''
-
-                gclient.write(path=self._file_name, data=data_to_write + '\n' + existing_data, mode='w')
+                self.increment_rpc_count_by(n=1)
+                self._write_lines(data_to_write=data_to_write)
 
         except Exception as err:
             self._SYS_LOGGER.info("Write to file [" + self._file_name + "] got exception: " + str(err) + '.')
@@ -1,12 +1,19 @@
 import datetime
+import threading
+import time
+from concurrent import futures
 from galaxy_py import gclient_ext
-from pslx.core.exception import StorageReadException, StorageWriteException
+from google.protobuf.any_pb2 import Any
+from pslx.core.exception import StorageDeleteException, StorageInternalException, StorageReadException
+from pslx.core.exception import StorageWriteException
 from pslx.core.node_base import OrderedNodeBase
 from pslx.core.tree_base import TreeBase
 from pslx.schema.enums_pb2 import StorageType, PartitionerStorageType, SortOrder
-from pslx.schema.storage_pb2 import ProtoTable
+from pslx.schema.storage_pb2 import ProtoTable, ProtoTableLogRecord
 from pslx.storage.default_storage import DefaultStorage
+from pslx.storage.proto_table_storage import ProtoTableStorage
 from pslx.storage.storage_base import StorageBase
+from pslx.tool.file_lock_tool import FileLockTool
 from pslx.util.env_util import EnvUtil
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
@@ -23,23 +30,94 @@ class PartitionerBase(StorageBase):
         PartitionerStorageType.HOURLY: 4,
         PartitionerStorageType.MINUTELY: 5,
     }
+    SEGMENT_FILE_PREFIX = 'data-'
+    SEGMENT_FILE_SUFFIX = '.rec'
+    GARBAGE_COLLECTION_LOCK_NAME = 'garbage_collection'
+    _DIR_NAME_TO_WRITE_VERSION_MAP = {}
 
     def __init__(self, logger=None, max_capacity=EnvUtil.get_pslx_env_variable('PSLX_INTERNAL_CACHE')):
         super().__init__(logger=logger)
         self._file_tree = None
         self._max_capacity = int(max_capacity)
         self._underlying_storage = DefaultStorage(logger=logger)
+        self._tree_cache_ttl = -1
+        self._tree_refresh_time = None
+        self._tree_write_version = 0
+        self._num_list_calls_per_refresh = 0
+        self._num_tree_cache_hits = 0
+        self._num_avoided_list_calls = 0
+        self._num_io_workers = 8
+        self._tree_lock = threading.RLock()
+        self._retention_policy = {
+            'max_num_partitions': -1,
+            'max_age': None,
+            'timezone': 'PST',
+        }
+        self._garbage_collection_thread = None
+        self._garbage_collection_stop_event = threading.Event()
+        self._segment_config = None
+        self._segment_file_name = None
+        self._segment_size = 0
+        self._segment_start_time = None
+        self._replayed_segment_signatures = None
 
     def get_partitioner_type(self):
         return self.PARTITIONER_TYPE
 
     def set_underlying_storage(self, storage):
         assert storage.STORAGE_TYPE not in [StorageType.PARTITIONER_STORAGE, StorageType.SHARDED_PROTO_TABLE_STORAGE]
+        if self._segment_config is not None:
+            self._check_segment_storage(storage=storage)
         self._underlying_storage = storage
+        self._replayed_segment_signatures = None
 
     def set_max_capacity(self, max_capacity):
         self._max_capacity = int(max_capacity)
 
+    def set_num_io_workers(self, num_io_workers):
+        self._num_io_workers = int(num_io_workers)
+
+    def set_tree_cache_ttl(self, ttl):
+        self._tree_cache_ttl = ttl
+
+    def get_num_tree_cache_hits(self):
+        return self._num_tree_cache_hits
+
+    def get_num_avoided_list_calls(self):
+        return self._num_avoided_list_calls
+
+    def _check_segment_storage(self, storage):
+        if storage.get_storage_type() != StorageType.PROTO_TABLE_STORAGE:
+            storage_type_name = ProtoUtil.get_name_by_value(enum_type=StorageType, value=storage.get_storage_type())
+            self._SYS_LOGGER.error("Segment files are not supported for underlying storage type " + storage_type_name +
+                                   ", please use PROTO_TABLE_STORAGE.")
+            self._logger.error("Segment files are not supported for underlying storage type " + storage_type_name +
+                               ", please use PROTO_TABLE_STORAGE.")
+            raise StorageInternalException("Segment files are not supported for underlying storage type " +
+                                           storage_type_name + ", please use PROTO_TABLE_STORAGE.")
+
+    def set_segment_config(self, max_segment_size=-1, max_segment_seconds=-1):
+        self._check_segment_storage(storage=self._underlying_storage)
+        self._segment_config = {
+            'max_segment_size': max_segment_size,
+            'max_segment_seconds': max_segment_seconds,
+        }
+        self._segment_file_name = None
+
+    @classmethod
+    def is_segment_file(cls, file_name):
+        base_name = FileUtil.base_name(file_name=file_name)
+        return base_name.startswith(cls.SEGMENT_FILE_PREFIX) and base_name.endswith(cls.SEGMENT_FILE_SUFFIX)
+
+    @classmethod
+    def _get_segment_index(cls, file_name):
+        return int(FileUtil.base_name(file_name=file_name)[len(cls.SEGMENT_FILE_PREFIX):-len(cls.SEGMENT_FILE_SUFFIX)])
+
+    def _list_segment_files(self, dir_name):
+        self.increment_rpc_count_by(n=1)
+        return sorted([file_name for file_name in self._list_files_in_dir(dir_name=dir_name)
+                       if self.is_segment_file(file_name=file_name)], key=self._get_segment_index)
+
     def initialize_from_file(self, file_name):
         self._SYS_LOGGER.fatal("Initialize_from_file function is not implemented for storage type ["
                                + ProtoUtil.get_name_by_value(enum_type=StorageType, value=self.STORAGE_TYPE) + '].')
@@ -95,20 +173,44 @@ class PartitionerBase(StorageBase):
 
         from_scratch = False
         dir_name = FileUtil.normalize_dir_name(dir_name=dir_name)
-        if not self._file_tree or force:
-            # FileUtil.create_dir_if_not_exist(dir_name=dir_name)
-            root_node = OrderedNodeBase(
-                node_name=dir_name
+        write_version = self._DIR_NAME_TO_WRITE_VERSION_MAP.get(dir_name, 0)
+        num_rpc_calls = self.get_rpc_call_count()
+        with self._tree_lock:
+            if not self._file_tree or force:
+                # FileUtil.create_dir_if_not_exist(dir_name=dir_name)
+                root_node = OrderedNodeBase(
+                    node_name=dir_name
+                )
+                self._file_tree = TreeBase(root=root_node, max_dict_size=self._max_capacity)
+                from_scratch = True
+
+            _recursive_initialize_from_dir(
+                node=self._file_tree.get_root_node(),
+                max_recursion=self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
             )
-            self._file_tree = TreeBase(root=root_node, max_dict_size=self._max_capacity)
-            from_scratch = True
+        self._tree_refresh_time = time.time()
+        self._tree_write_version = write_version
+        self._num_list_calls_per_refresh = max(0, self.get_rpc_call_count() - num_rpc_calls)
+
+    def _refresh_file_tree(self):
+        dir_name = self.get_dir_name()
+        if self._tree_cache_ttl > 0 and self._tree_refresh_time is not None and \
+                time.time() - self._tree_refresh_time < self._tree_cache_ttl and \
+                self._DIR_NAME_TO_WRITE_VERSION_MAP.get(dir_name, 0) == self._tree_write_version:
+            self._num_tree_cache_hits += 1
+            self._num_avoided_list_calls += self._num_list_calls_per_refresh
+            return
+        self.initialize_from_dir(dir_name=dir_name)
 
-        _recursive_initialize_from_dir(
-            node=self._file_tree.get_root_node(),
-            max_recursion=self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
-        )
+    def _notify_write(self):
+        dir_name = self.get_dir_name()
+        write_version = self._DIR_NAME_TO_WRITE_VERSION_MAP.get(dir_name, 0)
+        self._DIR_NAME_TO_WRITE_VERSION_MAP[dir_name] = write_version + 1
+        if self._tree_write_version == write_version:
+            self._tree_write_version = write_version + 1
 
     def set_config(self, config):
+        super().set_config(config=config)
         self._underlying_storage.set_config(config=config)
 
     def get_dir_name(self):
@@ -118,14 +220,15 @@ class PartitionerBase(StorageBase):
             return None
 
     def get_size(self):
-        if not self._file_tree:
-            return 0
-        else:
-            return self._file_tree.get_num_nodes()
+        with self._tree_lock:
+            if not self._file_tree:
+                return 0
+            else:
+                return self._file_tree.get_num_nodes()
 
     def is_empty(self):
-        leftmost_leaf_name, rightmost_leaf_name = (self._file_tree.get_leftmost_leaf(),
-                                                   self._file_tree.get_rightmost_leaf())
+        leftmost_leaf_name, rightmost_leaf_name = (self._get_latest_dir_internal(),
+                                                   self._get_oldest_dir_internal())
         self.increment_rpc_count_by(n=2)
         if FileUtil.is_dir_empty(dir_name=leftmost_leaf_name) and FileUtil.is_dir_empty(dir_name=rightmost_leaf_name):
             return True
@@ -133,7 +236,7 @@ class PartitionerBase(StorageBase):
             return False
 
     def is_gabage_collected(self):
-        rightmost_leaf_name = self._file_tree.get_rightmost_leaf()
+        rightmost_leaf_name = self._get_oldest_dir_internal()
         self.increment_rpc_count_by(n=1)
         if not FileUtil.does_dir_exist(dir_name=rightmost_leaf_name):
             return True
@@ -165,10 +268,19 @@ class PartitionerBase(StorageBase):
             return None
 
     def _get_latest_dir_internal(self):
-        if not self._file_tree:
-            return ''
-        else:
-            return self._file_tree.get_leftmost_leaf()
+        # The garbage collection thread deletes nodes under the tree lock, so the leaves are read under it as well.
+        with self._tree_lock:
+            if not self._file_tree:
+                return ''
+            else:
+                return self._file_tree.get_leftmost_leaf()
+
+    def _get_oldest_dir_internal(self):
+        with self._tree_lock:
+            if not self._file_tree:
+                return ''
+            else:
+                return self._file_tree.get_rightmost_leaf()
 
     def _get_oldest_dir_in_root_directory_interal(self):
         if not self._file_tree:
@@ -185,23 +297,23 @@ class PartitionerBase(StorageBase):
                     return oldest_directory
 
     def get_latest_dir(self):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         if self.is_empty():
             self._SYS_LOGGER.info("Current partitioner is empty.")
             return ''
         else:
-            return self._file_tree.get_leftmost_leaf()
+            return self._get_latest_dir_internal()
 
     def get_oldest_dir(self):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         if self.is_empty():
             self._SYS_LOGGER.info("Current partitioner is empty.")
             return ''
         else:
-            return self._file_tree.get_rightmost_leaf()
+            return self._get_oldest_dir_internal()
 
     def get_oldest_dir_in_root_directory(self):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         if self.is_empty():
             self._SYS_LOGGER.info("Current partitioner is empty.")
             return ''
@@ -216,7 +328,7 @@ class PartitionerBase(StorageBase):
                     return oldest_directory
 
     def get_previous_dir(self, cur_dir):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         cur_dir = cur_dir.replace(self._file_tree.get_root_name(), '')
         cur_time = FileUtil.parse_dir_to_timestamp(dir_name=cur_dir)
         if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
@@ -245,7 +357,7 @@ class PartitionerBase(StorageBase):
             return None
 
     def get_next_dir(self, cur_dir):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         cur_dir = cur_dir.replace(self._file_tree.get_root_name(), '')
         cur_time = FileUtil.parse_dir_to_timestamp(dir_name=cur_dir)
         if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
@@ -277,14 +389,46 @@ class PartitionerBase(StorageBase):
 
     def _reinitialize_underlying_storage(self, file_base_name):
         file_name = FileUtil.join_paths_to_file(root_dir=self._get_latest_dir_internal(), base_name=file_base_name)
+        if (self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE and
+                file_name == self._underlying_storage.get_file_name()):
+            if self._underlying_storage.refresh_if_changed():
+                self._replayed_segment_signatures = None
+            return
         self.increment_rpc_count_by(n=1)
         if not FileUtil.does_file_exist(file_name):
             self._SYS_LOGGER.info("The file to read does not exist.")
             return
         self._underlying_storage.initialize_from_file(file_name=file_name)
+        self._replayed_segment_signatures = None
+
+    def _replay_segments(self, file_name, dir_name):
+        # The segments only get new records appended, so the table keeps the segments it has replayed, and only the
+        # segments from the first one that changed are replayed again. Replaying them in order on top of the earlier
+        # replay gives the same table as replaying all of them. The table is reloaded if its file changed or a
+        # replayed segment was removed.
+        segment_file_names = self._list_segment_files(dir_name=dir_name)
+        self.increment_rpc_count_by(n=len(segment_file_names))
+        segment_signatures = [(segment_file_name, FileUtil.get_file_attr(file_name=segment_file_name))
+                              for segment_file_name in segment_file_names]
+        replayed_segment_signatures = self._replayed_segment_signatures
+        if file_name != self._underlying_storage.get_file_name() or replayed_segment_signatures is None or \
+                not set(name for name, _ in replayed_segment_signatures).issubset(segment_file_names):
+            self._underlying_storage.initialize_from_file(file_name=file_name)
+            replayed_segment_signatures = []
+        elif self._underlying_storage.refresh_if_changed():
+            replayed_segment_signatures = []
+
+        start = 0
+        while start < len(replayed_segment_signatures) and \
+                replayed_segment_signatures[start] == segment_signatures[start]:
+            start += 1
+        self._SYS_LOGGER.info("Replay [" + str(len(segment_file_names) - start) + "] of the [" +
+                              str(len(segment_file_names)) + "] segments of " + file_name + '.')
+        self._underlying_storage.replay_log_files(log_file_names=segment_file_names[start:])
+        self._replayed_segment_signatures = segment_signatures
 
     def read(self, params=None):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
+        self._refresh_file_tree()
         if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
             file_base_name = 'data.pb'
         else:
@@ -304,7 +448,10 @@ class PartitionerBase(StorageBase):
         file_name = FileUtil.join_paths_to_file(root_dir=latest_dir, base_name=file_base_name)
 
         try:
-            if file_name != self._underlying_storage.get_file_name():
+            if self._segment_config is not None:
+                self._SYS_LOGGER.info("Merge the segments of the latest partition to " + file_name)
+                self._replay_segments(file_name=file_name, dir_name=latest_dir)
+            elif file_name != self._underlying_storage.get_file_name():
                 self._SYS_LOGGER.info("Sync to the latest file to " + file_name)
                 self._underlying_storage.initialize_from_file(file_name=file_name)
             result = self._underlying_storage.read(params=params)
@@ -315,114 +462,359 @@ class PartitionerBase(StorageBase):
             self._logger.error("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
             raise StorageReadException("Read dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
 
-    def read_range(self, params):
-        self.initialize_from_dir(dir_name=self.get_dir_name())
-
-        def _reformat_time(timestamp):
-            if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
-                timestamp = timestamp.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0,
-                                              tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.MONTHLY:
-                timestamp = timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.DAILY:
-                timestamp = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
-            elif self.PARTITIONER_TYPE == PartitionerStorageType.HOURLY:
-                timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
-            else:
-                timestamp = timestamp.replace(second=0, microsecond=0, tzinfo=None)
-            return timestamp
+    def _reformat_time(self, timestamp):
+        if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
+            timestamp = timestamp.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0,
+                                          tzinfo=None)
+        elif self.PARTITIONER_TYPE == PartitionerStorageType.MONTHLY:
+            timestamp = timestamp.replace(day=1, hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        elif self.PARTITIONER_TYPE == PartitionerStorageType.DAILY:
+            timestamp = timestamp.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=None)
+        elif self.PARTITIONER_TYPE == PartitionerStorageType.HOURLY:
+            timestamp = timestamp.replace(minute=0, second=0, microsecond=0, tzinfo=None)
+        else:
+            timestamp = timestamp.replace(second=0, microsecond=0, tzinfo=None)
+        return timestamp
 
-        assert 'start_time' in params and 'end_time' in params and params['start_time'] <= params['end_time']
+    def _dir_to_components(self, dir_name):
+        dir_name = dir_name.replace(self._file_tree.get_root_name(), '')
+        return [int(component) for component in dir_name.split('/') if component]
 
-        oldest_dir, latest_dir = self._get_oldest_dir_in_root_directory_interal(), self._get_latest_dir_internal()
-        if not latest_dir or not oldest_dir:
-            self._logger.warning("Current partitioner [" + self.get_dir_name() +
-                                 "] is empty, cannot read anything.")
-            self._SYS_LOGGER.warning("Current partitioner [" + self.get_dir_name() +
-                                     "] is empty, cannot read anything.")
-            return {}
+    def _list_dirs_in_dir(self, dir_name):
+        try:
+            return FileUtil.list_dirs_in_dir(dir_name=dir_name)
+        except Exception as _:
+            return []
 
-        oldest_dir = oldest_dir.replace(self._file_tree.get_root_name(), '')
-        latest_dir = latest_dir.replace(self._file_tree.get_root_name(), '')
+    def _list_files_in_dir(self, dir_name):
+        try:
+            return [file_name for file_name in FileUtil.list_files_in_dir(dir_name=dir_name)
+                    if not FileUtil.is_temp_file(file_name=file_name) and
+                    not file_name.endswith(FileLockTool.LOCK_FILE_SUFFIX)]
+        except Exception as _:
+            return []
 
-        oldest_timestamp = FileUtil.parse_dir_to_timestamp(dir_name=oldest_dir)
-        latest_timestamp = FileUtil.parse_dir_to_timestamp(dir_name=latest_dir)
-        start_time = max(_reformat_time(params['start_time']), oldest_timestamp)
-        end_time = min(_reformat_time(params['end_time']), latest_timestamp)
+    def _get_partitions_in_range(self, start_time, end_time):
+        height = self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]
+        start_components = [int(component) for component in
+                            FileUtil.parse_timestamp_to_dir(timestamp=start_time).split('/')[:height]]
+        end_components = [int(component) for component in
+                          FileUtil.parse_timestamp_to_dir(timestamp=end_time).split('/')[:height]]
+        # The tree keeps all the partitions newer than its oldest leaf, so the children of a node that can be in the
+        # range are taken from the tree if they are not older than the oldest leaf, and listed otherwise. The tree is
+        # walked under the tree lock so that the garbage collection thread does not delete nodes during the walk.
+        with self._tree_lock:
+            oldest_components = self._dir_to_components(dir_name=self._file_tree.get_rightmost_leaf())
+            if len(oldest_components) != height:
+                oldest_components = None
+
+            level_nodes = [(self._file_tree.get_root_name(), self._file_tree.get_root_node())]
+            for level in range(height):
+                node_to_child_names, dirs_to_list = {}, []
+                for dir_name, node in level_nodes:
+                    components = self._dir_to_components(dir_name=dir_name)
+                    lower_bound = start_components[:level + 1] if components == start_components[:level] else \
+                        components + [0]
+                    if node is not None and oldest_components is not None and \
+                            lower_bound >= oldest_components[:level + 1]:
+                        node_to_child_names[dir_name] = node.get_children_names()
+                    else:
+                        dirs_to_list.append(dir_name)
+
+                if dirs_to_list:
+                    num_io_workers = max(1, min(self._num_io_workers, len(dirs_to_list)))
+                    with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+                        for dir_name, child_names in zip(dirs_to_list,
+                                                         executor.map(self._list_dirs_in_dir, dirs_to_list)):
+                            node_to_child_names[dir_name] = child_names
+                    self.increment_rpc_count_by(n=len(dirs_to_list))
+
+                next_level_nodes = []
+                for dir_name, node in level_nodes:
+                    for child_name in node_to_child_names[dir_name]:
+                        child_name = FileUtil.normalize_dir_name(dir_name=child_name)
+                        if not child_name.replace(dir_name, '').replace('/', '').isdigit():
+                            continue
+                        components = self._dir_to_components(dir_name=child_name)
+                        if start_components[:level + 1] <= components <= end_components[:level + 1]:
+                            next_level_nodes.append(
+                                (child_name, node.get_child(child_name) if node is not None else None))
+                level_nodes = next_level_nodes
+
+            return sorted(set(dir_name for dir_name, _ in level_nodes))
+
+    def _read_files(self, file_names):
         result = {}
-        try:
-            all_file_names = []
-            while start_time <= end_time:
-                dir_list = FileUtil.parse_timestamp_to_dir(timestamp=start_time).split('/')
-                dir_name = '/'.join(dir_list[:self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE]])
-                dir_name = FileUtil.join_paths_to_dir(
-                    root_dir=self._file_tree.get_root_name(),
-                    base_name=dir_name
-                )
-                try:
+        self.increment_rpc_count_by(n=1)
+        if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
+            segment_file_names = sorted([file_name for file_name in file_names if self.is_segment_file(file_name)],
+                                        key=lambda file_name: (FileUtil.dir_name(file_name=file_name),
+                                                               self._get_segment_index(file_name=file_name)))
+            file_names = [file_name for file_name in file_names
+                          if not file_name.endswith(ProtoTableStorage.LOG_FILE_SUFFIX) and
+                          not file_name.endswith(ProtoTableStorage.INDEX_FILE_SUFFIX) and
+                          not self.is_segment_file(file_name)]
+            tmp_result = FileUtil.read_protos_from_files(proto_type=ProtoTable, file_names=file_names)
+            for file_name, v in tmp_result.items():
+                if v.write_ahead_log:
                     self.increment_rpc_count_by(n=1)
-                    file_names = FileUtil.list_files_in_dir(dir_name=dir_name)
-                    all_file_names.extend(file_names)
-                except Exception as _:
-                    pass
-
-                if self.PARTITIONER_TYPE == PartitionerStorageType.YEARLY:
-                    start_time = start_time.replace(year=start_time.year + 1, month=1, day=1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.MONTHLY:
-                    if start_time.month == 12:
-                        start_time = start_time.replace(year=start_time.year + 1, month=1, day=1)
-                    else:
-                        start_time = start_time.replace(month=start_time.month + 1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.DAILY:
-                    start_time += datetime.timedelta(days=1)
-                elif self.PARTITIONER_TYPE == PartitionerStorageType.HOURLY:
-                    start_time += datetime.timedelta(hours=1)
+                    ProtoTableStorage.replay_log(
+                        table_message=v,
+                        log_file_name=file_name + ProtoTableStorage.LOG_FILE_SUFFIX
+                    )
+            # The segments of a partition are merged into the default table file of the partition.
+            for segment_file_name in segment_file_names:
+                file_name = FileUtil.join_paths_to_file(root_dir=FileUtil.dir_name(file_name=segment_file_name),
+                                                        base_name='data.pb')
+                if file_name not in tmp_result:
+                    tmp_result[file_name] = ProtoTable()
+                self.increment_rpc_count_by(n=1)
+                ProtoTableStorage.replay_log(table_message=tmp_result[file_name], log_file_name=segment_file_name)
+            for file_name, v in tmp_result.items():
+                result[file_name] = dict(v.data)
+        else:
+            prepend_file_names = set(file_name for file_name in file_names
+                                     if file_name.endswith(DefaultStorage.PREPEND_FILE_SUFFIX))
+            tmp_result = gclient_ext.read_txts([file_name for file_name in file_names
+                                                if file_name not in prepend_file_names])
+            for file_name, v in tmp_result.items():
+                if file_name + DefaultStorage.PREPEND_FILE_SUFFIX in prepend_file_names:
+                    # The file is written from the beginning, so the lines are reordered from the newest.
+                    self.increment_rpc_count_by(n=1)
+                    prepend_info = FileUtil.read_json_from_file(file_name=file_name +
+                                                                DefaultStorage.PREPEND_FILE_SUFFIX)
+                    result[file_name] = DefaultStorage.get_logical_lines(
+                        data=v,
+                        legacy_size=prepend_info['legacy_size']
+                    )
                 else:
-                    start_time += datetime.timedelta(minutes=1)
-            result = {}
-            self.increment_rpc_count_by(n=1)
-            if self._underlying_storage.get_storage_type() == StorageType.PROTO_TABLE_STORAGE:
-                tmp_result = gclient_ext.read_proto_messages(paths=all_file_names, message_type=ProtoTable)
-                for file_name, v in tmp_result.items():
-                    result[file_name] = dict(v.data)
-            else:
-                tmp_result = gclient_ext.read_txts(all_file_names)
-                for file_name, v in tmp_result.items():
                     result[file_name] = v.rstrip().split('\n')
+        return result
 
-            return result
+    def iter_range(self, params):
+        self._refresh_file_tree()
+        assert 'start_time' in params and 'end_time' in params and params['start_time'] <= params['end_time']
+        if not self._get_latest_dir_internal():
+            self._logger.warning("Current partitioner [" + self.get_dir_name() +
+                                 "] is empty, cannot read anything.")
+            self._SYS_LOGGER.warning("Current partitioner [" + self.get_dir_name() +
+                                     "] is empty, cannot read anything.")
+            return
+
+        try:
+            partitions = self._get_partitions_in_range(
+                start_time=self._reformat_time(params['start_time']),
+                end_time=self._reformat_time(params['end_time'])
+            )
+            batch_size = params['batch_size'] if params.get('batch_size', -1) > 0 else max(1, len(partitions))
+            for index in range(0, len(partitions), batch_size):
+                batch_partitions = partitions[index:index + batch_size]
+                num_io_workers = max(1, min(self._num_io_workers, len(batch_partitions)))
+                with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+                    all_file_names = [file_name for file_names in
+                                      executor.map(self._list_files_in_dir, batch_partitions)
+                                      for file_name in file_names]
+                self.increment_rpc_count_by(n=len(batch_partitions))
+                if not all_file_names:
+                    continue
+                batch_result = self._read_files(file_names=all_file_names)
+                for file_name in sorted(batch_result.keys()):
+                    yield file_name, batch_result[file_name]
         except Exception as err:
             self._SYS_LOGGER.error("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
             self._logger.error("Read range in dir [" + self.get_dir_name() + "] got exception " + str(err) + '.')
             raise StorageReadException("Read range in dir [" + self.get_dir_name() + "] got exception " +
                                        str(err) + '.')
 
+    def read_range(self, params):
+        return dict(self.iter_range(params=params))
+
+    def set_retention_policy(self, max_num_partitions=-1, max_age=None, timezone='PST'):
+        assert max_num_partitions != 0
+        self._retention_policy = {
+            'max_num_partitions': max_num_partitions,
+            'max_age': max_age,
+            'timezone': timezone,
+        }
+
+    def _find_partition_node(self, dir_name):
+        node, node_name = self._file_tree.get_root_node(), self._file_tree.get_root_name()
+        for component in dir_name.replace(node_name, '').split('/'):
+            if not component or node is None:
+                continue
+            node_name = FileUtil.join_paths_to_dir(root_dir=node_name, base_name=component)
+            node = node.get_child(node_name)
+        return node
+
+    def _get_expired_partitions(self):
+        partitions = self._get_partitions_in_range(
+            start_time=datetime.datetime(1, 1, 1),
+            end_time=datetime.datetime(9999, 12, 31, 23, 59)
+        )
+        # The latest partition is always kept for the writers.
+        partitions = partitions[:-1]
+        expired_partitions = set()
+        if self._retention_policy['max_num_partitions'] > 0:
+            expired_partitions.update(partitions[:max(0, len(partitions) + 1 -
+                                                      self._retention_policy['max_num_partitions'])])
+        if self._retention_policy['max_age'] is not None:
+            if self._retention_policy['timezone'] == 'UTC':
+                cur_time = TimezoneUtil.cur_time_in_utc()
+            elif self._retention_policy['timezone'] == 'EST':
+                cur_time = TimezoneUtil.cur_time_in_est()
+            else:
+                cur_time = TimezoneUtil.cur_time_in_pst()
+            cutoff_time = self._reformat_time(cur_time - self._retention_policy['max_age'])
+            expired_partitions.update(partition for partition in partitions
+                                      if self.get_dir_in_timestamp(dir_name=partition) < cutoff_time)
+        return sorted(expired_partitions)
+
+    def _remove_partition(self, dir_name):
+        root_name = self._file_tree.get_root_name()
+        while dir_name != root_name:
+            self.increment_rpc_count_by(n=1)
+            FileUtil.remove_dir_recursively(dir_name=dir_name)
+            with self._tree_lock:
+                node = self._find_partition_node(dir_name=dir_name)
+                if node is not None:
+                    self._file_tree.delete_node(node=node)
+            self._SYS_LOGGER.info("Removed dir [" + dir_name + '].')
+            dir_name = FileUtil.normalize_dir_name(dir_name=FileUtil.dir_name(file_name=dir_name[:-1]))
+            if dir_name == root_name:
+                return
+            self.increment_rpc_count_by(n=1)
+            if not FileUtil.is_dir_empty(dir_name=dir_name):
+                return
+
+    def _remove_expired_partitions(self, max_deletions_per_sec):
+        removed_partitions = []
+        for partition in self._get_expired_partitions():
+            if removed_partitions and max_deletions_per_sec > 0 and \
+                    self._garbage_collection_stop_event.wait(1.0 / max_deletions_per_sec):
+                break
+            self._remove_partition(dir_name=partition)
+            removed_partitions.append(partition)
+        return removed_partitions
+
+    def garbage_collect(self, max_deletions_per_sec=-1):
+        self._refresh_file_tree()
+        if self._retention_policy['max_num_partitions'] < 0 and self._retention_policy['max_age'] is None:
+            return []
+        try:
+            if self._config.get('file_lock', False):
+                # The lock file is kept under the root directory, so that it moves and is removed with the partitions.
+                with FileLockTool(protected_file_path=FileUtil.join_paths_to_file(
+                        root_dir=self.get_dir_name(), base_name=self.GARBAGE_COLLECTION_LOCK_NAME)):
+                    removed_partitions = self._remove_expired_partitions(max_deletions_per_sec=max_deletions_per_sec)
+            else:
+                removed_partitions = self._remove_expired_partitions(max_deletions_per_sec=max_deletions_per_sec)
+            if removed_partitions:
+                self._SYS_LOGGER.info("Removed [" + str(len(removed_partitions)) + "] partitions from dir [" +
+                                      self.get_dir_name() + '].')
+                self._notify_write()
+            return removed_partitions
+        except Exception as err:
+            self._SYS_LOGGER.error("Garbage collect dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Garbage collect dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageDeleteException("Garbage collect dir [" + self.get_dir_name() + "] got exception: " +
+                                         str(err) + '.')
+
+    def _run_garbage_collection(self, interval, max_deletions_per_sec):
+        while not self._garbage_collection_stop_event.is_set():
+            try:
+                self.garbage_collect(max_deletions_per_sec=max_deletions_per_sec)
+            except StorageDeleteException as _:
+                pass
+            self._garbage_collection_stop_event.wait(interval)
+
+    def start_garbage_collection(self, interval, max_deletions_per_sec=-1):
+        if self._garbage_collection_thread and self._garbage_collection_thread.is_alive():
+            return
+        self._garbage_collection_stop_event.clear()
+        self._garbage_collection_thread = threading.Thread(
+            target=self._run_garbage_collection,
+            kwargs={'interval': interval, 'max_deletions_per_sec': max_deletions_per_sec},
+            name='garbage_collection_thread'
+        )
+        self._garbage_collection_thread.daemon = True
+        self._garbage_collection_thread.start()
+
+    def stop_garbage_collection(self):
+        self._garbage_collection_stop_event.set()
+        if self._garbage_collection_thread:
+            self._garbage_collection_thread.join()
+            self._garbage_collection_thread = None
+
+    def _get_next_segment_file_name(self, dir_name):
+        if self._config.get('file_lock', False) or self._segment_file_name is None or \
+                FileUtil.dir_name(file_name=self._segment_file_name) + '/' != dir_name:
+            # A new writer of a partition never appends to the segments of the other writers.
+            segment_file_names = self._list_segment_files(dir_name=dir_name)
+            segment_index = self._get_segment_index(file_name=segment_file_names[-1]) if segment_file_names else 0
+        else:
+            segment_index = self._get_segment_index(file_name=self._segment_file_name)
+        return FileUtil.join_paths_to_file(
+            root_dir=dir_name,
+            base_name=self.SEGMENT_FILE_PREFIX + '%05d' % (segment_index + 1) + self.SEGMENT_FILE_SUFFIX
+        )
+
+    def _roll_segment(self, dir_name):
+        if self._config.get('file_lock', False):
+            # The new segment is created under the lock of the partition so that it is not picked by other writers.
+            with FileLockTool(protected_file_path=dir_name):
+                self._segment_file_name = self._get_next_segment_file_name(dir_name=dir_name)
+                self.increment_rpc_count_by(n=1)
+                FileUtil.create_file_if_not_exist(file_name=self._segment_file_name)
+        else:
+            self._segment_file_name = self._get_next_segment_file_name(dir_name=dir_name)
+        self._segment_size = 0
+        self._segment_start_time = time.time()
+        self._SYS_LOGGER.info("Rolling to new segment [" + self._segment_file_name + '].')
+
+    def _append_to_segment(self, data):
+        assert isinstance(data, dict), "Data written to segment files needs to be a dictionary."
+        dir_name = self._get_latest_dir_internal()
+        if self._segment_file_name is None or FileUtil.dir_name(file_name=self._segment_file_name) + '/' != dir_name:
+            self._roll_segment(dir_name=dir_name)
+        elif 0 < self._segment_config['max_segment_size'] <= self._segment_size or \
+                0 < self._segment_config['max_segment_seconds'] <= time.time() - self._segment_start_time:
+            self._roll_segment(dir_name=dir_name)
+
+        log_record = ProtoTableLogRecord()
+        for key, val in data.items():
+            log_record.data[key].CopyFrom(val if isinstance(val, Any) else ProtoUtil.message_to_any(message=val))
+        log_record.updated_time = str(TimezoneUtil.cur_time_in_pst())
+        self.increment_rpc_count_by(n=1)
+        FileUtil.append_delimited_protos_to_file(protos=[log_record], file_name=self._segment_file_name)
+        self._segment_size += log_record.ByteSize()
+
     def make_new_partition(self, timestamp):
-        new_dir_list = FileUtil.parse_timestamp_to_dir(timestamp=timestamp).split('/')
-        for i in range(1, self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE] + 1):
-            new_dir = '/'.join(new_dir_list[:i])
-            child_node_name = FileUtil.join_paths_to_dir(
-                root_dir=self._file_tree.get_root_name(),
-                base_name=new_dir
-            )
-            if not self._file_tree.find_node(child_node_name):
-                parent_node_name = FileUtil.join_paths_to_dir(
+        with self._tree_lock:
+            new_dir_list = FileUtil.parse_timestamp_to_dir(timestamp=timestamp).split('/')
+            for i in range(1, self.PARTITIONER_TYPE_TO_HEIGHT_MAP[self.PARTITIONER_TYPE] + 1):
+                new_dir = '/'.join(new_dir_list[:i])
+                child_node_name = FileUtil.join_paths_to_dir(
                     root_dir=self._file_tree.get_root_name(),
-                    base_name='/'.join(new_dir_list[:i-1]) if i > 1 else ''
-                )
-                parent_node = self._file_tree.find_node(node_name=parent_node_name)
-                child_node = OrderedNodeBase(
-                    node_name=child_node_name
+                    base_name=new_dir
                 )
+                if not self._file_tree.find_node(child_node_name):
+                    parent_node_name = FileUtil.join_paths_to_dir(
+                        root_dir=self._file_tree.get_root_name(),
+                        base_name='/'.join(new_dir_list[:i-1]) if i > 1 else ''
+                    )
+                    parent_node = self._file_tree.find_node(node_name=parent_node_name)
+                    child_node = OrderedNodeBase(
+                        node_name=child_node_name
+                    )
 
-                assert parent_node is not None, "Parent node at least needs to exist."
-                self._file_tree.add_node(
-                    parent_node=parent_node,
-                    child_node=child_node,
-                    order=SortOrder.REVERSE
-                )
+                    assert parent_node is not None, "Parent node at least needs to exist."
+                    self._file_tree.add_node(
+                        parent_node=parent_node,
+                        child_node=child_node,
+                        order=SortOrder.REVERSE
+                    )
 
-        self._file_tree.trim_tree(max_capacity=self._max_capacity)
+            self._file_tree.trim_tree(max_capacity=self._max_capacity)
 
     def write(self, data, params=None):
         to_make_partition = True
@@ -445,8 +837,24 @@ class PartitionerBase(StorageBase):
             elif params['timezone'] == 'EST':
                 self.make_new_partition(timestamp=TimezoneUtil.cur_time_in_est())
 
+        if self._segment_config is not None:
+            if params and (not params.get('overwrite', True) or params.get('base_name', 'data.pb') != 'data.pb'):
+                self._SYS_LOGGER.error("Params overwrite=False and base_name are not supported with segment files.")
+                self._logger.error("Params overwrite=False and base_name are not supported with segment files.")
+                raise StorageWriteException("Params overwrite=False and base_name are not supported with segment "
+                                            "files.")
+            try:
+                self._append_to_segment(data=data)
+                self._notify_write()
+                return
+            except Exception as err:
+                self._SYS_LOGGER.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Write to dir [" + self.get_dir_name() + "] got exception: " +
+                                            str(err) + '.')
+
         file_name = FileUtil.join_paths_to_file(
-            root_dir=self._file_tree.get_leftmost_leaf(),
+            root_dir=self._get_latest_dir_internal(),
             base_name=file_base_name)
 
         if file_name != self._underlying_storage.get_file_name():
@@ -458,6 +866,7 @@ class PartitionerBase(StorageBase):
         try:
             self._underlying_storage.write(data=data, params=params)
             self.increment_rpc_count_by(n=self._underlying_storage.get_rpc_call_count_and_reset())
+            self._notify_write()
         except Exception as err:
             self._SYS_LOGGER.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
             self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
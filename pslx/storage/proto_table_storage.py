@@ -1,19 +1,81 @@
+import bisect
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from collections.abc import Mapping
+from google.protobuf.any_pb2 import Any
 from pslx.core.exception import StorageReadException, StorageWriteException, StorageDeleteException
-from pslx.schema.enums_pb2 import StorageType
-from pslx.schema.storage_pb2 import ProtoTable
+from pslx.schema.enums_pb2 import CompressionType, StorageType
+from pslx.schema.storage_pb2 import ProtoTable, ProtoTableLogRecord, ProtoTableSecondaryIndex
 from pslx.storage.storage_base import StorageBase
+from pslx.tool.file_lock_tool import FileLockTool
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 from pslx.util.timezone_util import TimezoneUtil
 
 
+class LazyProtoTableView(Mapping):
+    def __init__(self, any_data, message_type):
+        self._any_data = any_data
+        self._message_type = message_type
+        self._decoded_data = {}
+
+    def __getitem__(self, key):
+        if key not in self._decoded_data:
+            self._decoded_data[key] = ProtoUtil.any_to_message(
+                message_type=self._message_type,
+                any_message=self._any_data[key]
+            )
+        return self._decoded_data[key]
+
+    def __contains__(self, key):
+        return key in self._any_data
+
+    def __iter__(self):
+        return iter(self._any_data)
+
+    def __len__(self):
+        return len(self._any_data)
+
+    def get_message_type(self):
+        return self._message_type
+
+    def get_any_message(self, key):
+        return self._any_data[key]
+
+    def get_num_decoded(self):
+        return len(self._decoded_data)
+
+
 class ProtoTableStorage(StorageBase):
     STORAGE_TYPE = StorageType.PROTO_TABLE_STORAGE
+    LOG_FILE_SUFFIX = '.log'
+    INDEX_FILE_SUFFIX = '.index'
+    MAX_KEY_INDEX_POPS = 256
 
     def __init__(self, logger=None):
         super().__init__(logger=logger)
         self._file_name = None
+        self._log_file_name = None
+        self._index_file_name = None
         self._table_message = None
+        self._secondary_indexes = {}
+        self._secondary_indexes_changed = False
+        self._unresolved_field_indexes = {}
+        self._log_mutated_keys = set()
+        self._sorted_keys = []
+        self._added_keys = set()
+        self._removed_keys = set()
+        self._num_log_records = 0
+        self._batch_config = None
+        self._change_signature = None
+        self._reset_pending_mutations()
+        self._config = {
+            'write_ahead_log': False,
+            'compaction_threshold': 1000,
+            'compression_type': CompressionType.NO_COMPRESSION,
+            'file_lock': False,
+        }
 
     def initialize_from_dir(self, dir_name):
         self._SYS_LOGGER.fatal("Initialize_from_dir function is not implemented for storage type "
@@ -21,10 +83,15 @@ class ProtoTableStorage(StorageBase):
         return
 
     def initialize_from_file(self, file_name):
+        if self._num_pending_mutations > 0:
+            self.flush()
         if '.pb' not in file_name:
             self._SYS_LOGGER.warning("Please use .pb extension for proto files.")
 
         self._file_name = FileUtil.normalize_file_name(file_name=file_name)
+        # The signature is taken before the files are parsed, so that a change made during the load is seen by the
+        # next refresh_if_changed.
+        change_signature = [self._get_file_attr(file_name=self._file_name)]
         self._table_message = FileUtil.read_proto_from_file(
             proto_type=ProtoTable,
             file_name=self._file_name
@@ -39,9 +106,445 @@ class ProtoTableStorage(StorageBase):
         if not self._table_message.created_time:
             self._table_message.created_time = str(TimezoneUtil.cur_time_in_pst())
 
+        self._log_file_name = self._file_name + self.LOG_FILE_SUFFIX
+        self._num_log_records = 0
+        self._log_mutated_keys = set()
+        if self._table_message.write_ahead_log:
+            change_signature.append(self._get_file_attr(file_name=self._log_file_name))
+            self.increment_rpc_count_by(n=1)
+            self._num_log_records = self.replay_log(
+                table_message=self._table_message,
+                log_file_name=self._log_file_name,
+                mutated_keys=self._log_mutated_keys
+            )
+        self._change_signature = None if None in change_signature else change_signature
+        self._reset_key_index()
+        self._index_file_name = self._file_name + self.INDEX_FILE_SUFFIX
+        self._secondary_indexes_changed = False
+        self._load_secondary_indexes()
+
+    def _get_file_attr(self, file_name):
+        self.increment_rpc_count_by(n=1)
+        try:
+            return FileUtil.get_file_attr(file_name=file_name)
+        except Exception as err:
+            self._SYS_LOGGER.warning("Getting attributes of file [" + file_name + "] got exception: " + str(err) + '.')
+            return None
+
+    def _get_change_signature(self):
+        self.increment_rpc_count_by(n=1)
+        change_signature = [FileUtil.get_file_attr(file_name=self._file_name)]
+        if self._table_message is not None and self._table_message.write_ahead_log:
+            self.increment_rpc_count_by(n=1)
+            change_signature.append(FileUtil.get_file_attr(file_name=self._log_file_name))
+        return change_signature
+
+    def refresh_if_changed(self):
+        assert self._file_name is not None
+        try:
+            change_signature = self._get_change_signature()
+        except Exception as err:
+            self._SYS_LOGGER.warning("Getting attributes of file [" + self.get_file_name() + "] got exception: " +
+                                     str(err) + '.')
+            change_signature = None
+
+        if change_signature is not None and change_signature == self._change_signature:
+            self._SYS_LOGGER.info("File [" + self.get_file_name() + "] is unchanged since the last load.")
+            return False
+
+        self.initialize_from_file(file_name=self._file_name)
+        return True
+
+    @classmethod
+    def replay_log(cls, table_message, log_file_name, mutated_keys=None):
+        log_records = FileUtil.read_delimited_protos_from_file(
+            proto_type=ProtoTableLogRecord,
+            file_name=log_file_name
+        )
+        for log_record in log_records:
+            if log_record.delete_all:
+                if mutated_keys is not None:
+                    mutated_keys.update(table_message.data.keys())
+                table_message.data.clear()
+            for key in log_record.deleted_keys:
+                if key in table_message.data:
+                    del table_message.data[key]
+            for key, val in log_record.data.items():
+                table_message.data[key].CopyFrom(val)
+            if mutated_keys is not None:
+                mutated_keys.update(log_record.deleted_keys)
+                mutated_keys.update(log_record.data.keys())
+            if log_record.updated_time:
+                table_message.updated_time = log_record.updated_time
+        return len(log_records)
+
+    def replay_log_files(self, log_file_names):
+        mutated_keys = set()
+        for log_file_name in log_file_names:
+            self.increment_rpc_count_by(n=1)
+            self.replay_log(table_message=self._table_message, log_file_name=log_file_name, mutated_keys=mutated_keys)
+        if log_file_names:
+            self._reset_key_index()
+            self._reindex_keys(keys=mutated_keys)
+
     def get_file_name(self):
         return self._file_name
 
+    def get_num_log_records(self):
+        return self._num_log_records
+
+    def _write_snapshot(self):
+        had_log = self._table_message.write_ahead_log
+        self._table_message.write_ahead_log = self._config['write_ahead_log']
+        # The index file stays valid as long as the indexed entries do not change. Without a maintained index, the
+        # time is moved forward so that an index file written by another process is rebuilt.
+        is_index_maintained = self._secondary_indexes and not self._unresolved_field_indexes
+        if not is_index_maintained or self._secondary_indexes_changed:
+            self._table_message.index_updated_time = self._table_message.updated_time
+        self.increment_rpc_count_by(n=1)
+        FileUtil.write_proto_to_file(
+            proto=self._table_message,
+            file_name=self._file_name,
+            compression_type=self._config['compression_type']
+        )
+        self._log_mutated_keys = set()
+        if self._secondary_indexes and (self._secondary_indexes_changed or self._unresolved_field_indexes):
+            self._write_secondary_indexes()
+        if had_log or self._table_message.write_ahead_log:
+            try:
+                self.increment_rpc_count_by(n=1)
+                FileUtil.remove_file(file_name=self._log_file_name)
+            except Exception as err:
+                self._SYS_LOGGER.info("Removing log file [" + self._log_file_name + "] got exception: " +
+                                      str(err) + '.')
+        self._num_log_records = 0
+        self._reset_pending_mutations()
+
+    def _reset_pending_mutations(self):
+        self._pending_upserted_keys = set()
+        self._pending_deleted_keys = set()
+        self._pending_snapshot = False
+        self._num_pending_mutations = 0
+        self._num_pending_bytes = 0
+        self._pending_start_time = None
+
+    def is_batching(self):
+        return self._batch_config is not None
+
+    def get_num_pending_mutations(self):
+        return self._num_pending_mutations
+
+    def begin_batch(self, max_count=-1, max_bytes=-1, max_seconds=-1):
+        if self._batch_config is not None:
+            self._SYS_LOGGER.warning("File [" + str(self.get_file_name()) + "] is already in batch mode.")
+        self._batch_config = {
+            'max_count': max_count,
+            'max_bytes': max_bytes,
+            'max_seconds': max_seconds,
+        }
+
+    def end_batch(self):
+        try:
+            self.flush()
+        finally:
+            self._batch_config = None
+
+    @contextmanager
+    def batch(self, max_count=-1, max_bytes=-1, max_seconds=-1):
+        self.begin_batch(max_count=max_count, max_bytes=max_bytes, max_seconds=max_seconds)
+        try:
+            yield self
+        finally:
+            self.end_batch()
+
+    def flush(self):
+        if self._num_pending_mutations == 0:
+            return
+        with self._file_lock(refresh=False):
+            try:
+                if self._config['file_lock'] and not self._pending_snapshot:
+                    self._refresh_with_pending_mutations()
+                if self._pending_snapshot:
+                    self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+                    self._write_snapshot()
+                else:
+                    self._commit(
+                        upserted_keys=list(self._pending_upserted_keys),
+                        deleted_keys=list(self._pending_deleted_keys)
+                    )
+                self._reset_pending_mutations()
+            except Exception as err:
+                self._SYS_LOGGER.error("Flush file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Flush file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Flush file [" + self.get_file_name() + "] got exception: " +
+                                            str(err) + '.')
+
+    def _refresh_with_pending_mutations(self):
+        change_signature = self._get_change_signature()
+        if change_signature == self._change_signature:
+            return
+        # Another process changed the table during the batch, so the table is reloaded and only the keys mutated in
+        # the batch are applied on top of it.
+        upserted_data = {}
+        for key in self._pending_upserted_keys:
+            if key in self._table_message.data:
+                upserted_data[key] = Any()
+                upserted_data[key].CopyFrom(self._table_message.data[key])
+        deleted_keys = list(self._pending_deleted_keys)
+        num_pending_mutations = self._num_pending_mutations
+        self._num_pending_mutations = 0
+        self.initialize_from_file(file_name=self._file_name)
+        self._num_pending_mutations = num_pending_mutations
+
+        for key, any_message in upserted_data.items():
+            if key not in self._table_message.data:
+                self._add_to_key_index(key=key)
+            self._table_message.data[key].CopyFrom(any_message)
+            for field in self._secondary_indexes:
+                self._add_to_secondary_index(field=field, key=key, proto_message=any_message)
+        for key in deleted_keys:
+            if key in self._table_message.data:
+                del self._table_message.data[key]
+                self._remove_from_key_index(key=key)
+                self._remove_from_secondary_indexes(key=key)
+
+    @contextmanager
+    def _file_lock(self, refresh=True):
+        if not self._config['file_lock'] or (refresh and self._batch_config is not None):
+            yield
+            return
+        with FileLockTool(protected_file_path=self._file_name):
+            # The table is reloaded under the lock if another process changed it, so that no update is lost.
+            if refresh:
+                self.refresh_if_changed()
+            yield
+            self._change_signature = self._get_change_signature()
+
+    def _should_flush(self):
+        if self._num_pending_mutations >= self._batch_config['max_count'] > 0:
+            return True
+        if self._num_pending_bytes >= self._batch_config['max_bytes'] > 0:
+            return True
+        if self._batch_config['max_seconds'] > 0 and \
+                time.time() - self._pending_start_time >= self._batch_config['max_seconds']:
+            return True
+        return False
+
+    def _persist(self, upserted_keys=(), deleted_keys=(), snapshot=False):
+        if self._batch_config is None:
+            if snapshot:
+                self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+                self._write_snapshot()
+            else:
+                self._commit(upserted_keys=upserted_keys, deleted_keys=deleted_keys)
+            return
+
+        if self._num_pending_mutations == 0:
+            self._pending_start_time = time.time()
+        self._num_pending_mutations += 1
+        if snapshot:
+            self._pending_snapshot = True
+        for key in upserted_keys:
+            self._pending_deleted_keys.discard(key)
+            self._pending_upserted_keys.add(key)
+            if key in self._table_message.data:
+                self._num_pending_bytes += self._table_message.data[key].ByteSize()
+        for key in deleted_keys:
+            self._pending_upserted_keys.discard(key)
+            self._pending_deleted_keys.add(key)
+        if self._should_flush():
+            self.flush()
+
+    def _commit(self, upserted_keys=(), deleted_keys=()):
+        self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+        if not self._config['write_ahead_log'] or not self._table_message.write_ahead_log:
+            self._write_snapshot()
+            return
+
+        log_record = ProtoTableLogRecord()
+        for key in upserted_keys:
+            if key in self._table_message.data:
+                log_record.data[key].CopyFrom(self._table_message.data[key])
+        for key in deleted_keys:
+            log_record.deleted_keys.append(key)
+        log_record.updated_time = self._table_message.updated_time
+        self.increment_rpc_count_by(n=1)
+        FileUtil.append_delimited_protos_to_file(
+            protos=[log_record],
+            file_name=self._log_file_name
+        )
+        self._num_log_records += 1
+        # The index file is only written together with the table file, and the keys mutated in the log since then are
+        # re-indexed when the index is loaded.
+        self._log_mutated_keys.update(upserted_keys)
+        self._log_mutated_keys.update(deleted_keys)
+        if self._num_log_records >= int(self._config['compaction_threshold']) > 0:
+            self._SYS_LOGGER.info("Compacting log file [" + self._log_file_name + "] with " +
+                                  str(self._num_log_records) + " records.")
+            self._write_snapshot()
+
+    def compact(self):
+        with self._file_lock():
+            try:
+                self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+                self._write_snapshot()
+            except Exception as err:
+                self._SYS_LOGGER.error("Compact file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Compact file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Compact file [" + self.get_file_name() + "] got exception: " +
+                                            str(err) + '.')
+
+    def add_index(self, field, message_type):
+        assert self._table_message is not None
+        ProtoUtil.get_field_descriptor_by_path(message_type=message_type, field_path=field)
+        if field in self._secondary_indexes and self._secondary_indexes[field]['message_type'] == message_type:
+            return
+        self._declare_secondary_index(field=field, message_type=message_type)
+        self._load_secondary_indexes(fields=[field])
+
+    def get_index_fields(self):
+        return list(self._secondary_indexes.keys())
+
+    def _declare_secondary_index(self, field, message_type):
+        self._secondary_indexes[field] = {
+            'message_type': message_type,
+            'value_to_keys': defaultdict(set),
+            'key_to_values': {},
+        }
+
+    @classmethod
+    def read_index_declarations(cls, index_message):
+        declarations, unresolved_field_indexes = {}, {}
+        for field, field_index in index_message.field_indexes.items():
+            try:
+                declarations[field] = ProtoUtil.infer_message_type_from_full_name(full_name=field_index.message_type)
+            except Exception as err:
+                cls._SYS_LOGGER.warning("Message type [" + field_index.message_type + "] of index [" + field +
+                                        "] cannot be imported with exception: " + str(err) + '.')
+                unresolved_field_indexes[field] = field_index
+        return declarations, unresolved_field_indexes
+
+    def _load_secondary_indexes(self, fields=None):
+        self.increment_rpc_count_by(n=1)
+        index_message = FileUtil.read_proto_from_file(
+            proto_type=ProtoTableSecondaryIndex,
+            file_name=self._index_file_name
+        )
+        if index_message is None:
+            index_message = ProtoTableSecondaryIndex()
+        # The indexes declared in the index file are declared again, so that they are maintained by every process.
+        declarations, unresolved_field_indexes = self.read_index_declarations(index_message=index_message)
+        self._unresolved_field_indexes = {field: field_index for field, field_index in unresolved_field_indexes.items()
+                                          if field not in self._secondary_indexes}
+        for field, message_type in declarations.items():
+            if field not in self._secondary_indexes:
+                self._declare_secondary_index(field=field, message_type=message_type)
+                if fields is not None:
+                    fields.append(field)
+        if fields is None:
+            fields = list(self._secondary_indexes.keys())
+
+        is_stale = False
+        for field in fields:
+            secondary_index = self._secondary_indexes[field]
+            secondary_index['value_to_keys'] = defaultdict(set)
+            secondary_index['key_to_values'] = {}
+            message_type = secondary_index['message_type']
+            field_index = index_message.field_indexes[field] if field in index_message.field_indexes else None
+            if field_index is not None and field_index.message_type == message_type.DESCRIPTOR.full_name and \
+                    field_index.updated_time == self._table_message.index_updated_time:
+                for value, key_list in field_index.value_to_keys.items():
+                    for key in key_list.keys:
+                        secondary_index['value_to_keys'][value].add(key)
+                        secondary_index['key_to_values'].setdefault(key, []).append(value)
+                continue
+
+            self._SYS_LOGGER.info("Building index of field [" + field + "] for file [" + self.get_file_name() + '].')
+            is_stale = True
+            for key, any_message in self._table_message.data.items():
+                self._add_to_secondary_index(field=field, key=key, proto_message=any_message)
+
+        # The index file matches the snapshot, so the keys mutated in the log since then are indexed again.
+        self._reindex_keys(keys=self._log_mutated_keys, fields=fields)
+        if is_stale and self._table_message.data and not self._log_mutated_keys:
+            self._write_secondary_indexes()
+
+    def _reindex_keys(self, keys, fields=None):
+        if fields is None:
+            fields = list(self._secondary_indexes.keys())
+        for field in fields:
+            for key in keys:
+                if key in self._table_message.data:
+                    self._add_to_secondary_index(field=field, key=key, proto_message=self._table_message.data[key])
+                else:
+                    self._remove_from_secondary_index(field=field, key=key)
+
+    def _add_to_secondary_index(self, field, key, proto_message):
+        secondary_index = self._secondary_indexes[field]
+        if isinstance(proto_message, Any):
+            proto_message = ProtoUtil.any_to_message(message_type=secondary_index['message_type'],
+                                                     any_message=proto_message)
+        values = []
+        if proto_message is not None and \
+                proto_message.DESCRIPTOR.full_name == secondary_index['message_type'].DESCRIPTOR.full_name:
+            values = [str(value) for value in ProtoUtil.get_values_by_field_path(proto_message=proto_message,
+                                                                                 field_path=field)]
+        if secondary_index['key_to_values'].get(key, []) == values:
+            return
+        self._remove_from_secondary_index(field=field, key=key)
+        for value in values:
+            secondary_index['value_to_keys'][value].add(key)
+        if values:
+            secondary_index['key_to_values'][key] = values
+        self._secondary_indexes_changed = True
+
+    def _remove_from_secondary_index(self, field, key):
+        secondary_index = self._secondary_indexes[field]
+        values = secondary_index['key_to_values'].pop(key, [])
+        for value in values:
+            secondary_index['value_to_keys'][value].discard(key)
+            if not secondary_index['value_to_keys'][value]:
+                del secondary_index['value_to_keys'][value]
+        if values:
+            self._secondary_indexes_changed = True
+
+    def _remove_from_secondary_indexes(self, key):
+        for field in self._secondary_indexes:
+            self._remove_from_secondary_index(field=field, key=key)
+
+    def _write_secondary_indexes(self):
+        if not self._secondary_indexes:
+            return
+        index_message = ProtoTableSecondaryIndex()
+        index_message.updated_time = self._table_message.index_updated_time
+        for field, secondary_index in self._secondary_indexes.items():
+            field_index = index_message.field_indexes[field]
+            field_index.message_type = secondary_index['message_type'].DESCRIPTOR.full_name
+            field_index.updated_time = self._table_message.index_updated_time
+            for value, keys in secondary_index['value_to_keys'].items():
+                field_index.value_to_keys[value].keys.extend(sorted(keys))
+        # The indexes whose message type cannot be imported keep their old time, so they are rebuilt when loaded.
+        for field, field_index in self._unresolved_field_indexes.items():
+            index_message.field_indexes[field].CopyFrom(field_index)
+        self.increment_rpc_count_by(n=1)
+        FileUtil.write_proto_to_file(
+            proto=index_message,
+            file_name=self._index_file_name,
+            compression_type=self._config['compression_type']
+        )
+        self._secondary_indexes_changed = False
+
+    def read_by_index(self, field, value, message_type=None):
+        if field not in self._secondary_indexes:
+            self._SYS_LOGGER.error("Field [" + field + "] is not indexed in file [" + self.get_file_name() + '].')
+            self._logger.error("Field [" + field + "] is not indexed in file [" + self.get_file_name() + '].')
+            raise StorageReadException("Field [" + field + "] is not indexed in file [" + self.get_file_name() + '].')
+        keys = sorted(self._secondary_indexes[field]['value_to_keys'].get(str(value), []))
+        if message_type:
+            return {key: ProtoUtil.any_to_message(message_type=message_type, any_message=self._table_message.data[key])
+                    for key in keys}
+        return {key: self._table_message.data[key] for key in keys}
+
     def get_num_entries(self):
         return len(self._table_message.data)
 
@@ -78,49 +581,182 @@ class ProtoTableStorage(StorageBase):
             self._logger.error("Read all Got exception: " + str(err) + '.')
             raise StorageReadException
 
-    def delete(self, key):
+    def _reset_key_index(self):
+        self._sorted_keys = sorted(self._table_message.data.keys())
+        self._added_keys = set()
+        self._removed_keys = set()
+
+    def _add_to_key_index(self, key):
+        if key in self._removed_keys:
+            self._removed_keys.discard(key)
+        else:
+            self._added_keys.add(key)
+
+    def _remove_from_key_index(self, key):
+        if key in self._added_keys:
+            self._added_keys.discard(key)
+        else:
+            self._removed_keys.add(key)
+
+    def _get_sorted_keys(self):
+        if len(self._removed_keys) > self.MAX_KEY_INDEX_POPS:
+            self._sorted_keys = [key for key in self._sorted_keys if key not in self._removed_keys]
+        else:
+            for key in self._removed_keys:
+                index = bisect.bisect_left(self._sorted_keys, key)
+                if index < len(self._sorted_keys) and self._sorted_keys[index] == key:
+                    self._sorted_keys.pop(index)
+        if self._added_keys:
+            self._sorted_keys.extend(self._added_keys)
+            self._sorted_keys.sort()
+        self._added_keys = set()
+        self._removed_keys = set()
+        return self._sorted_keys
+
+    def get_min_key(self):
+        sorted_keys = self._get_sorted_keys()
+        if sorted_keys:
+            return sorted_keys[0]
+        else:
+            return None
+
+    def get_max_key(self):
+        sorted_keys = self._get_sorted_keys()
+        if sorted_keys:
+            return sorted_keys[-1]
+        else:
+            return None
+
+    def read_range(self, params=None):
+        if not params:
+            params = {}
+        sorted_keys = self._get_sorted_keys()
+        start_index, end_index = 0, len(sorted_keys)
+        if params.get('start_key', None) is not None:
+            start_index = bisect.bisect_left(sorted_keys, params['start_key'])
+        if params.get('end_key', None) is not None:
+            end_index = bisect.bisect_right(sorted_keys, params['end_key'])
+        limit = params.get('limit', -1)
+        if params.get('reverse', False):
+            keys = sorted_keys[max(start_index, end_index - limit) if limit >= 0 else start_index:end_index]
+            keys = keys[::-1]
+        else:
+            keys = sorted_keys[start_index:min(end_index, start_index + limit) if limit >= 0 else end_index]
+
         try:
-            self.delete_multiple(keys=[key])
+            result = {}
+            for key in keys:
+                if 'message_type' in params:
+                    result[key] = ProtoUtil.any_to_message(
+                        message_type=params['message_type'],
+                        any_message=self._table_message.data[key]
+                    )
+                else:
+                    result[key] = self._table_message.data[key]
+            return result
         except Exception as err:
-            self._SYS_LOGGER.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
-            self._logger.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
-            raise StorageDeleteException("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
+            self._SYS_LOGGER.error("Read range of file [" + self.get_file_name() + "] got exception: " +
+                                   str(err) + '.')
+            self._logger.error("Read range of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+            raise StorageReadException("Read range of file [" + self.get_file_name() + "] got exception: " +
+                                       str(err) + '.')
 
-    def delete_multiple(self, keys):
-        for key in keys:
-            if key in self._table_message.data:
-                del self._table_message.data[key]
+    def iter_items(self, message_type=None, batch_size=-1):
+        batch = {}
+        for key in list(self._get_sorted_keys()):
+            if key not in self._table_message.data:
+                continue
+            value = self._table_message.data[key]
+            if message_type:
+                value = ProtoUtil.any_to_message(message_type=message_type, any_message=value)
+            if batch_size > 0:
+                batch[key] = value
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = {}
+            else:
+                yield key, value
+        if batch:
+            yield batch
 
+    def read_all_lazy(self, message_type):
         try:
-            self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
-            self.increment_rpc_count_by(n=1)
-            FileUtil.write_proto_to_file(
-                proto=self._table_message,
-                file_name=self._file_name
+            return LazyProtoTableView(
+                any_data=dict(self._table_message.data),
+                message_type=message_type
             )
+        except Exception as err:
+            self._SYS_LOGGER.error("Read all lazy got exception: " + str(err) + '.')
+            self._logger.error("Read all lazy got exception: " + str(err) + '.')
+            raise StorageReadException
+
+    def to_columns(self, message_type, fields=None):
+        try:
+            return ProtoUtil.any_messages_to_columns(
+                message_type=message_type,
+                any_messages={key: self._table_message.data[key] for key in self._get_sorted_keys()},
+                fields=fields
+            )
+        except Exception as err:
+            self._SYS_LOGGER.error("To columns of file [" + self.get_file_name() + "] got exception: " +
+                                   str(err) + '.')
+            self._logger.error("To columns of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+            raise StorageReadException("To columns of file [" + self.get_file_name() + "] got exception: " +
+                                       str(err) + '.')
+
+    def to_dataframe(self, message_type, fields=None):
+        import pandas as pd
+
+        columns = self.to_columns(message_type=message_type, fields=fields)
+        return pd.DataFrame(columns).set_index('key')
+
+    def delete(self, key):
+        try:
+            self.delete_multiple(keys=[key])
         except Exception as err:
             self._SYS_LOGGER.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
             self._logger.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
             raise StorageDeleteException("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
 
+    def delete_multiple(self, keys):
+        with self._file_lock():
+            deleted_keys = []
+            for key in keys:
+                if key in self._table_message.data:
+                    del self._table_message.data[key]
+                    self._remove_from_key_index(key=key)
+                    self._remove_from_secondary_indexes(key=key)
+                    deleted_keys.append(key)
+
+            try:
+                self._persist(deleted_keys=deleted_keys)
+            except Exception as err:
+                self._SYS_LOGGER.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
+                self._logger.error("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
+                raise StorageDeleteException("Delete file [" + self.get_file_name() + "] got exception: " + str(err))
+
     def delete_all(self):
 
-        all_keys = list(dict(self._table_message.data).keys())
-        for key in all_keys:
-            del self._table_message.data[key]
-        try:
-            self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
-            self.increment_rpc_count_by(n=1)
-            FileUtil.write_proto_to_file(
-                proto=self._table_message,
-                file_name=self._file_name
-            )
+        with self._file_lock():
+            all_keys = list(dict(self._table_message.data).keys())
+            for key in all_keys:
+                del self._table_message.data[key]
+            self._reset_key_index()
+            for secondary_index in self._secondary_indexes.values():
+                if secondary_index['key_to_values']:
+                    self._secondary_indexes_changed = True
+                secondary_index['value_to_keys'] = defaultdict(set)
+                secondary_index['key_to_values'] = {}
+            try:
+                self._persist(snapshot=True)
 
-        except Exception as err:
-            self._SYS_LOGGER.error("Delete all of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Delete all of file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            raise StorageDeleteException("Delete all of file [" + self.get_file_name() +
-                                         "] got exception: " + str(err) + '.')
+            except Exception as err:
+                self._SYS_LOGGER.error("Delete all of file [" + self.get_file_name() + "] got exception: " +
+                                       str(err) + '.')
+                self._logger.error("Delete all of file [" + self.get_file_name() + "] got exception: " +
+                                   str(err) + '.')
+                raise StorageDeleteException("Delete all of file [" + self.get_file_name() +
+                                             "] got exception: " + str(err) + '.')
 
     def write(self, data, params=None):
         if not params:
@@ -129,24 +765,30 @@ class ProtoTableStorage(StorageBase):
             params['overwrite'] = True
 
         assert isinstance(data, dict)
-        try:
-            for key, val in data.items():
-                if not params['overwrite'] and key in self._table_message.data:
-                    continue
-                any_message = ProtoUtil.message_to_any(message=val)
-                self._table_message.data[key].CopyFrom(any_message)
-            if len(self._table_message.data) > 1000:
-                self._SYS_LOGGER.warning("Warning: the table content is too large, considering using Partitioner "
-                                         "combined with proto table.")
-            self._table_message.updated_time = str(TimezoneUtil.cur_time_in_pst())
+        with self._file_lock():
+            try:
+                upserted_keys = []
+                for key, val in data.items():
+                    is_new_key = key not in self._table_message.data
+                    if not params['overwrite'] and not is_new_key:
+                        continue
+                    if isinstance(val, Any):
+                        any_message = val
+                    else:
+                        any_message = ProtoUtil.message_to_any(message=val)
+                    self._table_message.data[key].CopyFrom(any_message)
+                    if is_new_key:
+                        self._add_to_key_index(key=key)
+                    for field in self._secondary_indexes:
+                        self._add_to_secondary_index(field=field, key=key, proto_message=val)
+                    upserted_keys.append(key)
+                if len(self._table_message.data) > 1000 and not self._config['write_ahead_log']:
+                    self._SYS_LOGGER.warning("Warning: the table content is too large, considering using Partitioner "
+                                             "combined with proto table.")
+                self._persist(upserted_keys=upserted_keys)
 
-            self.increment_rpc_count_by(n=1)
-            FileUtil.write_proto_to_file(
-                proto=self._table_message,
-                file_name=self._file_name
-            )
-
-        except Exception as err:
-            self._SYS_LOGGER.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
-            raise StorageWriteException("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+            except Exception as err:
+                self._SYS_LOGGER.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to file [" + self.get_file_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Write to file [" + self.get_file_name() + "] got exception: " +
+                                            str(err) + '.')
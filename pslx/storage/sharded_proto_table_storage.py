@@ -1,21 +1,39 @@
-from collections import defaultdict
-from galaxy_py import gclient_ext
-from pslx.core.exception import StorageReadException, StorageWriteException
-from pslx.schema.enums_pb2 import StorageType
-from pslx.schema.storage_pb2 import ProtoTableIndexMap, ProtoTable
+import hashlib
+import json
+import threading
+from collections import defaultdict, deque
+from concurrent import futures
+from pslx.core.exception import StorageDeleteException, StorageReadException, StorageWriteException
+from pslx.schema.enums_pb2 import CompressionType, StorageType
+from pslx.schema.storage_pb2 import BloomFilter, ProtoTableIndexMap, ProtoTable, ProtoTableSecondaryIndex
+from pslx.schema.storage_pb2 import ReshardingCheckpoint
 from pslx.storage.proto_table_storage import ProtoTableStorage
 from pslx.storage.storage_base import StorageBase
+from pslx.tool.bloom_filter_tool import BloomFilterTool
+from pslx.tool.file_lock_tool import FileLockTool
 from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
 class ShardedProtoTableStorage(StorageBase):
     STORAGE_TYPE = StorageType.SHARDED_PROTO_TABLE_STORAGE
+    BLOOM_FILTER_FILE_SUFFIX = '.bloom'
+    RESHARDING_CHECKPOINT_FILE = 'resharding_checkpoint.pb'
 
-    def __init__(self, size_per_shard=100, logger=None):
+    def __init__(self, size_per_shard=100, logger=None, num_hash_shards=-1, num_index_segments=-1):
         super().__init__(logger=logger)
         self._dir_name = None
         self._size_per_shard = size_per_shard
+        self._num_hash_shards = num_hash_shards
+        self._num_index_segments = num_index_segments
+        self._index_segments = {}
+        self._bloom_filters = {}
+        self._config = {
+            'compression_type': CompressionType.NO_COMPRESSION,
+            'num_io_workers': 8,
+        }
+        self._secondary_indexes = {}
+        self._lock = threading.RLock()
 
     def initialize_from_file(self, file_name):
         self._SYS_LOGGER.fatal("Initialize_from_file function is not implemented for storage type "
@@ -29,6 +47,8 @@ class ShardedProtoTableStorage(StorageBase):
             base_name='index_map.pb'
         )
         self._index_map_file = FileUtil.normalize_file_name(file_name=self._index_map_file)
+        self._index_segments = {}
+        self._bloom_filters = {}
         self.increment_rpc_count_by(n=1)
         self._index_map = FileUtil.read_proto_from_file(
             proto_type=ProtoTableIndexMap,
@@ -39,11 +59,40 @@ class ShardedProtoTableStorage(StorageBase):
             self._index_map.cur_shard = 0
             assert self._size_per_shard > 0
             self._index_map.size_per_shard = self._size_per_shard
+            if self._num_hash_shards > 0:
+                self._index_map.num_hash_shards = self._num_hash_shards
+                self._index_map.cur_shard = self._num_hash_shards - 1
+            elif self._num_index_segments > 0:
+                self._index_map.num_index_segments = self._num_index_segments
         else:
             if self._size_per_shard and self._index_map.size_per_shard != self._size_per_shard:
                 self._logger.error("Please use the correct size per shard of [" + str(self._size_per_shard) + '].')
             self._size_per_shard = self._index_map.size_per_shard
             self._logger.info("Using size per shard of [" + str(self._size_per_shard) + '].')
+            if self._num_hash_shards > 0 and self._index_map.num_hash_shards != self._num_hash_shards:
+                self._logger.error("Please use the correct number of hash shards of [" +
+                                   str(self._index_map.num_hash_shards) + '].')
+            self._num_hash_shards = self._index_map.num_hash_shards if self._index_map.num_hash_shards > 0 else -1
+            self._num_index_segments = \
+                self._index_map.num_index_segments if self._index_map.num_index_segments > 0 else -1
+            self._load_index_declarations()
+
+    def _load_index_declarations(self):
+        # The indexes are declared in the index files of the shards, and the first and the latest shards are the ones
+        # written in every mode.
+        index_files = sorted(set(self._shard_to_file(shard=shard) + ProtoTableStorage.INDEX_FILE_SUFFIX
+                                 for shard in [0, self.get_latest_shard()]))
+        self.increment_rpc_count_by(n=1)
+        index_message_map = FileUtil.read_protos_from_files(
+            proto_type=ProtoTableSecondaryIndex,
+            file_names=index_files
+        )
+        for index_message in index_message_map.values():
+            if index_message is None:
+                continue
+            declarations, _ = ProtoTableStorage.read_index_declarations(index_message=index_message)
+            for field, message_type in declarations.items():
+                self._secondary_indexes.setdefault(field, message_type)
 
     def is_empty(self):
         return self.get_num_shards() == 0
@@ -58,14 +107,148 @@ class ShardedProtoTableStorage(StorageBase):
         return self._index_map.cur_shard
 
     def get_num_entries(self):
+        if self.is_hash_routing() or self.is_index_segmented():
+            return self._index_map.num_entries
         return len(dict(self._index_map.index_map))
 
+    def is_hash_routing(self):
+        return self._index_map.num_hash_shards > 0
+
+    def is_index_segmented(self):
+        return self._index_map.num_index_segments > 0
+
+    def _index_segment_to_file(self, segment):
+        return FileUtil.join_paths_to_file(
+            root_dir=self._dir_name,
+            base_name='index_map@' + str(segment) + '.pb'
+        )
+
+    def _key_to_index_segment(self, key):
+        return self.jump_consistent_hash(key=key, num_buckets=self._index_map.num_index_segments)
+
+    def _load_index_segments(self, keys):
+        segment_to_file_map = {}
+        for key in keys:
+            segment = self._key_to_index_segment(key=key)
+            if segment not in self._index_segments:
+                segment_to_file_map[segment] = self._index_segment_to_file(segment=segment)
+        if not segment_to_file_map:
+            return
+        self.increment_rpc_count_by(n=1)
+        index_segment_map = FileUtil.read_protos_from_files(
+            proto_type=ProtoTableIndexMap,
+            file_names=list(segment_to_file_map.values())
+        )
+        for segment, segment_file in segment_to_file_map.items():
+            index_segment = index_segment_map.get(segment_file, None)
+            self._index_segments[segment] = index_segment if index_segment is not None else ProtoTableIndexMap()
+
+    def get_num_loaded_index_segments(self):
+        return len(self._index_segments)
+
+    def is_bloom_filter_enabled(self):
+        return self._index_map.bloom_filter_false_positive_rate > 0
+
+    def _shard_to_bloom_filter_file(self, shard):
+        return self._shard_to_file(shard=shard) + self.BLOOM_FILTER_FILE_SUFFIX
+
+    def _load_bloom_filters(self, shards):
+        shard_to_file_map = {shard: self._shard_to_bloom_filter_file(shard=shard) for shard in shards
+                             if shard not in self._bloom_filters}
+        if not shard_to_file_map:
+            return
+        self.increment_rpc_count_by(n=1)
+        bloom_filter_map = FileUtil.read_protos_from_files(
+            proto_type=BloomFilter,
+            file_names=list(shard_to_file_map.values())
+        )
+        for shard, bloom_filter_file in shard_to_file_map.items():
+            bloom_filter = bloom_filter_map.get(bloom_filter_file, None)
+            self._bloom_filters[shard] = BloomFilterTool.from_proto(bloom_filter=bloom_filter) \
+                if bloom_filter is not None and bloom_filter.num_bits > 0 else None
+
+    def _build_bloom_filter(self, shard, proto_table):
+        bloom_filter_tool = BloomFilterTool(
+            capacity=proto_table.get_num_entries(),
+            false_positive_rate=self._index_map.bloom_filter_false_positive_rate
+        )
+        for key, _ in proto_table.iter_items():
+            bloom_filter_tool.add(key=key)
+        FileUtil.write_proto_to_file(
+            proto=bloom_filter_tool.to_proto(),
+            file_name=self._shard_to_bloom_filter_file(shard=shard)
+        )
+        self._bloom_filters[shard] = bloom_filter_tool
+
+    def may_contain(self, key):
+        shard = self._key_to_shard(key=key)
+        if shard is None:
+            return False
+        if not self.is_hash_routing() or not self.is_bloom_filter_enabled():
+            return True
+        self._load_bloom_filters(shards=[shard])
+        bloom_filter_tool = self._bloom_filters[shard]
+        return bloom_filter_tool is None or bloom_filter_tool.may_contain(key=key)
+
+    def enable_bloom_filters(self, false_positive_rate=0.01):
+        assert 0 < false_positive_rate < 1
+        try:
+            self._index_map.bloom_filter_false_positive_rate = false_positive_rate
+            for shard in range(self.get_num_shards()):
+                proto_table = self._initialize_shard(shard=shard)
+                self._build_bloom_filter(shard=shard, proto_table=proto_table)
+                self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset() + 1)
+            self._logger.info("Writing the index map to [" + self._index_map_file + '].')
+            self.increment_rpc_count_by(n=1)
+            FileUtil.write_proto_to_file(
+                proto=self._index_map,
+                file_name=self._index_map_file,
+                compression_type=self._config['compression_type']
+            )
+        except Exception as err:
+            self._SYS_LOGGER.error("Enable bloom filters of dir [" + self.get_dir_name() + "] got exception: " +
+                                   str(err) + '.')
+            self._logger.error("Enable bloom filters of dir [" + self.get_dir_name() + "] got exception: " +
+                               str(err) + '.')
+            raise StorageWriteException("Enable bloom filters of dir [" + self.get_dir_name() + "] got exception: " +
+                                        str(err) + '.')
+
+    @classmethod
+    def jump_consistent_hash(cls, key, num_buckets):
+        key_hash = int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'little')
+        bucket, next_bucket = -1, 0
+        while next_bucket < num_buckets:
+            bucket = next_bucket
+            key_hash = (key_hash * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+            next_bucket = int((bucket + 1) * (float(1 << 31) / float((key_hash >> 33) + 1)))
+        return bucket
+
+    def _key_to_shard(self, key):
+        if self.is_hash_routing():
+            return self.jump_consistent_hash(key=key, num_buckets=self._index_map.num_hash_shards)
+        if self.is_index_segmented():
+            self._load_index_segments(keys=[key])
+            index_map = self._index_segments[self._key_to_index_segment(key=key)].index_map
+        else:
+            index_map = self._index_map.index_map
+        if key in index_map:
+            return index_map[key]
+        return None
+
     def _shard_to_file(self, shard):
         return FileUtil.join_paths_to_file(
             root_dir=self._dir_name,
             base_name='data@' + str(shard) + '.pb'
         )
 
+    def _initialize_shard(self, shard):
+        proto_table = ProtoTableStorage()
+        proto_table.set_config(config={'compression_type': self._config['compression_type']})
+        proto_table.initialize_from_file(file_name=self._shard_to_file(shard=shard))
+        for field, message_type in self._secondary_indexes.items():
+            proto_table.add_index(field=field, message_type=message_type)
+        return proto_table
+
     def _file_to_shard(self, file):
         base_name = FileUtil.base_name(file)
         return int(base_name.replace('.pb', '').split('@')[1])
@@ -75,22 +258,35 @@ class ShardedProtoTableStorage(StorageBase):
 
         related_shards, related_files = set(), set()
         file_to_key_map = defaultdict(list)
+        if self.is_index_segmented():
+            self._load_index_segments(keys=params['keys'])
+        key_to_shard_map = {}
         for key in params['keys']:
-            if key in self._index_map.index_map:
-                related_shards.add(self._index_map.index_map[key])
-                proto_file = self._shard_to_file(shard=self._index_map.index_map[key])
+            shard = self._key_to_shard(key=key)
+            if shard is not None:
+                key_to_shard_map[key] = shard
+        try:
+            if self.is_hash_routing() and self.is_bloom_filter_enabled():
+                self._load_bloom_filters(shards=set(key_to_shard_map.values()))
+                key_to_shard_map = {key: shard for key, shard in key_to_shard_map.items()
+                                    if self._bloom_filters[shard] is None or
+                                    self._bloom_filters[shard].may_contain(key=key)}
+            for key, shard in key_to_shard_map.items():
+                related_shards.add(shard)
+                proto_file = self._shard_to_file(shard=shard)
                 related_files.add(proto_file)
                 file_to_key_map[proto_file].append(key)
-        try:
+
             result = {}
-            proto_table_map = gclient_ext.read_proto_messages(
-                paths=list(related_files),
-                message_type=ProtoTable
+            proto_table_map = FileUtil.read_protos_from_files(
+                proto_type=ProtoTable,
+                file_names=list(related_files)
             )
             for proto_file, proto_table in proto_table_map.items():
                 proto_table_data = dict(proto_table.data)
                 for key in file_to_key_map[proto_file]:
-                    result[key] = proto_table_data[key]
+                    if key in proto_table_data:
+                        result[key] = proto_table_data[key]
 
             return result
         except Exception as err:
@@ -124,9 +320,9 @@ class ShardedProtoTableStorage(StorageBase):
 
         try:
             result = {}
-            proto_table_map = gclient_ext.read_proto_messages(
-                paths=list(related_proto_files),
-                message_type=ProtoTable
+            proto_table_map = FileUtil.read_protos_from_files(
+                proto_type=ProtoTable,
+                file_names=list(related_proto_files)
             )
             for proto_table in proto_table_map.values():
                 result.update(dict(proto_table.data))
@@ -137,6 +333,126 @@ class ShardedProtoTableStorage(StorageBase):
             self._logger.error("Read all dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
             raise StorageReadException("Read all dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
 
+    def iter_items(self, message_type=None, batch_size=-1):
+        batch = {}
+        for shard in range(self.get_num_shards()):
+            proto_table = ProtoTableStorage()
+            try:
+                proto_table.initialize_from_file(file_name=self._shard_to_file(shard=shard))
+                self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
+            except Exception as err:
+                self._SYS_LOGGER.error("Iterate dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Iterate dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageReadException("Iterate dir [" + self.get_dir_name() + "] got exception: " +
+                                           str(err) + '.')
+            for key, value in proto_table.iter_items(message_type=message_type):
+                if batch_size > 0:
+                    batch[key] = value
+                    if len(batch) >= batch_size:
+                        yield batch
+                        batch = {}
+                else:
+                    yield key, value
+        if batch:
+            yield batch
+
+    def add_index(self, field, message_type):
+        ProtoUtil.get_field_descriptor_by_path(message_type=message_type, field_path=field)
+        self._secondary_indexes[field] = message_type
+
+    def get_index_fields(self):
+        return list(self._secondary_indexes.keys())
+
+    def read_by_index(self, field, value, message_type=None):
+        if field not in self._secondary_indexes:
+            self._SYS_LOGGER.error("Field [" + field + "] is not indexed in dir [" + self.get_dir_name() + '].')
+            self._logger.error("Field [" + field + "] is not indexed in dir [" + self.get_dir_name() + '].')
+            raise StorageReadException("Field [" + field + "] is not indexed in dir [" + self.get_dir_name() + '].')
+        index_message_type = self._secondary_indexes[field]
+        try:
+            index_files = [self._shard_to_file(shard=shard) + ProtoTableStorage.INDEX_FILE_SUFFIX
+                           for shard in range(self.get_num_shards())]
+            self.increment_rpc_count_by(n=1)
+            index_message_map = FileUtil.read_protos_from_files(
+                proto_type=ProtoTableSecondaryIndex,
+                file_names=index_files
+            )
+            keys = []
+            for shard, index_file in enumerate(index_files):
+                index_message = index_message_map.get(index_file, None)
+                if index_message is None or field not in index_message.field_indexes or \
+                        index_message.field_indexes[field].message_type != index_message_type.DESCRIPTOR.full_name:
+                    proto_table = self._initialize_shard(shard=shard)
+                    self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
+                    keys.extend(proto_table.read_by_index(field=field, value=value).keys())
+                elif str(value) in index_message.field_indexes[field].value_to_keys:
+                    keys.extend(index_message.field_indexes[field].value_to_keys[str(value)].keys)
+
+            result = {}
+            for key, any_message in sorted(self.read_multiple(params={'keys': keys}).items()):
+                proto_message = ProtoUtil.any_to_message(message_type=index_message_type, any_message=any_message)
+                if proto_message is None:
+                    continue
+                field_values = ProtoUtil.get_values_by_field_path(proto_message=proto_message, field_path=field)
+                if str(value) not in [str(field_value) for field_value in field_values]:
+                    continue
+                if message_type:
+                    result[key] = ProtoUtil.any_to_message(message_type=message_type, any_message=any_message)
+                else:
+                    result[key] = any_message
+            return result
+        except Exception as err:
+            self._SYS_LOGGER.error("Read by index in dir [" + self.get_dir_name() + "] got exception: " +
+                                   str(err) + '.')
+            self._logger.error("Read by index in dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageReadException("Read by index in dir [" + self.get_dir_name() + "] got exception: " +
+                                       str(err) + '.')
+
+    def to_columns(self, message_type, fields=None):
+        import numpy as np
+
+        try:
+            shard_columns = []
+            for shard in range(self.get_num_shards()):
+                self.increment_rpc_count_by(n=1)
+                proto_table = FileUtil.read_proto_from_file(
+                    proto_type=ProtoTable,
+                    file_name=self._shard_to_file(shard=shard)
+                )
+                if proto_table is None:
+                    continue
+                shard_columns.append(ProtoUtil.any_messages_to_columns(
+                    message_type=message_type,
+                    any_messages=proto_table.data,
+                    fields=fields
+                ))
+            if not shard_columns:
+                return ProtoUtil.any_messages_to_columns(message_type=message_type, any_messages={}, fields=fields)
+            return {name: np.concatenate([columns[name] for columns in shard_columns])
+                    for name in shard_columns[0]}
+        except Exception as err:
+            self._SYS_LOGGER.error("To columns of dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("To columns of dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageReadException("To columns of dir [" + self.get_dir_name() + "] got exception: " +
+                                       str(err) + '.')
+
+    def to_dataframe(self, message_type, fields=None):
+        import pandas as pd
+
+        columns = self.to_columns(message_type=message_type, fields=fields)
+        return pd.DataFrame(columns).set_index('key')
+
+    def _write_shard(self, shard, data, params, proto_table=None):
+        if proto_table is None:
+            proto_table = self._initialize_shard(shard=shard)
+        num_entries = proto_table.get_num_entries()
+        proto_table.write(data=data, params=params)
+        num_rpc_calls = proto_table.get_rpc_call_count_and_reset()
+        if self.is_bloom_filter_enabled():
+            self._build_bloom_filter(shard=shard, proto_table=proto_table)
+            num_rpc_calls += 1
+        return num_rpc_calls, proto_table.get_num_entries() - num_entries
+
     def write(self, data, params=None):
         if not params:
             params = {}
@@ -144,78 +460,533 @@ class ShardedProtoTableStorage(StorageBase):
             params['overwrite'] = True
         assert isinstance(data, dict)
 
-        exising_shard_to_data_map = defaultdict(dict)
-        new_data = {}
-        for key, val in data.items():
-            if key in self._index_map.index_map:
-                exising_shard_to_data_map[self._index_map.index_map[key]][key] = val
-            else:
-                new_data[key] = val
+        with self._lock:
+            shard_to_data_map = defaultdict(dict)
+            new_data = {}
+            if self.is_index_segmented():
+                self._load_index_segments(keys=data.keys())
+            for key, val in data.items():
+                shard = self._key_to_shard(key=key)
+                if shard is not None:
+                    shard_to_data_map[shard][key] = val
+                else:
+                    new_data[key] = val
+
+            try:
+                shard_to_proto_table_map = {}
+                new_key_to_shard_map = {}
+                latest_shard = self.get_latest_shard()
+                if new_data:
+                    proto_table = self._initialize_shard(shard=latest_shard)
+                    self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
+                    shard_to_proto_table_map[latest_shard] = proto_table
+                    num_available_entries = self._size_per_shard - proto_table.get_num_entries()
+                    for key, val in new_data.items():
+                        if num_available_entries <= 0:
+                            latest_shard += 1
+                            num_available_entries = self._size_per_shard
+                            self._logger.info("Write to new file with name [" +
+                                              self._shard_to_file(shard=latest_shard) + '] and shard [' +
+                                              str(latest_shard) + '].')
+                        shard_to_data_map[latest_shard][key] = val
+                        new_key_to_shard_map[key] = latest_shard
+                        num_available_entries -= 1
+
+                num_io_workers = max(1, min(int(self._config['num_io_workers']), len(shard_to_data_map)))
+                with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+                    shard_futures = [
+                        executor.submit(
+                            self._write_shard,
+                            shard=shard,
+                            data=shard_data,
+                            params=params,
+                            proto_table=shard_to_proto_table_map.get(shard, None)
+                        ) for shard, shard_data in shard_to_data_map.items()
+                    ]
+                    num_new_entries = 0
+                    for shard_future in shard_futures:
+                        num_rpc_calls, num_shard_new_entries = shard_future.result()
+                        self.increment_rpc_count_by(n=num_rpc_calls)
+                        num_new_entries += num_shard_new_entries
+
+                if self.is_hash_routing():
+                    if num_new_entries != 0 or self._index_map.num_entries == 0:
+                        self._index_map.num_entries += num_new_entries
+                        self._write_index_map()
+                elif new_key_to_shard_map:
+                    if self.is_index_segmented():
+                        self._index_map.num_entries += len(new_key_to_shard_map)
+                    self._index_map.cur_shard = latest_shard
+                    self._update_index_map(key_to_shard_map=new_key_to_shard_map)
+
+            except Exception as err:
+                self._SYS_LOGGER.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageWriteException("Write to dir [" + self.get_dir_name() + "] got exception: " +
+                                            str(err) + '.')
+
+    def _delete_from_shard(self, shard, keys):
+        proto_table = self._initialize_shard(shard=shard)
+        num_entries = proto_table.get_num_entries()
+        proto_table.delete_multiple(keys=keys)
+        num_rpc_calls = proto_table.get_rpc_call_count_and_reset()
+        if self.is_bloom_filter_enabled() and proto_table.get_num_entries() != num_entries:
+            self._build_bloom_filter(shard=shard, proto_table=proto_table)
+            num_rpc_calls += 1
+        return num_rpc_calls, num_entries - proto_table.get_num_entries()
+
+    def delete(self, key):
+        self.delete_multiple(keys=[key])
 
+    def delete_multiple(self, keys):
+        with self._lock:
+            try:
+                if self.is_index_segmented():
+                    self._load_index_segments(keys=keys)
+                shard_to_keys_map = defaultdict(list)
+                for key in keys:
+                    shard = self._key_to_shard(key=key)
+                    if shard is not None:
+                        shard_to_keys_map[shard].append(key)
+                if not shard_to_keys_map:
+                    return
+
+                num_io_workers = max(1, min(int(self._config['num_io_workers']), len(shard_to_keys_map)))
+                with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+                    shard_futures = [
+                        executor.submit(self._delete_from_shard, shard=shard, keys=shard_keys)
+                        for shard, shard_keys in shard_to_keys_map.items()
+                    ]
+                    num_deleted_entries = 0
+                    for shard_future in shard_futures:
+                        num_rpc_calls, num_shard_deleted_entries = shard_future.result()
+                        self.increment_rpc_count_by(n=num_rpc_calls)
+                        num_deleted_entries += num_shard_deleted_entries
+
+                if self.is_hash_routing():
+                    if num_deleted_entries != 0:
+                        self._index_map.num_entries -= min(num_deleted_entries, self._index_map.num_entries)
+                        self._write_index_map()
+                elif num_deleted_entries != 0:
+                    deleted_keys = [key for shard_keys in shard_to_keys_map.values() for key in shard_keys]
+                    if self.is_index_segmented():
+                        self._index_map.num_entries -= min(num_deleted_entries, self._index_map.num_entries)
+                    self._update_index_map(key_to_shard_map={}, deleted_keys=deleted_keys)
+
+            except Exception as err:
+                self._SYS_LOGGER.error("Delete in dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                self._logger.error("Delete in dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+                raise StorageDeleteException("Delete in dir [" + self.get_dir_name() + "] got exception: " +
+                                             str(err) + '.')
+
+    def _write_index_map(self):
+        self._logger.info("Writing the index map to [" + self._index_map_file + '].')
+        self.increment_rpc_count_by(n=1)
+        FileUtil.write_proto_to_file(
+            proto=self._index_map,
+            file_name=self._index_map_file,
+            compression_type=self._config['compression_type']
+        )
+
+    def _update_index_map(self, key_to_shard_map, deleted_keys=()):
+        if self.is_index_segmented():
+            self._write_index_segments(key_to_shard_map=key_to_shard_map, deleted_keys=deleted_keys)
+        else:
+            for key, shard in key_to_shard_map.items():
+                self._index_map.index_map[key] = shard
+            for key in deleted_keys:
+                if key in self._index_map.index_map:
+                    del self._index_map.index_map[key]
+        self._write_index_map()
+
+    def _write_index_segments(self, key_to_shard_map, deleted_keys=()):
+        self._load_index_segments(keys=list(key_to_shard_map.keys()) + list(deleted_keys))
+        touched_segments = set()
+        for key, shard in key_to_shard_map.items():
+            segment = self._key_to_index_segment(key=key)
+            self._index_segments[segment].index_map[key] = shard
+            touched_segments.add(segment)
+        for key in deleted_keys:
+            segment = self._key_to_index_segment(key=key)
+            if key in self._index_segments[segment].index_map:
+                del self._index_segments[segment].index_map[key]
+                touched_segments.add(segment)
+
+        num_io_workers = max(1, min(int(self._config['num_io_workers']), len(touched_segments)))
+        with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+            segment_futures = [
+                executor.submit(
+                    FileUtil.write_proto_to_file,
+                    proto=self._index_segments[segment],
+                    file_name=self._index_segment_to_file(segment=segment),
+                    compression_type=self._config['compression_type']
+                ) for segment in touched_segments
+            ]
+            for segment_future in segment_futures:
+                segment_future.result()
+                self.increment_rpc_count_by(n=1)
+
+    def segment_index_map(self, num_index_segments):
+        assert not self.is_hash_routing() and not self.is_index_segmented() and num_index_segments > 0
+        try:
+            self._index_map.num_index_segments = num_index_segments
+            self._index_segments = {segment: ProtoTableIndexMap() for segment in range(num_index_segments)}
+            self._write_index_segments(key_to_shard_map=dict(self._index_map.index_map))
+            self._index_map.num_entries = len(self._index_map.index_map)
+            self._index_map.index_map.clear()
+            self._num_index_segments = num_index_segments
+            self._logger.info("Writing the index map to [" + self._index_map_file + '] with [' +
+                              str(num_index_segments) + '] segments.')
+            self.increment_rpc_count_by(n=1)
+            FileUtil.write_proto_to_file(
+                proto=self._index_map,
+                file_name=self._index_map_file,
+                compression_type=self._config['compression_type']
+            )
+        except Exception as err:
+            self._SYS_LOGGER.error("Segment index map of dir [" + self.get_dir_name() + "] got exception: " +
+                                   str(err) + '.')
+            self._logger.error("Segment index map of dir [" + self.get_dir_name() + "] got exception: " +
+                               str(err) + '.')
+            raise StorageWriteException("Segment index map of dir [" + self.get_dir_name() + "] got exception: " +
+                                        str(err) + '.')
+
+    def split_hash_shards(self, new_num_hash_shards):
+        assert self.is_hash_routing() and new_num_hash_shards >= self._index_map.num_hash_shards
         try:
-            for shard, existing_data in exising_shard_to_data_map.items():
-                related_proto_file = self._shard_to_file(shard=shard)
-                proto_table = ProtoTableStorage()
-                proto_table.initialize_from_file(file_name=related_proto_file)
-                proto_table.write(data=existing_data, params=params)
+            moved_shard_to_data_map = defaultdict(dict)
+            shard_to_moved_keys_map = defaultdict(list)
+            for shard in range(self._index_map.num_hash_shards):
+                proto_table = self._initialize_shard(shard=shard)
+                for key, val in proto_table.iter_items():
+                    new_shard = self.jump_consistent_hash(key=key, num_buckets=new_num_hash_shards)
+                    if new_shard != shard:
+                        moved_shard_to_data_map[new_shard][key] = val
+                        shard_to_moved_keys_map[shard].append(key)
                 self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
-            if new_data:
-                all_new_keys = list(new_data.keys())
-                latest_shard = self.get_latest_shard()
-                latest_proto_file = self._shard_to_file(shard=latest_shard)
-                proto_table = ProtoTableStorage()
-                proto_table.initialize_from_file(file_name=latest_proto_file)
-                latest_proto_table_size = proto_table.get_num_entries()
-                proto_table.write(
-                    data={key: new_data[key] for key in all_new_keys[:self._size_per_shard - latest_proto_table_size]},
-                    params=params
-                )
+
+            with futures.ThreadPoolExecutor(max_workers=max(1, int(self._config['num_io_workers']))) as executor:
+                shard_futures = [
+                    executor.submit(self._write_shard, shard=shard, data=shard_data, params={'overwrite': True})
+                    for shard, shard_data in moved_shard_to_data_map.items()
+                ]
+                for shard_future in shard_futures:
+                    self.increment_rpc_count_by(n=shard_future.result()[0])
+
+            self._logger.info("Splitting dir [" + self.get_dir_name() + "] from [" +
+                              str(self._index_map.num_hash_shards) + "] to [" + str(new_num_hash_shards) + "] shards.")
+            self._index_map.num_hash_shards = new_num_hash_shards
+            self._index_map.cur_shard = new_num_hash_shards - 1
+            self._num_hash_shards = new_num_hash_shards
+            self.increment_rpc_count_by(n=1)
+            FileUtil.write_proto_to_file(
+                proto=self._index_map,
+                file_name=self._index_map_file,
+                compression_type=self._config['compression_type']
+            )
+
+            for shard, moved_keys in shard_to_moved_keys_map.items():
+                proto_table = self._initialize_shard(shard=shard)
+                proto_table.delete_multiple(keys=moved_keys)
                 self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
-                for key in all_new_keys[:self._size_per_shard - latest_proto_table_size]:
-                    self._index_map.index_map[key] = latest_shard
-
-                if len(all_new_keys) > self._size_per_shard - latest_proto_table_size:
-                    remaining_new_keys = all_new_keys[self._size_per_shard - latest_proto_table_size:]
-                    start_index = 0
-                    while start_index < len(remaining_new_keys):
-                        data_for_new_shard = remaining_new_keys[start_index:start_index + self._size_per_shard]
-                        latest_shard += 1
-                        self._index_map.cur_shard += 1
-                        proto_file = self._shard_to_file(shard=latest_shard)
-                        self._logger.info("Write to new file with name [" + proto_file + '] and shard [' +
-                                          str(latest_shard) + '].')
-                        proto_table = ProtoTableStorage()
-                        proto_table.initialize_from_file(file_name=proto_file)
-                        proto_table.write(
-                            data={key: new_data[key] for key in data_for_new_shard},
-                            params=params
-                        )
-                        self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
-                        for key in data_for_new_shard:
-                            self._index_map.index_map[key] = latest_shard
 
-                        start_index += self._size_per_shard
-                self._logger.info("Writing the index map to [" + self._index_map_file + '].')
+        except Exception as err:
+            self._SYS_LOGGER.error("Split dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Split dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageWriteException("Split dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+
+    def _remove_shard_files(self, shard):
+        shard_file = self._shard_to_file(shard=shard)
+        for file_name in [shard_file, shard_file + ProtoTableStorage.LOG_FILE_SUFFIX,
+                          shard_file + ProtoTableStorage.INDEX_FILE_SUFFIX, shard_file + self.BLOOM_FILTER_FILE_SUFFIX,
+                          shard_file + FileLockTool.LOCK_FILE_SUFFIX]:
+            self.increment_rpc_count_by(n=1)
+            if FileUtil.does_file_exist(file_name=file_name):
                 self.increment_rpc_count_by(n=1)
-                FileUtil.write_proto_to_file(
-                    proto=self._index_map,
-                    file_name=self._index_map_file
-                )
+                FileUtil.remove_file(file_name=file_name)
+
+    def _compact_step(self, shard_sizes):
+        latest_shard = self.get_latest_shard()
+        dest_shard = None
+        for shard in range(min(latest_shard, len(shard_sizes))):
+            if shard_sizes[shard] < self._size_per_shard:
+                dest_shard = shard
+                break
+        if dest_shard is None:
+            return False
+
+        dest_proto_table = self._initialize_shard(shard=dest_shard)
+        src_proto_table = self._initialize_shard(shard=latest_shard)
+        self.increment_rpc_count_by(n=dest_proto_table.get_rpc_call_count_and_reset() +
+                                    src_proto_table.get_rpc_call_count_and_reset())
+        num_available_entries = self._size_per_shard - dest_proto_table.get_num_entries()
+        moved_data = {}
+        for key, val in src_proto_table.iter_items():
+            if len(moved_data) >= num_available_entries:
+                break
+            moved_data[key] = val
+        if moved_data:
+            self.increment_rpc_count_by(n=self._write_shard(
+                shard=dest_shard,
+                data=moved_data,
+                params={'overwrite': True},
+                proto_table=dest_proto_table
+            )[0])
+        shard_sizes[dest_shard] = dest_proto_table.get_num_entries()
+
+        is_src_empty = len(moved_data) == src_proto_table.get_num_entries()
+        if is_src_empty:
+            self._logger.info("Merging shard [" + str(latest_shard) + "] into shard [" + str(dest_shard) + '].')
+            self._index_map.cur_shard = latest_shard - 1
+        if moved_data or is_src_empty:
+            self._update_index_map(key_to_shard_map={key: dest_shard for key in moved_data})
+        if is_src_empty:
+            self._remove_shard_files(shard=latest_shard)
+        elif moved_data:
+            src_proto_table.delete_multiple(keys=list(moved_data.keys()))
+            self.increment_rpc_count_by(n=src_proto_table.get_rpc_call_count_and_reset())
+        return True
+
+    def compact(self, io_budget=-1, blocking=True):
+        if not blocking:
+            thread = threading.Thread(
+                target=self.compact,
+                kwargs={'io_budget': io_budget},
+                name='compaction_thread'
+            )
+            thread.daemon = True
+            thread.start()
+            return thread
+
+        if self.is_hash_routing():
+            self._logger.info("Shards of dir [" + self.get_dir_name() + "] are hash routed and are not merged.")
+            return True
+        try:
+            num_rpc_calls = self.get_rpc_call_count()
+            with self._lock:
+                shard_sizes = self._get_shard_sizes()
+            while True:
+                with self._lock:
+                    if not self._compact_step(shard_sizes=shard_sizes):
+                        self._logger.info("Compaction of dir [" + self.get_dir_name() + "] is done with [" +
+                                          str(self.get_num_shards()) + "] shards.")
+                        return True
+                if 0 <= io_budget <= self.get_rpc_call_count() - num_rpc_calls:
+                    break
 
+            self._logger.info("Compaction of dir [" + self.get_dir_name() + "] used up the io budget of [" +
+                              str(io_budget) + '].')
+            return False
         except Exception as err:
-            self._SYS_LOGGER.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            self._logger.error("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-            raise StorageWriteException("Write to dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
-
-    def resize_to_new_table(self, new_size_per_shard, new_dir_name):
-        self.increment_rpc_count_by(n=2)
-        assert not FileUtil.does_dir_exist(dir_name=new_dir_name) or FileUtil.is_dir_empty(dir_name=new_dir_name)
-        new_sptable_storage = ShardedProtoTableStorage(size_per_shard=new_size_per_shard)
-        new_sptable_storage.initialize_from_dir(dir_name=new_dir_name)
-        for shard in range(self.get_num_shards()):
-            related_proto_file = self._shard_to_file(shard=shard)
-            proto_table = ProtoTableStorage()
-            proto_table.initialize_from_file(file_name=related_proto_file)
-            new_sptable_storage.write(data=proto_table.read_all())
-            self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
-        return new_sptable_storage
+            self._SYS_LOGGER.error("Compact dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Compact dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageWriteException("Compact dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+
+    def _get_shard_sizes(self):
+        shard_sizes = [0] * self.get_num_shards()
+        if not self.is_hash_routing() and not self.is_index_segmented():
+            for shard in self._index_map.index_map.values():
+                shard_sizes[shard] += 1
+            return shard_sizes
+
+        num_io_workers = max(1, min(int(self._config['num_io_workers']), len(shard_sizes)))
+        with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+            shard_futures = [executor.submit(self._initialize_shard, shard=shard) for shard in range(len(shard_sizes))]
+            for shard, shard_future in enumerate(shard_futures):
+                proto_table = shard_future.result()
+                self.increment_rpc_count_by(n=proto_table.get_rpc_call_count_and_reset())
+                shard_sizes[shard] = proto_table.get_num_entries()
+        return shard_sizes
+
+    def _get_shard_signature(self, shard):
+        shard_file = self._shard_to_file(shard=shard)
+        return json.dumps([
+            FileUtil.get_file_attr(file_name=shard_file),
+            FileUtil.get_file_attr(file_name=shard_file + ProtoTableStorage.LOG_FILE_SUFFIX)
+        ], sort_keys=True)
+
+    def _get_shard_signatures(self):
+        num_shards = self.get_num_shards()
+        self.increment_rpc_count_by(n=2 * num_shards)
+        num_io_workers = max(1, min(int(self._config['num_io_workers']), num_shards))
+        with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+            return list(executor.map(lambda shard: self._get_shard_signature(shard=shard), range(num_shards)))
+
+    def _reshard_shard(self, shard, offset, shard_size, num_entries, new_sptable_storage, completed_shards):
+        proto_table = self._initialize_shard(shard=shard)
+        num_rpc_calls = proto_table.get_rpc_call_count_and_reset()
+        if proto_table.get_num_entries() != shard_size:
+            raise StorageWriteException("Shard [" + str(shard) + "] has [" + str(proto_table.get_num_entries()) +
+                                        "] entries while [" + str(shard_size) + "] are planned.")
+        new_size_per_shard = new_sptable_storage._size_per_shard
+        new_shard_to_data_map = defaultdict(dict)
+        for index, (key, val) in enumerate(proto_table.iter_items()):
+            new_shard_to_data_map[(offset + index) // new_size_per_shard][key] = val
+
+        new_key_to_shard_map, partial_shard_to_data_map, written_shards = {}, {}, []
+        for new_shard, new_shard_data in new_shard_to_data_map.items():
+            for key in new_shard_data:
+                new_key_to_shard_map[key] = new_shard
+            if new_shard in completed_shards:
+                continue
+            if new_shard * new_size_per_shard >= offset and \
+                    min((new_shard + 1) * new_size_per_shard, num_entries) <= offset + shard_size:
+                num_rpc_calls += new_sptable_storage._write_shard(
+                    shard=new_shard,
+                    data=new_shard_data,
+                    params={'overwrite': True}
+                )[0]
+                written_shards.append(new_shard)
+            else:
+                partial_shard_to_data_map[new_shard] = new_shard_data
+        return num_rpc_calls, new_key_to_shard_map, partial_shard_to_data_map, written_shards
+
+    def resize_to_new_table(self, new_size_per_shard, new_dir_name, progress_callback=None):
+        assert new_size_per_shard > 0
+        checkpoint_file = FileUtil.join_paths_to_file(
+            root_dir=new_dir_name,
+            base_name=self.RESHARDING_CHECKPOINT_FILE
+        )
+        self.increment_rpc_count_by(n=1)
+        checkpoint = FileUtil.read_proto_from_file(
+            proto_type=ReshardingCheckpoint,
+            file_name=checkpoint_file
+        )
+        if checkpoint is None:
+            self.increment_rpc_count_by(n=2)
+            assert not FileUtil.does_dir_exist(dir_name=new_dir_name) or FileUtil.is_dir_empty(dir_name=new_dir_name)
+            checkpoint = ReshardingCheckpoint()
+            checkpoint.src_dir_name = self.get_dir_name()
+            checkpoint.new_size_per_shard = new_size_per_shard
+        elif checkpoint.src_dir_name != self.get_dir_name() or checkpoint.new_size_per_shard != new_size_per_shard:
+            self._SYS_LOGGER.error("Checkpoint [" + checkpoint_file + "] does not match the resharding of dir [" +
+                                   self.get_dir_name() + '].')
+            self._logger.error("Checkpoint [" + checkpoint_file + "] does not match the resharding of dir [" +
+                               self.get_dir_name() + '].')
+            raise StorageWriteException("Checkpoint [" + checkpoint_file + "] does not match the resharding of dir [" +
+                                        self.get_dir_name() + '].')
+        else:
+            self._logger.info("Resuming the resharding of dir [" + self.get_dir_name() + "] with [" +
+                              str(len(checkpoint.completed_shards)) + "] completed shards.")
+
+        try:
+            src_shard_signatures = self._get_shard_signatures()
+            src_shard_sizes = self._get_shard_sizes()
+            if list(checkpoint.src_shard_sizes) != src_shard_sizes or \
+                    list(checkpoint.src_shard_signatures) != src_shard_signatures:
+                if checkpoint.completed_shards:
+                    self._logger.warning("Dir [" + self.get_dir_name() + "] changed since the checkpoint. "
+                                         "Restarting the resharding.")
+                del checkpoint.src_shard_sizes[:]
+                checkpoint.src_shard_sizes.extend(src_shard_sizes)
+                del checkpoint.src_shard_signatures[:]
+                checkpoint.src_shard_signatures.extend(src_shard_signatures)
+                del checkpoint.completed_shards[:]
+
+            new_sptable_storage = ShardedProtoTableStorage(
+                size_per_shard=new_size_per_shard,
+                num_index_segments=self._num_index_segments
+            )
+            new_sptable_storage.set_config(config={
+                'compression_type': self._config['compression_type'],
+                'num_io_workers': self._config['num_io_workers'],
+            })
+            for field, message_type in self._secondary_indexes.items():
+                new_sptable_storage.add_index(field=field, message_type=message_type)
+            new_sptable_storage.initialize_from_dir(dir_name=new_dir_name)
+
+            num_entries = sum(src_shard_sizes)
+            num_new_shards = (num_entries + new_size_per_shard - 1) // new_size_per_shard
+            completed_shards = frozenset(checkpoint.completed_shards)
+            new_key_to_shard_map = {}
+            partial_shard_to_data_map = defaultdict(dict)
+            write_futures = {}
+            offset = 0
+            num_io_workers = max(1, int(self._config['num_io_workers']))
+            with futures.ThreadPoolExecutor(max_workers=num_io_workers) as executor:
+                reshard_futures = deque()
+                for shard, shard_size in enumerate(src_shard_sizes):
+                    reshard_futures.append((offset + shard_size, executor.submit(
+                        self._reshard_shard,
+                        shard=shard,
+                        offset=offset,
+                        shard_size=shard_size,
+                        num_entries=num_entries,
+                        new_sptable_storage=new_sptable_storage,
+                        completed_shards=completed_shards
+                    )))
+                    offset += shard_size
+                    while reshard_futures and (len(reshard_futures) >= num_io_workers or
+                                               shard == len(src_shard_sizes) - 1):
+                        shard_end, reshard_future = reshard_futures.popleft()
+                        num_rpc_calls, shard_key_to_shard_map, shard_partial_data_map, written_shards = \
+                            reshard_future.result()
+                        self.increment_rpc_count_by(n=num_rpc_calls)
+                        new_key_to_shard_map.update(shard_key_to_shard_map)
+                        checkpoint.completed_shards.extend(written_shards)
+                        for new_shard, new_shard_data in shard_partial_data_map.items():
+                            partial_shard_to_data_map[new_shard].update(new_shard_data)
+                        for new_shard in list(partial_shard_to_data_map.keys()):
+                            if min((new_shard + 1) * new_size_per_shard, num_entries) <= shard_end:
+                                write_futures[new_shard] = executor.submit(
+                                    new_sptable_storage._write_shard,
+                                    shard=new_shard,
+                                    data=partial_shard_to_data_map.pop(new_shard),
+                                    params={'overwrite': True}
+                                )
+                        for new_shard, write_future in list(write_futures.items()):
+                            if write_future.done():
+                                self.increment_rpc_count_by(n=write_futures.pop(new_shard).result()[0])
+                                checkpoint.completed_shards.append(new_shard)
+
+                        self.increment_rpc_count_by(n=1)
+                        FileUtil.write_proto_to_file(
+                            proto=checkpoint,
+                            file_name=checkpoint_file
+                        )
+                        self._logger.info("Resharding dir [" + self.get_dir_name() + "] to [" + new_dir_name +
+                                          "] with [" + str(len(checkpoint.completed_shards)) + '/' +
+                                          str(num_new_shards) + "] shards completed.")
+                        if progress_callback:
+                            progress_callback(len(checkpoint.completed_shards), num_new_shards)
+
+                for new_shard, write_future in write_futures.items():
+                    self.increment_rpc_count_by(n=write_future.result()[0])
+                    checkpoint.completed_shards.append(new_shard)
+                if write_futures and progress_callback:
+                    progress_callback(len(checkpoint.completed_shards), num_new_shards)
+
+            self.increment_rpc_count_by(n=1)
+            index_map = FileUtil.read_proto_from_file(proto_type=ProtoTableIndexMap, file_name=self._index_map_file)
+            if index_map is not None and index_map != self._index_map:
+                raise StorageWriteException("Dir [" + self.get_dir_name() + "] is modified during the resharding.")
+            # Updates to existing keys do not change the index map, so the shard files are compared as well.
+            if self._get_shard_signatures() != src_shard_signatures:
+                raise StorageWriteException("Shards of dir [" + self.get_dir_name() +
+                                            "] are modified during the resharding.")
+
+            if new_sptable_storage.is_index_segmented():
+                new_sptable_storage._index_segments = {
+                    segment: ProtoTableIndexMap() for segment in range(new_sptable_storage._num_index_segments)
+                }
+                new_sptable_storage._write_index_segments(key_to_shard_map=new_key_to_shard_map)
+                new_sptable_storage._index_map.num_entries = len(new_key_to_shard_map)
+            else:
+                for key, new_shard in new_key_to_shard_map.items():
+                    new_sptable_storage._index_map.index_map[key] = new_shard
+            new_sptable_storage._index_map.cur_shard = max(num_new_shards - 1, 0)
+            self._logger.info("Writing the index map to [" + new_sptable_storage._index_map_file + '].')
+            new_sptable_storage.increment_rpc_count_by(n=1)
+            FileUtil.write_proto_to_file(
+                proto=new_sptable_storage._index_map,
+                file_name=new_sptable_storage._index_map_file,
+                compression_type=self._config['compression_type']
+            )
+            self.increment_rpc_count_by(n=1)
+            FileUtil.remove_file(file_name=checkpoint_file)
+            return new_sptable_storage
+
+        except Exception as err:
+            self._SYS_LOGGER.error("Resize dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            self._logger.error("Resize dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
+            raise StorageWriteException("Resize dir [" + self.get_dir_name() + "] got exception: " + str(err) + '.')
@@ -500,3 +500,66 @@ class TreeBaseTest(unittest.TestCase):
             child_node=test_child_node_6
         )
         self.assertEqual(test_tree.get_height(), 3)
+
+    def _assert_cached_state(self, test_tree):
+        def count_subtree(node):
+            num_nodes = 1 + sum(count_subtree(node=child_node) for child_node in node.get_children_nodes())
+            self.assertEqual(test_tree.get_num_nodes_subtree(node=node), num_nodes)
+            return num_nodes
+
+        count_subtree(node=test_tree.get_root_node())
+        leftmost_node, rightmost_node = test_tree.get_root_node(), test_tree.get_root_node()
+        while leftmost_node.get_num_children() > 0:
+            leftmost_node = leftmost_node.get_children_nodes()[0]
+        while rightmost_node.get_num_children() > 0:
+            rightmost_node = rightmost_node.get_children_nodes()[-1]
+        self.assertEqual(test_tree.get_leftmost_leaf(), leftmost_node.get_node_name())
+        self.assertEqual(test_tree.get_rightmost_leaf(), rightmost_node.get_node_name())
+
+    def test_large_tree(self):
+        test_parent_node = OrderedNodeBase(node_name='test_parent_node')
+        test_tree = TreeBase(root=test_parent_node)
+        for i in range(20):
+            test_child_node = OrderedNodeBase(node_name='test_child_node_' + str(i))
+            test_tree.add_node(
+                parent_node=test_parent_node,
+                child_node=test_child_node
+            )
+            for j in range(100):
+                test_tree.add_node(
+                    parent_node=test_child_node,
+                    child_node=OrderedNodeBase(node_name='test_child_node_' + str(i) + '_' + str(j))
+                )
+        self.assertEqual(test_tree.get_num_nodes(), 2021)
+        self.assertEqual(test_tree.get_leftmost_leaf(), 'test_child_node_0_0')
+        self.assertEqual(test_tree.get_rightmost_leaf(), 'test_child_node_19_99')
+        self._assert_cached_state(test_tree=test_tree)
+
+        test_tree.trim_tree(max_capacity=2021)
+        self.assertEqual(test_tree.get_num_nodes(), 2021)
+        test_tree.trim_tree(max_capacity=1500)
+        self.assertEqual(test_tree.get_num_nodes(), 1500)
+        self._assert_cached_state(test_tree=test_tree)
+        test_tree.trim_tree(max_capacity=1000, from_right=False)
+        self.assertEqual(test_tree.get_num_nodes(), 1000)
+        self._assert_cached_state(test_tree=test_tree)
+
+        test_tree.delete_node(node=test_tree.find_node(node_name='test_child_node_10'))
+        self._assert_cached_state(test_tree=test_tree)
+        test_child_node = OrderedNodeBase(node_name='test_child_node_20')
+        test_tree.add_node(
+            parent_node=test_parent_node,
+            child_node=test_child_node
+        )
+        for j in range(10):
+            test_tree.add_node(
+                parent_node=test_child_node,
+                child_node=OrderedNodeBase(node_name='test_child_node_20_' + str(j))
+            )
+        self._assert_cached_state(test_tree=test_tree)
+        self.assertEqual(test_tree.get_rightmost_leaf(), 'test_child_node_20_9')
+
+        test_tree.trim_tree(max_capacity=203)
+        self.assertEqual(test_tree.get_num_nodes(), 203)
+        self.assertEqual(test_tree.get_num_nodes_subtree(node=test_parent_node), 203)
+        self._assert_cached_state(test_tree=test_tree)
@@ -1,12 +1,18 @@
-from galaxy_py import gclient_ext
+from galaxy_py import gclient, gclient_ext
+import os
+import tempfile
+import time
 import unittest
+from pslx.core.exception import StoragePastLineException, StorageWriteException
 from pslx.schema.enums_pb2 import ReadRuleType, WriteRuleType
 from pslx.storage.default_storage import DefaultStorage
+from pslx.util.file_util import FileUtil
 
 
 class DefaultStorageTest(unittest.TestCase):
     TEST_DATA_1 = "/galaxy/ab-d/pslx/test_data/test_default_storage_data.txt"
     TEST_DATA_2 = "/galaxy/ab-d/pslx/test_data/test_default_storage_data_2.txt"
+    TEST_DATA_3 = "/galaxy/ab-d/pslx/test_data/test_default_storage_data_3.txt"
 
     def test_initialize_from_file(self):
         default_storage = DefaultStorage()
@@ -82,4 +88,204 @@ class DefaultStorageTest(unittest.TestCase):
         default_storage.write(data=data)
         data = default_storage.read()
         gclient_ext.cp_file(self.TEST_DATA_1, self.TEST_DATA_2)
+        gclient.rm_file(self.TEST_DATA_2 + DefaultStorage.PREPEND_FILE_SUFFIX)
         self.assertListEqual(data, ['3,4,5'])
+
+    def test_read_local_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.txt')
+            with open(file_name, 'w') as outfile:
+                outfile.write('\n'.join([str(val) for val in range(10)]) + '\n')
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=file_name)
+            self.assertListEqual(default_storage.read(params={'num_line': 2}), ['0', '1'])
+            with open(file_name, 'a') as outfile:
+                outfile.write('10\n')
+            self.assertListEqual(default_storage.read(params={'num_line': 9}), [str(val) for val in range(2, 11)])
+            self.assertRaises(StoragePastLineException, default_storage.read)
+            self.assertListEqual(list(default_storage.iter_lines()), [str(val) for val in range(11)])
+
+            default_storage.set_config(
+                config={
+                    'read_rule_type': ReadRuleType.READ_FROM_END,
+                }
+            )
+            default_storage.start_from_first_line()
+            self.assertListEqual(default_storage.read(params={'num_line': 2}), ['10', '9'])
+            self.assertListEqual(default_storage.read(params={'num_line': 9}), [str(val) for val in range(8, -1, -1)])
+            self.assertRaises(StoragePastLineException, default_storage.read)
+            self.assertListEqual(list(default_storage.iter_lines()), [str(val) for val in range(10, -1, -1)])
+
+    def test_write_from_beginning_local_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.txt')
+            with open(file_name, 'w') as outfile:
+                outfile.write('2\n1\n')
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=file_name)
+            default_storage.set_config(
+                config={
+                    'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+                }
+            )
+            default_storage.write(data='3')
+            default_storage.write(data='4')
+            with open(file_name, 'r') as infile:
+                self.assertEqual(infile.read(), '2\n1\n3\n4\n')
+            self.assertListEqual(default_storage.read(params={'num_line': 3}), ['4', '3', '2'])
+            default_storage.write(data='5')
+            self.assertListEqual(default_storage.read(), ['2'])
+            self.assertListEqual(list(default_storage.iter_lines()), ['5', '4', '3', '2', '1'])
+
+            default_storage.set_config(
+                config={
+                    'read_rule_type': ReadRuleType.READ_FROM_END,
+                }
+            )
+            default_storage.start_from_first_line()
+            self.assertListEqual(default_storage.read(params={'num_line': 5}), ['1', '2', '3', '4', '5'])
+
+    def _read_write_interleaved(self, file_name):
+        result = []
+        gclient.write(path=file_name, data='1\n \n', mode='w')
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=file_name)
+        default_storage.set_config(
+            config={
+                'read_rule_type': ReadRuleType.READ_FROM_END,
+            }
+        )
+        result.append(default_storage.read())
+        default_storage.write(data='2')
+        result.append(default_storage.read())
+        default_storage.write(data='3')
+        result.append(default_storage.read(params={'num_line': 2}))
+        self.assertRaises(StoragePastLineException, default_storage.read)
+
+        gclient.write(path=file_name, data='', mode='w')
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=file_name)
+        default_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        default_storage.write(data='a')
+        result.append(default_storage.read())
+        default_storage.write(data='b')
+        result.append(default_storage.read())
+        default_storage.write(data='c')
+        result.append(default_storage.read())
+        self.assertRaises(StoragePastLineException, default_storage.read)
+        result.append(list(default_storage.iter_lines()))
+        return result
+
+    def test_read_write_interleaved(self):
+        expected_result = [['1'], [''], ['', '1'], ['a'], ['a'], ['a'], ['c', 'b', 'a']]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertListEqual(self._read_write_interleaved(file_name=os.path.join(tmp_dir, 'test.txt')),
+                                 expected_result)
+        result = self._read_write_interleaved(file_name=self.TEST_DATA_3)
+        gclient.rm_file(self.TEST_DATA_3)
+        gclient.rm_file(self.TEST_DATA_3 + DefaultStorage.PREPEND_FILE_SUFFIX)
+        self.assertListEqual(result, expected_result)
+
+    def test_durable_remote_file(self):
+        gclient.write(path=self.TEST_DATA_3, data='1\n', mode='w')
+        default_storage = DefaultStorage()
+        default_storage.initialize_from_file(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'durable': True,
+            }
+        )
+        self.assertRaises(StorageWriteException, default_storage.write, '2')
+        default_storage.begin_batch(max_count=2)
+        default_storage.write(data='3')
+        self.assertRaises(StorageWriteException, default_storage.flush)
+        self.assertEqual(default_storage.get_num_pending_lines(), 1)
+        data = FileUtil.read(file_name=self.TEST_DATA_3)
+        default_storage.set_config(
+            config={
+                'durable': False,
+            }
+        )
+        default_storage.end_batch()
+        result = list(default_storage.iter_lines())
+        gclient.rm_file(self.TEST_DATA_3)
+        self.assertEqual(data, '1\n')
+        self.assertListEqual(result, ['1', '3'])
+
+    def _write_mixed_rules(self, file_name, is_local):
+        gclient.write(path=file_name, data='', mode='w')
+        end_storage = DefaultStorage()
+        end_storage.initialize_from_file(file_name=file_name)
+        end_storage.write(data='1')
+        beginning_storage = DefaultStorage()
+        beginning_storage.initialize_from_file(file_name=file_name)
+        beginning_storage.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        beginning_storage.write(data='2')
+        if is_local:
+            self.assertRaises(StorageWriteException, end_storage.write, '3')
+        beginning_storage.write(data='4')
+        end_storage.initialize_from_file(file_name=file_name)
+        self.assertRaises(StorageWriteException, end_storage.write, '5')
+        return list(end_storage.iter_lines())
+
+    def test_write_mixed_rules(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.assertListEqual(self._write_mixed_rules(file_name=os.path.join(tmp_dir, 'test.txt'), is_local=True),
+                                 ['4', '2', '1'])
+        result = self._write_mixed_rules(file_name=self.TEST_DATA_3, is_local=False)
+        gclient.rm_file(self.TEST_DATA_3)
+        gclient.rm_file(self.TEST_DATA_3 + DefaultStorage.PREPEND_FILE_SUFFIX)
+        self.assertListEqual(result, ['4', '2', '1'])
+
+    def test_read_empty_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.txt')
+            with open(file_name, 'w') as outfile:
+                outfile.write('\n \n')
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=file_name)
+            self.assertListEqual(default_storage.read(), [''])
+            self.assertRaises(StoragePastLineException, default_storage.read)
+            self.assertListEqual(list(default_storage.iter_lines()), [''])
+
+    def test_batch(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.txt')
+            default_storage = DefaultStorage()
+            default_storage.initialize_from_file(file_name=file_name)
+            default_storage.set_config(
+                config={
+                    'durable': True,
+                }
+            )
+            default_storage.begin_batch(max_count=3)
+            for val in range(5):
+                default_storage.write(data=str(val))
+            self.assertEqual(default_storage.get_num_pending_lines(), 2)
+            with open(file_name, 'r') as infile:
+                self.assertEqual(infile.read(), '0\n1\n2\n')
+            default_storage.flush()
+            self.assertEqual(default_storage.get_rpc_call_count_and_reset(), 2)
+            self.assertListEqual(list(default_storage.iter_lines()), ['0', '1', '2', '3', '4'])
+
+            default_storage.write(data='5')
+            default_storage.close()
+            self.assertFalse(default_storage.is_batching())
+            with open(file_name, 'r') as infile:
+                self.assertEqual(infile.read(), '0\n1\n2\n3\n4\n5\n')
+
+            default_storage.begin_batch(max_seconds=0.05)
+            default_storage.write(data='6')
+            time.sleep(0.5)
+            self.assertEqual(default_storage.get_num_pending_lines(), 0)
+            default_storage.end_batch()
+            with open(file_name, 'r') as infile:
+                self.assertEqual(infile.read(), '0\n1\n2\n3\n4\n5\n6\n')
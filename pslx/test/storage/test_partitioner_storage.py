@@ -1,10 +1,16 @@
 import datetime
+import os
+import tempfile
+import threading
+import time
 from galaxy_py import gclient, gclient_ext
 import unittest
+from pslx.core.exception import StorageInternalException, StorageWriteException
 from pslx.schema.enums_pb2 import WriteRuleType
 from pslx.schema.snapshots_pb2 import NodeSnapshot
 from pslx.storage.proto_table_storage import ProtoTableStorage
 from pslx.storage.partitioner_storage import YearlyPartitionerStorage, MonthlyPartitionerStorage
+from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
@@ -15,6 +21,8 @@ class PartitionerStorageTest(unittest.TestCase):
     YEARLY_PATITIONER_TEST_DATA_4 = "/galaxy/ab-d/pslx/test_data/yearly_partitioner_4/"
     MONTHLY_PATITIONER_TEST_DATA = "/galaxy/ab-d/pslx/test_data/monthly_partitioner_1/"
     MONTHLY_PATITIONER_TEST_DATA_2 = "/galaxy/ab-d/pslx/test_data/monthly_partitioner_2/"
+    RETENTION_PATITIONER_TEST_DATA = "/galaxy/ab-d/pslx/test_data/retention_partitioner/"
+    SEGMENT_PATITIONER_TEST_DATA = "/galaxy/ab-d/pslx/test_data/segment_partitioner/"
 
     def test_initialize_from_dir(self):
         partitioner = YearlyPartitionerStorage()
@@ -110,6 +118,95 @@ class PartitionerStorageTest(unittest.TestCase):
             self.YEARLY_PATITIONER_TEST_DATA_4 + '2020/data.pb': {'test': val},
         })
 
+    def test_write_segments(self):
+        gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_4, self.SEGMENT_PATITIONER_TEST_DATA)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.SEGMENT_PATITIONER_TEST_DATA)
+        with self.assertRaises(StorageInternalException):
+            partitioner.set_segment_config(max_segment_size=1)
+        partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        partitioner.set_segment_config(max_segment_size=1)
+        with self.assertRaises(StorageWriteException):
+            partitioner.write(data={'test_1': NodeSnapshot()}, params={'make_partition': False, 'overwrite': False})
+        message_1 = NodeSnapshot(node_name='test_1')
+        message_2 = NodeSnapshot(node_name='test_2')
+        partitioner.write(data={'test_1': message_1}, params={'make_partition': False})
+        partitioner.write(data={'test_1': message_2, 'test_2': message_2}, params={'make_partition': False})
+        file_names = gclient.list_files_in_dir(self.SEGMENT_PATITIONER_TEST_DATA + '2020/')
+        value = partitioner.read(params={'key': 'test_1', 'message_type': NodeSnapshot})
+        data = partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1),
+            'end_time': datetime.datetime(2020, 1, 5),
+        })
+        gclient.rm_dir_recursive(self.SEGMENT_PATITIONER_TEST_DATA)
+        self.assertEqual(sorted(file_names.keys()), [
+            self.SEGMENT_PATITIONER_TEST_DATA + '2020/data-00001.rec',
+            self.SEGMENT_PATITIONER_TEST_DATA + '2020/data-00002.rec',
+            self.SEGMENT_PATITIONER_TEST_DATA + '2020/data.pb',
+        ])
+        self.assertEqual(value, message_2)
+        self.assertListEqual(list(data.keys()), [self.SEGMENT_PATITIONER_TEST_DATA + '2020/data.pb'])
+        self.assertListEqual(sorted(data[self.SEGMENT_PATITIONER_TEST_DATA + '2020/data.pb'].keys()),
+                             ['test', 'test_1', 'test_2'])
+
+    def test_read_segments(self):
+        class ReplayRecordingStorage(ProtoTableStorage):
+            def __init__(self):
+                super().__init__()
+                self.replayed_segments = []
+
+            def replay_log_files(self, log_file_names):
+                self.replayed_segments.append([FileUtil.base_name(file_name) for file_name in log_file_names])
+                super().replay_log_files(log_file_names=log_file_names)
+
+        gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_4, self.SEGMENT_PATITIONER_TEST_DATA)
+        storage = ReplayRecordingStorage()
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.SEGMENT_PATITIONER_TEST_DATA)
+        partitioner.set_underlying_storage(storage=storage)
+        partitioner.set_segment_config()
+        message_1 = NodeSnapshot(node_name='test_1')
+        message_2 = NodeSnapshot(node_name='test_2')
+        params = {'key': 'test_1', 'message_type': NodeSnapshot}
+        partitioner.write(data={'test_1': message_1}, params={'make_partition': False})
+        values = [partitioner.read(params=dict(params)), partitioner.read(params=dict(params))]
+        partitioner.write(data={'test_1': message_2}, params={'make_partition': False})
+        values.append(partitioner.read(params=dict(params)))
+
+        other_partitioner = YearlyPartitionerStorage()
+        other_partitioner.initialize_from_dir(dir_name=self.SEGMENT_PATITIONER_TEST_DATA)
+        other_partitioner.set_underlying_storage(storage=ProtoTableStorage())
+        other_partitioner.set_segment_config()
+        other_partitioner.write(data={'test_2': message_2}, params={'make_partition': False})
+        values.append(partitioner.read(params={'key': 'test_2', 'message_type': NodeSnapshot}))
+        table_storage = ProtoTableStorage()
+        table_storage.initialize_from_file(file_name=self.SEGMENT_PATITIONER_TEST_DATA + '2020/data.pb')
+        table_storage.write(data={'test_3': message_1})
+        values.append(partitioner.read(params=dict(params)))
+        values.append(partitioner.read(params={'key': 'test_3', 'message_type': NodeSnapshot}))
+        gclient.rm_dir_recursive(self.SEGMENT_PATITIONER_TEST_DATA)
+        self.assertListEqual(values, [message_1, message_1, message_2, message_2, message_2, message_1])
+        self.assertListEqual(storage.replayed_segments, [
+            ['data-00001.rec'], [], ['data-00001.rec'], ['data-00002.rec'], ['data-00001.rec', 'data-00002.rec'], []
+        ])
+
+    def test_iter_range(self):
+        partitioner = MonthlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.MONTHLY_PATITIONER_TEST_DATA)
+        start_time = datetime.datetime(2019, 6, 5)
+        end_time = datetime.datetime(2020, 1, 5)
+        self.assertListEqual(list(partitioner.iter_range(params={'start_time': start_time, 'end_time': end_time})),
+                             [(self.MONTHLY_PATITIONER_TEST_DATA + '2020/01/data', ['1,2,3', '2,3,4'])])
+
+        partitioner = MonthlyPartitionerStorage(max_capacity=3)
+        partitioner.initialize_from_dir(dir_name=self.MONTHLY_PATITIONER_TEST_DATA)
+        self.assertEqual(partitioner.get_oldest_dir(), self.MONTHLY_PATITIONER_TEST_DATA + '2020/02/')
+        end_time = datetime.datetime(2020, 3, 5)
+        self.assertListEqual(list(partitioner.iter_range(params={'start_time': start_time, 'end_time': end_time,
+                                                                 'batch_size': 1})),
+                             [(self.MONTHLY_PATITIONER_TEST_DATA + '2020/01/data', ['1,2,3', '2,3,4']),
+                              (self.MONTHLY_PATITIONER_TEST_DATA + '2020/02/data', ['1,2,3', '2,3,4'])])
+
     def test_write_1(self):
         partitioner = YearlyPartitionerStorage()
         partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
@@ -150,6 +247,109 @@ class PartitionerStorageTest(unittest.TestCase):
         gclient.rm_dir_recursive(self.YEARLY_PATITIONER_TEST_DATA)
         gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA)
 
+    def test_read_range_write_from_beginning(self):
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
+        partitioner.set_config(
+            config={
+                'write_rule_type': WriteRuleType.WRITE_FROM_BEGINNING,
+            }
+        )
+        partitioner.write(data=[3, 4, 5], params={'make_partition': False})
+        partitioner.write(data=[4, 5, 6], params={'make_partition': False})
+        data = partitioner.read_range(params={
+            'start_time': datetime.datetime(2020, 1, 1),
+            'end_time': datetime.datetime(2020, 1, 5),
+        })
+        gclient.rm_dir_recursive(self.YEARLY_PATITIONER_TEST_DATA)
+        gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA)
+        self.assertDictEqual(data, {
+            self.YEARLY_PATITIONER_TEST_DATA + '2020/data': ['4,5,6', '3,4,5', '1,2,3', '2,3,4'],
+        })
+
+    def test_tree_cache(self):
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
+        partitioner.set_tree_cache_ttl(ttl=3600)
+        partitioner.read()
+        partitioner.get_latest_dir()
+        self.assertEqual(partitioner.get_num_tree_cache_hits(), 2)
+        self.assertEqual(partitioner.get_num_avoided_list_calls(), 2)
+
+        other_partitioner = YearlyPartitionerStorage()
+        other_partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA)
+        other_partitioner.write(data=[3, 4, 5], params={'make_partition': False})
+        partitioner.read()
+        self.assertEqual(partitioner.get_num_tree_cache_hits(), 2)
+        partitioner.read()
+        self.assertEqual(partitioner.get_num_tree_cache_hits(), 3)
+        gclient.rm_dir_recursive(self.YEARLY_PATITIONER_TEST_DATA)
+        gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_2, self.YEARLY_PATITIONER_TEST_DATA)
+
+    def test_garbage_collect(self):
+        partitioner = MonthlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.MONTHLY_PATITIONER_TEST_DATA)
+        partitioner.set_retention_policy(max_num_partitions=1)
+        removed_partitions = partitioner.garbage_collect()
+        gclient.rm_dir_recursive(self.MONTHLY_PATITIONER_TEST_DATA)
+        gclient_ext.cp_folder(self.MONTHLY_PATITIONER_TEST_DATA_2, self.MONTHLY_PATITIONER_TEST_DATA)
+        self.assertListEqual(removed_partitions, [self.MONTHLY_PATITIONER_TEST_DATA + '2020/01/'])
+        self.assertEqual(partitioner.get_oldest_dir(), self.MONTHLY_PATITIONER_TEST_DATA + '2020/02/')
+
+        gclient_ext.cp_folder(self.YEARLY_PATITIONER_TEST_DATA_3, self.RETENTION_PATITIONER_TEST_DATA)
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.RETENTION_PATITIONER_TEST_DATA)
+        partitioner.set_retention_policy(max_age=datetime.timedelta(days=1))
+        partitioner.start_garbage_collection(interval=60, max_deletions_per_sec=10)
+        time.sleep(1)
+        partitioner.stop_garbage_collection()
+        dirs = gclient.list_dirs_in_dir(self.RETENTION_PATITIONER_TEST_DATA)
+        oldest_dir = partitioner.get_oldest_dir()
+        gclient.rm_dir_recursive(self.RETENTION_PATITIONER_TEST_DATA)
+        self.assertEqual(len(dirs), 1)
+        self.assertEqual(oldest_dir, self.RETENTION_PATITIONER_TEST_DATA + '2020/')
+
+    def test_tree_lock(self):
+        partitioner = YearlyPartitionerStorage()
+        partitioner.initialize_from_dir(dir_name=self.YEARLY_PATITIONER_TEST_DATA_3)
+        partitioner.set_tree_cache_ttl(ttl=3600)
+        results = {}
+        readers = [
+            threading.Thread(target=lambda: results.update(latest_dir=partitioner.get_latest_dir())),
+            threading.Thread(target=lambda: results.update(oldest_dir=partitioner.get_oldest_dir())),
+            threading.Thread(target=lambda: results.update(data=partitioner.read_range(params={
+                'start_time': datetime.datetime(2019, 1, 5),
+                'end_time': datetime.datetime(2020, 1, 5),
+            }))),
+        ]
+        with partitioner._tree_lock:
+            for reader in readers:
+                reader.start()
+            for reader in readers:
+                reader.join(timeout=0.2)
+                self.assertTrue(reader.is_alive())
+            self.assertDictEqual(results, {})
+        for reader in readers:
+            reader.join()
+        self.assertEqual(results['latest_dir'], self.YEARLY_PATITIONER_TEST_DATA_3 + '2020/')
+        self.assertEqual(results['oldest_dir'], self.YEARLY_PATITIONER_TEST_DATA_3 + '2019/')
+        self.assertEqual(len(results['data']), 2)
+
+    def test_garbage_collect_lock_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for partition in ['2020/01', '2020/02']:
+                os.makedirs(os.path.join(tmp_dir, partition))
+                with open(os.path.join(tmp_dir, partition, 'data'), 'w') as outfile:
+                    outfile.write('1,2,3\n')
+            partitioner = MonthlyPartitionerStorage()
+            partitioner.initialize_from_dir(dir_name=tmp_dir)
+            partitioner.set_retention_policy(max_num_partitions=1)
+            partitioner.set_config(config={'file_lock': True})
+            self.assertListEqual(partitioner.garbage_collect(), [partitioner.get_dir_name() + '2020/01/'])
+            self.assertTrue(os.path.isfile(os.path.join(tmp_dir, 'garbage_collection.lock')))
+            self.assertFalse(os.path.isfile(tmp_dir + '.lock'))
+            self.assertEqual(partitioner.get_oldest_dir(), partitioner.get_dir_name() + '2020/02/')
+
     def test_incremental_build(self):
         partitioner = MonthlyPartitionerStorage(max_capacity=4)
         partitioner.initialize_from_dir(dir_name=self.MONTHLY_PATITIONER_TEST_DATA)
@@ -1,8 +1,11 @@
-from galaxy_py import gclient_ext
+from galaxy_py import gclient, gclient_ext
 import unittest
 
+from pslx.schema.enums_pb2 import CompressionType, Status
 from pslx.schema.snapshots_pb2 import NodeSnapshot, OperatorSnapshot
 from pslx.storage.proto_table_storage import ProtoTableStorage
+from pslx.tool.file_lock_tool import FileLockTool
+from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
@@ -83,6 +86,58 @@ class ProtoTableStorageTest(unittest.TestCase):
         )
         self.assertIsNone(result_proto)
 
+    def test_read_all_lazy(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_3
+        )
+        result = proto_table_storage.read_all_lazy(message_type=NodeSnapshot)
+        self.assertListEqual(list(result.keys()), ['test'])
+        self.assertEqual(result.get_num_decoded(), 0)
+        self.assertEqual(result['test'], self.EXAMPLE_PROTO_1)
+        self.assertEqual(result.get_num_decoded(), 1)
+        self.assertTrue('test1' not in result)
+
+    def test_iter_items(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_3
+        )
+        self.assertListEqual(list(proto_table_storage.iter_items(message_type=NodeSnapshot)),
+                             [('test', self.EXAMPLE_PROTO_1)])
+        self.assertListEqual(list(proto_table_storage.iter_items(batch_size=2)),
+                             [{'test': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_1)}])
+
+    def test_refresh_if_changed(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertFalse(proto_table_storage.refresh_if_changed())
+
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        new_proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+        self.assertTrue(proto_table_storage.refresh_if_changed())
+        self.assertEqual(proto_table_storage.get_num_entries(), 2)
+        self.assertFalse(proto_table_storage.refresh_if_changed())
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_to_dataframe(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_3
+        )
+        result = proto_table_storage.to_dataframe(message_type=NodeSnapshot, fields=['node_name', 'children_names'])
+        self.assertListEqual(list(result.index), ['test'])
+        self.assertListEqual(list(result.columns), ['node_name', 'children_names'])
+        self.assertEqual(result.loc['test', 'node_name'], 'test')
+        self.assertListEqual(result.loc['test', 'children_names'], ['child_1', 'child_2'])
+
     def test_write_1(self):
         proto_table_storage = ProtoTableStorage()
         proto_table_storage.initialize_from_file(
@@ -173,3 +228,368 @@ class ProtoTableStorageTest(unittest.TestCase):
         self.assertEqual(result_proto, self.EXAMPLE_PROTO_2)
         self.assertEqual(proto_table_storage.get_num_entries(), 2)
         gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_read_range(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.delete_all()
+        proto_table_storage.write(
+            data={
+                'test_3': self.EXAMPLE_PROTO_1,
+                'test_1': self.EXAMPLE_PROTO_1,
+                'test_2': self.EXAMPLE_PROTO_1,
+                'test_4': self.EXAMPLE_PROTO_1,
+            }
+        )
+        proto_table_storage.delete(key='test_4')
+        self.assertEqual(proto_table_storage.get_min_key(), 'test_1')
+        self.assertEqual(proto_table_storage.get_max_key(), 'test_3')
+        result = proto_table_storage.read_range(
+            params={
+                'start_key': 'test_2',
+                'message_type': NodeSnapshot,
+            }
+        )
+        self.assertListEqual(list(result.keys()), ['test_2', 'test_3'])
+        self.assertEqual(result['test_2'], self.EXAMPLE_PROTO_1)
+        result = proto_table_storage.read_range(
+            params={
+                'end_key': 'test_3',
+                'limit': 2,
+                'reverse': True,
+            }
+        )
+        self.assertListEqual(list(result.keys()), ['test_3', 'test_2'])
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_read_range_after_mutations(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.delete_all()
+        proto_table_storage.MAX_KEY_INDEX_POPS = 2
+        with proto_table_storage.batch():
+            for index in [5, 3, 8, 1, 9, 2]:
+                proto_table_storage.write(data={'test_' + str(index): self.EXAMPLE_PROTO_1})
+            proto_table_storage.delete(key='test_8')
+            proto_table_storage.write(data={'test_8': self.EXAMPLE_PROTO_1})
+            proto_table_storage.delete(key='test_9')
+        self.assertListEqual(list(proto_table_storage.read_range().keys()),
+                             ['test_1', 'test_2', 'test_3', 'test_5', 'test_8'])
+        for key in ['test_1', 'test_5']:
+            proto_table_storage.delete(key=key)
+        proto_table_storage.write(data={'test_1': self.EXAMPLE_PROTO_1, 'test_7': self.EXAMPLE_PROTO_1})
+        proto_table_storage.delete(key='test_7')
+        self.assertEqual(proto_table_storage.get_min_key(), 'test_1')
+        self.assertEqual(proto_table_storage.get_max_key(), 'test_8')
+        proto_table_storage.delete_multiple(keys=['test_1', 'test_2', 'test_3'])
+        proto_table_storage.write(data={'test_4': self.EXAMPLE_PROTO_1, 'test_0': self.EXAMPLE_PROTO_1})
+        self.assertListEqual([key for key, _ in proto_table_storage.iter_items()], ['test_0', 'test_4', 'test_8'])
+        self.assertListEqual(list(proto_table_storage.read_range(params={'reverse': True}).keys()),
+                             ['test_8', 'test_4', 'test_0'])
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_batch(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.get_rpc_call_count_and_reset()
+        with proto_table_storage.batch():
+            proto_table_storage.write(
+                data={'test_1': self.EXAMPLE_PROTO_2}
+            )
+            proto_table_storage.delete(key='test')
+            self.assertEqual(proto_table_storage.get_num_pending_mutations(), 2)
+            self.assertEqual(proto_table_storage.get_rpc_call_count(), 0)
+
+        self.assertEqual(proto_table_storage.get_rpc_call_count(), 1)
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertDictEqual(new_proto_table_storage.read_all(), {
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_2),
+        })
+
+        proto_table_storage.begin_batch(max_count=2)
+        proto_table_storage.write(
+            data={'test_2': self.EXAMPLE_PROTO_1}
+        )
+        self.assertEqual(proto_table_storage.get_num_pending_mutations(), 1)
+        proto_table_storage.write(
+            data={'test_3': self.EXAMPLE_PROTO_1}
+        )
+        self.assertEqual(proto_table_storage.get_num_pending_mutations(), 0)
+        proto_table_storage.end_batch()
+        self.assertFalse(proto_table_storage.is_batching())
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_write_ahead_log(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(
+            config={
+                'write_ahead_log': True,
+                'compaction_threshold': 3,
+            }
+        )
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.write(
+            data={'test': self.EXAMPLE_PROTO_1}
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+        proto_table_storage.delete(key='test')
+        self.assertEqual(proto_table_storage.get_num_log_records(), 2)
+
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertEqual(new_proto_table_storage.get_num_log_records(), 2)
+        self.assertDictEqual(new_proto_table_storage.read_all(), {
+            'test_1': ProtoUtil.message_to_any(self.EXAMPLE_PROTO_2),
+        })
+        self.assertFalse(new_proto_table_storage.refresh_if_changed())
+
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_3}
+        )
+        self.assertEqual(proto_table_storage.get_num_log_records(), 0)
+        self.assertTrue(new_proto_table_storage.refresh_if_changed())
+        self.assertFalse(new_proto_table_storage.refresh_if_changed())
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertEqual(new_proto_table_storage.get_num_log_records(), 0)
+        result_proto = new_proto_table_storage.read(
+            params={
+                'key': 'test_1',
+                'message_type': OperatorSnapshot
+            }
+        )
+        self.assertEqual(result_proto, self.EXAMPLE_PROTO_3)
+        gclient.rm_file(self.TEST_DATA_4 + ProtoTableStorage.LOG_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_file_lock(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(config={'file_lock': True})
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        other_proto_table_storage = ProtoTableStorage()
+        other_proto_table_storage.set_config(config={'file_lock': True})
+        other_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_1}
+        )
+        other_proto_table_storage.write(
+            data={'test_2': self.EXAMPLE_PROTO_2}
+        )
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        data = new_proto_table_storage.read_all()
+        file_names = gclient.list_files_in_dir(FileUtil.dir_name(file_name=self.TEST_DATA_4))
+        gclient.rm_file(self.TEST_DATA_4 + FileLockTool.LOCK_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+        self.assertIn('test_1', data)
+        self.assertIn('test_2', data)
+        self.assertFalse(any(FileUtil.is_temp_file(file_name=file_name) for file_name in file_names))
+
+    def test_file_lock_batch(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(config={'file_lock': True})
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        other_proto_table_storage = ProtoTableStorage()
+        other_proto_table_storage.set_config(config={'file_lock': True})
+        other_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_1}
+        )
+        other_proto_table_storage.write(
+            data={'test_2': self.EXAMPLE_PROTO_2}
+        )
+        with proto_table_storage.batch():
+            proto_table_storage.write(
+                data={'test_3': self.EXAMPLE_PROTO_1}
+            )
+            proto_table_storage.delete(key='test_1')
+        with other_proto_table_storage.batch():
+            other_proto_table_storage.write(
+                data={'test_4': self.EXAMPLE_PROTO_2}
+            )
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        data = new_proto_table_storage.read_all()
+        gclient.rm_file(self.TEST_DATA_4 + FileLockTool.LOCK_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+        self.assertNotIn('test_1', data)
+        for key in ['test_2', 'test_3', 'test_4']:
+            self.assertIn(key, data)
+        self.assertIn('test_2', proto_table_storage.read_all())
+
+    def test_compression(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(
+            config={
+                'compression_type': CompressionType.LZMA,
+            }
+        )
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_2}
+        )
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        result_proto = new_proto_table_storage.read(
+            params={
+                'key': 'test_1',
+                'message_type': OperatorSnapshot
+            }
+        )
+        self.assertEqual(result_proto, self.EXAMPLE_PROTO_2)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_read_by_index(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.delete_all()
+        proto_table_storage.add_index(field='status', message_type=OperatorSnapshot)
+        proto_table_storage.write(
+            data={
+                'test_1': self.EXAMPLE_PROTO_2,
+                'test_2': self.EXAMPLE_PROTO_3,
+                'test_3': self.EXAMPLE_PROTO_1,
+            }
+        )
+        self.assertListEqual(list(proto_table_storage.read_by_index(field='status', value=Status.SUCCEEDED)),
+                             ['test_1'])
+        proto_table_storage.write(
+            data={'test_1': self.EXAMPLE_PROTO_3}
+        )
+        self.assertDictEqual(proto_table_storage.read_by_index(field='status', value=Status.SUCCEEDED), {})
+        proto_table_storage.delete(key='test_2')
+
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        new_proto_table_storage.add_index(field='status', message_type=OperatorSnapshot)
+        new_proto_table_storage.add_index(field='node_snapshot.children_names', message_type=OperatorSnapshot)
+        self.assertDictEqual(new_proto_table_storage.read_by_index(
+            field='status', value=Status.RUNNING, message_type=OperatorSnapshot), {'test_1': self.EXAMPLE_PROTO_3})
+        self.assertListEqual(list(new_proto_table_storage.read_by_index(
+            field='node_snapshot.children_names', value='child_2')), ['test_1'])
+        gclient.rm_file(self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_read_by_index_persisted(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.delete_all()
+        proto_table_storage.add_index(field='status', message_type=OperatorSnapshot)
+        proto_table_storage.write(
+            data={
+                'test_1': self.EXAMPLE_PROTO_2,
+                'test_2': self.EXAMPLE_PROTO_3,
+            }
+        )
+        index_file_attr = FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX)
+        proto_table_storage.write(
+            data={
+                'test_2': self.EXAMPLE_PROTO_3,
+                'test_3': self.EXAMPLE_PROTO_1,
+            }
+        )
+        self.assertEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX),
+                         index_file_attr)
+
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertListEqual(new_proto_table_storage.get_index_fields(), ['status'])
+        self.assertListEqual(list(new_proto_table_storage.read_by_index(field='status', value=Status.SUCCEEDED)),
+                             ['test_1'])
+        self.assertEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX),
+                         index_file_attr)
+        new_proto_table_storage.write(
+            data={'test_4': self.EXAMPLE_PROTO_2}
+        )
+        self.assertNotEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX),
+                            index_file_attr)
+
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        self.assertListEqual(list(proto_table_storage.read_by_index(field='status', value=Status.SUCCEEDED)),
+                             ['test_1', 'test_4'])
+        gclient.rm_file(self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
+
+    def test_read_by_index_write_ahead_log(self):
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.set_config(
+            config={
+                'write_ahead_log': True,
+            }
+        )
+        proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        proto_table_storage.delete_all()
+        proto_table_storage.add_index(field='status', message_type=OperatorSnapshot)
+        proto_table_storage.write(
+            data={
+                'test_1': self.EXAMPLE_PROTO_2,
+                'test_2': self.EXAMPLE_PROTO_2,
+            }
+        )
+        index_file_attr = FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX)
+        proto_table_storage.write(
+            data={
+                'test_1': self.EXAMPLE_PROTO_3,
+                'test_3': self.EXAMPLE_PROTO_2,
+            }
+        )
+        proto_table_storage.delete(key='test_2')
+        self.assertEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX),
+                         index_file_attr)
+
+        new_proto_table_storage = ProtoTableStorage()
+        new_proto_table_storage.initialize_from_file(
+            file_name=self.TEST_DATA_4
+        )
+        new_proto_table_storage.add_index(field='status', message_type=OperatorSnapshot)
+        self.assertListEqual(list(new_proto_table_storage.read_by_index(field='status', value=Status.SUCCEEDED)),
+                             ['test_3'])
+        self.assertListEqual(list(new_proto_table_storage.read_by_index(field='status', value=Status.RUNNING)),
+                             ['test_1'])
+        gclient.rm_file(self.TEST_DATA_4 + ProtoTableStorage.INDEX_FILE_SUFFIX)
+        gclient.rm_file(self.TEST_DATA_4 + ProtoTableStorage.LOG_FILE_SUFFIX)
+        gclient_ext.cp_file(self.TEST_DATA_2, self.TEST_DATA_4)
@@ -1,8 +1,14 @@
 from galaxy_py import gclient, gclient_ext
+import os
+import tempfile
 import unittest
 
+from pslx.core.exception import StorageWriteException
 from pslx.schema.snapshots_pb2 import NodeSnapshot
+from pslx.storage.proto_table_storage import ProtoTableStorage
 from pslx.storage.sharded_proto_table_storage import ShardedProtoTableStorage
+from pslx.tool.file_lock_tool import FileLockTool
+from pslx.util.file_util import FileUtil
 from pslx.util.proto_util import ProtoUtil
 
 
@@ -18,6 +24,7 @@ class ShardedProtoTableStorageTest(unittest.TestCase):
     TEST_DATA_DIR_1 = '/galaxy/ab-d/pslx/test_data/sharded_proto_table_1'
     TEST_DATA_DIR_2 = '/galaxy/ab-d/pslx/test_data/sharded_proto_table_2'
     TEST_DATA_DIR_3 = '/galaxy/ab-d/pslx/test_data/sharded_proto_table_3'
+    TEST_DATA_DIR_4 = '/galaxy/ab-d/pslx/test_data/sharded_proto_table_4'
 
     def test_initialize_from_dir(self):
         shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=3)
@@ -67,6 +74,166 @@ class ShardedProtoTableStorageTest(unittest.TestCase):
         gclient.rm_dir(self.TEST_DATA_DIR_1)
         gclient_ext.cp_folder(self.TEST_DATA_DIR_2, self.TEST_DATA_DIR_1)
 
+    def test_write_4(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=3)
+        shared_proto_table_storage.set_config(config={'num_io_workers': 4})
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        data = {'test_' + str(index): NodeSnapshot(node_name=str(index)) for index in range(16)}
+        shared_proto_table_storage.write(data=data)
+        self.assertEqual(shared_proto_table_storage.get_num_entries(), 16)
+        self.assertEqual(shared_proto_table_storage.get_num_shards(), 6)
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        self.assertDictEqual(dict(new_shared_proto_table_storage.iter_items(message_type=NodeSnapshot)), data)
+        gclient.rm_dir(self.TEST_DATA_DIR_1)
+        gclient_ext.cp_folder(self.TEST_DATA_DIR_2, self.TEST_DATA_DIR_1)
+
+    def test_hash_routing(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(num_hash_shards=3)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        data = {'test_' + str(index): NodeSnapshot(node_name=str(index)) for index in range(20)}
+        shared_proto_table_storage.write(data=data)
+        shared_proto_table_storage.write(data={'test_0': self.EXAMPLE_PROTO})
+        data['test_0'] = self.EXAMPLE_PROTO
+        self.assertTrue(shared_proto_table_storage.is_hash_routing())
+        self.assertEqual(shared_proto_table_storage.get_num_entries(), 20)
+        self.assertEqual(shared_proto_table_storage.get_num_shards(), 3)
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        self.assertTrue(new_shared_proto_table_storage.is_hash_routing())
+        self.assertEqual(new_shared_proto_table_storage.get_num_entries(), 20)
+        self.assertEqual(new_shared_proto_table_storage.read(params={'key': 'test_0', 'message_type': NodeSnapshot}),
+                         self.EXAMPLE_PROTO)
+        self.assertIsNone(new_shared_proto_table_storage.read(params={'key': 'test_20'}))
+
+        new_shared_proto_table_storage.split_hash_shards(new_num_hash_shards=5)
+        self.assertEqual(new_shared_proto_table_storage.get_num_shards(), 5)
+        self.assertEqual(new_shared_proto_table_storage.get_num_entries(), 20)
+        self.assertDictEqual(dict(new_shared_proto_table_storage.iter_items(message_type=NodeSnapshot)), data)
+        self.assertDictEqual(new_shared_proto_table_storage.read_multiple(params={'keys': list(data.keys())}),
+                             {key: ProtoUtil.message_to_any(val) for key, val in data.items()})
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_delete_and_compact(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=3)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        data = {'test_' + str(index): NodeSnapshot(node_name=str(index)) for index in range(10)}
+        shared_proto_table_storage.write(data=data)
+        self.assertEqual(shared_proto_table_storage.get_num_shards(), 4)
+        shared_proto_table_storage.delete(key='test_0')
+        shared_proto_table_storage.delete_multiple(keys=['test_1', 'test_4', 'test_20'])
+        for key in ['test_0', 'test_1', 'test_4']:
+            del data[key]
+        self.assertEqual(shared_proto_table_storage.get_num_entries(), 7)
+        self.assertIsNone(shared_proto_table_storage.read(params={'key': 'test_1'}))
+
+        self.assertFalse(shared_proto_table_storage.compact(io_budget=1))
+        shared_proto_table_storage.compact(blocking=False).join()
+        self.assertTrue(shared_proto_table_storage.compact())
+        self.assertEqual(shared_proto_table_storage.get_num_shards(), 3)
+        self.assertFalse(FileUtil.does_file_exist(file_name=self.TEST_DATA_DIR_4 + '/data@3.pb'))
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        self.assertEqual(new_shared_proto_table_storage.get_num_shards(), 3)
+        self.assertEqual(new_shared_proto_table_storage.get_num_entries(), 7)
+        self.assertDictEqual(dict(new_shared_proto_table_storage.iter_items(message_type=NodeSnapshot)), data)
+        self.assertDictEqual(new_shared_proto_table_storage.read_multiple(params={'keys': list(data.keys())}),
+                             {key: ProtoUtil.message_to_any(val) for key, val in data.items()})
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_compact_removes_lock_file(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=2)
+            shared_proto_table_storage.initialize_from_dir(dir_name=tmp_dir)
+            shared_proto_table_storage.write(data={'test_' + str(index): NodeSnapshot(node_name=str(index))
+                                                   for index in range(4)})
+            shared_proto_table_storage.delete_multiple(keys=['test_0', 'test_1'])
+            with FileLockTool(protected_file_path=os.path.join(tmp_dir, 'data@1.pb')):
+                pass
+            self.assertTrue(os.path.isfile(os.path.join(tmp_dir, 'data@1.pb.lock')))
+            self.assertTrue(shared_proto_table_storage.compact())
+            self.assertEqual(shared_proto_table_storage.get_num_shards(), 1)
+            self.assertFalse(os.path.isfile(os.path.join(tmp_dir, 'data@1.pb')))
+            self.assertFalse(os.path.isfile(os.path.join(tmp_dir, 'data@1.pb.lock')))
+
+    def test_delete_missing_keys(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=3)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        shared_proto_table_storage.write(data={'test_' + str(index): self.EXAMPLE_PROTO for index in range(3)})
+        index_map_attr = FileUtil.get_file_attr(file_name=self.TEST_DATA_DIR_4 + '/index_map.pb')
+        shared_proto_table_storage.delete_multiple(keys=['test_3', 'test_4'])
+        self.assertEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_DIR_4 + '/index_map.pb'), index_map_attr)
+
+        proto_table_storage = ProtoTableStorage()
+        proto_table_storage.initialize_from_file(file_name=self.TEST_DATA_DIR_4 + '/data@0.pb')
+        proto_table_storage.delete(key='test_0')
+        shared_proto_table_storage.delete(key='test_0')
+        self.assertEqual(FileUtil.get_file_attr(file_name=self.TEST_DATA_DIR_4 + '/index_map.pb'), index_map_attr)
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_delete_hash_routing(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(num_hash_shards=3)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        shared_proto_table_storage.write(data={'test_' + str(index): self.EXAMPLE_PROTO for index in range(10)})
+        shared_proto_table_storage.delete_multiple(keys=['test_' + str(index) for index in range(5)])
+        self.assertEqual(shared_proto_table_storage.get_num_entries(), 5)
+        self.assertEqual(len(shared_proto_table_storage.read_all()), 5)
+        self.assertTrue(shared_proto_table_storage.compact())
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_bloom_filter(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(num_hash_shards=2)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        shared_proto_table_storage.write(data={'test_0': self.EXAMPLE_PROTO})
+        shared_proto_table_storage.enable_bloom_filters(false_positive_rate=0.001)
+        data = {'test_' + str(index): NodeSnapshot(node_name=str(index)) for index in range(1, 20)}
+        shared_proto_table_storage.write(data=data)
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        self.assertTrue(new_shared_proto_table_storage.is_bloom_filter_enabled())
+        for index in range(20):
+            self.assertTrue(new_shared_proto_table_storage.may_contain(key='test_' + str(index)))
+        self.assertFalse(new_shared_proto_table_storage.may_contain(key='test_20'))
+        self.assertEqual(len(new_shared_proto_table_storage.read_multiple(
+            params={'keys': ['test_' + str(index) for index in range(40)]})), 20)
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_segmented_index_map(self):
+        shared_proto_table_storage = ShardedProtoTableStorage(size_per_shard=3, num_index_segments=4)
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        data = {'test_' + str(index): NodeSnapshot(node_name=str(index)) for index in range(10)}
+        shared_proto_table_storage.write(data=data)
+        shared_proto_table_storage.write(data={'test_0': self.EXAMPLE_PROTO, 'test_10': self.EXAMPLE_PROTO})
+        self.assertTrue(shared_proto_table_storage.is_index_segmented())
+        self.assertEqual(shared_proto_table_storage.get_num_entries(), 11)
+        self.assertEqual(shared_proto_table_storage.get_num_shards(), 4)
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        self.assertEqual(new_shared_proto_table_storage.get_num_loaded_index_segments(), 0)
+        self.assertEqual(new_shared_proto_table_storage.read(params={'key': 'test_10', 'message_type': NodeSnapshot}),
+                         self.EXAMPLE_PROTO)
+        self.assertEqual(new_shared_proto_table_storage.get_num_loaded_index_segments(), 1)
+        self.assertEqual(len(new_shared_proto_table_storage.read_multiple(params={'keys': list(data.keys())})), 10)
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
+
+    def test_segment_index_map(self):
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        shared_proto_table_storage.segment_index_map(num_index_segments=2)
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        self.assertTrue(new_shared_proto_table_storage.is_index_segmented())
+        self.assertEqual(new_shared_proto_table_storage.get_num_entries(), 9)
+        self.assertEqual(new_shared_proto_table_storage.read(params={'key': 'test_0', 'message_type': NodeSnapshot}),
+                         self.EXAMPLE_PROTO)
+        gclient.rm_dir(self.TEST_DATA_DIR_1)
+        gclient_ext.cp_folder(self.TEST_DATA_DIR_2, self.TEST_DATA_DIR_1)
+
     def test_read_1(self):
         shared_proto_table_storage = ShardedProtoTableStorage()
         shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
@@ -126,6 +293,43 @@ class ShardedProtoTableStorageTest(unittest.TestCase):
         gclient.rm_dir(self.TEST_DATA_DIR_1)
         gclient_ext.cp_folder(self.TEST_DATA_DIR_2, self.TEST_DATA_DIR_1)
 
+    def test_to_columns(self):
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        columns = shared_proto_table_storage.to_columns(message_type=NodeSnapshot, fields=['node_name'])
+        self.assertEqual(len(columns['key']), 9)
+        self.assertListEqual(list(columns['node_name']), ['test'] * 9)
+
+    def test_read_by_index(self):
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        shared_proto_table_storage.add_index(field='node_name', message_type=NodeSnapshot)
+        shared_proto_table_storage.write(
+            data={
+                'test_10': NodeSnapshot(node_name='test_10'),
+            }
+        )
+        self.assertListEqual(list(shared_proto_table_storage.read_by_index(field='node_name', value='test_10')),
+                             ['test_10'])
+        self.assertEqual(len(shared_proto_table_storage.read_by_index(field='node_name', value='test')), 9)
+
+        new_shared_proto_table_storage = ShardedProtoTableStorage()
+        new_shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        self.assertListEqual(new_shared_proto_table_storage.get_index_fields(), ['node_name'])
+        self.assertListEqual(list(new_shared_proto_table_storage.read_by_index(field='node_name', value='test_10')),
+                             ['test_10'])
+        gclient.rm_dir(self.TEST_DATA_DIR_1)
+        gclient_ext.cp_folder(self.TEST_DATA_DIR_2, self.TEST_DATA_DIR_1)
+
+    def test_iter_items(self):
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        items = list(shared_proto_table_storage.iter_items(message_type=NodeSnapshot))
+        self.assertEqual(len(items), 9)
+        self.assertEqual(items[0][1], self.EXAMPLE_PROTO)
+        batches = list(shared_proto_table_storage.iter_items(batch_size=4))
+        self.assertListEqual([len(batch) for batch in batches], [4, 4, 1])
+
     def test_resize_to_new_table(self):
         shared_proto_table_storage = ShardedProtoTableStorage()
         shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
@@ -135,4 +339,71 @@ class ShardedProtoTableStorageTest(unittest.TestCase):
         )
         self.assertEqual(new_table.get_num_entries(), 9)
         self.assertEqual(new_table.get_num_shards(), 5)
+        self.assertEqual(new_table.read(params={'key': 'test_0', 'message_type': NodeSnapshot}), self.EXAMPLE_PROTO)
+        gclient.rm_dir(self.TEST_DATA_DIR_3)
+
+    def test_resize_to_new_table_resume(self):
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_1)
+        shared_proto_table_storage.set_config(config={'num_io_workers': 1})
+        progress = []
+
+        def interrupt(num_completed_shards, num_shards):
+            progress.append((num_completed_shards, num_shards))
+            raise RuntimeError("interrupted")
+
+        with self.assertRaises(StorageWriteException):
+            shared_proto_table_storage.resize_to_new_table(
+                new_size_per_shard=2,
+                new_dir_name=self.TEST_DATA_DIR_3,
+                progress_callback=interrupt
+            )
+        self.assertEqual(len(progress), 1)
+        self.assertFalse(FileUtil.does_file_exist(file_name=self.TEST_DATA_DIR_3 + '/index_map.pb'))
+
+        new_table = shared_proto_table_storage.resize_to_new_table(
+            new_size_per_shard=2,
+            new_dir_name=self.TEST_DATA_DIR_3,
+            progress_callback=lambda num_completed_shards, num_shards: progress.append(
+                (num_completed_shards, num_shards))
+        )
+        self.assertEqual(progress[-1], (5, 5))
+        self.assertEqual(new_table.get_num_entries(), 9)
+        self.assertEqual(new_table.get_num_shards(), 5)
+        self.assertDictEqual(new_table.read_all(), shared_proto_table_storage.read_all())
+        self.assertFalse(FileUtil.does_file_exist(
+            file_name=self.TEST_DATA_DIR_3 + '/' + ShardedProtoTableStorage.RESHARDING_CHECKPOINT_FILE))
+        gclient.rm_dir(self.TEST_DATA_DIR_3)
+
+    def test_resize_to_new_table_with_update(self):
+        gclient_ext.cp_folder(self.TEST_DATA_DIR_1, self.TEST_DATA_DIR_4)
+        shared_proto_table_storage = ShardedProtoTableStorage()
+        shared_proto_table_storage.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+        shared_proto_table_storage.set_config(config={'num_io_workers': 1})
+        updated_proto = NodeSnapshot()
+        updated_proto.CopyFrom(self.EXAMPLE_PROTO)
+        updated_proto.node_name = 'updated'
+
+        def update(num_completed_shards, num_shards):
+            if num_completed_shards == 1:
+                writer = ShardedProtoTableStorage()
+                writer.initialize_from_dir(dir_name=self.TEST_DATA_DIR_4)
+                writer.write(data={'test_0': updated_proto})
+
+        with self.assertRaises(StorageWriteException):
+            shared_proto_table_storage.resize_to_new_table(
+                new_size_per_shard=2,
+                new_dir_name=self.TEST_DATA_DIR_3,
+                progress_callback=update
+            )
+        self.assertFalse(FileUtil.does_file_exist(file_name=self.TEST_DATA_DIR_3 + '/index_map.pb'))
+
+        new_table = shared_proto_table_storage.resize_to_new_table(
+            new_size_per_shard=2,
+            new_dir_name=self.TEST_DATA_DIR_3
+        )
+        self.assertEqual(new_table.get_num_entries(), 9)
+        self.assertEqual(new_table.read(params={'key': 'test_0', 'message_type': NodeSnapshot}), updated_proto)
+        self.assertDictEqual(new_table.read_all(), shared_proto_table_storage.read_all())
         gclient.rm_dir(self.TEST_DATA_DIR_3)
+        gclient.rm_dir(self.TEST_DATA_DIR_4)
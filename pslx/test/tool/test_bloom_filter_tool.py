@@ -0,0 +1,24 @@
+import unittest
+from pslx.tool.bloom_filter_tool import BloomFilterTool
+
+
+class BloomFilterToolTest(unittest.TestCase):
+
+    def test_may_contain(self):
+        bloom_filter_tool = BloomFilterTool(capacity=1000, false_positive_rate=0.01)
+        for index in range(1000):
+            bloom_filter_tool.add(key='key_' + str(index))
+        self.assertEqual(bloom_filter_tool.get_num_keys(), 1000)
+        for index in range(1000):
+            self.assertTrue(bloom_filter_tool.may_contain(key='key_' + str(index)))
+        num_false_positives = sum(bloom_filter_tool.may_contain(key='other_key_' + str(index))
+                                  for index in range(10000))
+        self.assertLess(num_false_positives, 300)
+
+    def test_to_proto(self):
+        bloom_filter_tool = BloomFilterTool(capacity=10)
+        bloom_filter_tool.add(key='key_1')
+        new_bloom_filter_tool = BloomFilterTool.from_proto(bloom_filter=bloom_filter_tool.to_proto())
+        self.assertEqual(new_bloom_filter_tool.get_num_bits(), bloom_filter_tool.get_num_bits())
+        self.assertEqual(new_bloom_filter_tool.get_num_keys(), 1)
+        self.assertTrue(new_bloom_filter_tool.may_contain(key='key_1'))
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import threading
+import unittest
+from pslx.core.exception import FileLockToolException
+from pslx.tool.file_lock_tool import FileLockTool
+
+
+class FileLockToolTest(unittest.TestCase):
+
+    def test_acquire_and_release(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.pb')
+            FileLockTool.reset_lock_wait_stats()
+            with FileLockTool(protected_file_path=file_name) as file_lock:
+                self.assertEqual(file_lock.get_lock_file_name(), file_name + FileLockTool.LOCK_FILE_SUFFIX)
+                self.assertTrue(os.path.isfile(file_name + FileLockTool.LOCK_FILE_SUFFIX))
+                with FileLockTool(protected_file_path=file_name):
+                    pass
+            with FileLockTool(protected_file_path=file_name):
+                pass
+            self.assertEqual(FileLockTool.get_lock_wait_stats()[file_name + '.lock']['num_acquisitions'], 2)
+
+    def test_timeout(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.pb')
+            file_lock = FileLockTool(protected_file_path=file_name)
+            file_lock.acquire()
+            errors = []
+
+            def _acquire():
+                try:
+                    FileLockTool(protected_file_path=file_name, timeout=0.05).acquire()
+                except FileLockToolException as err:
+                    errors.append(err)
+
+            thread = threading.Thread(target=_acquire)
+            thread.start()
+            thread.join()
+            file_lock.release()
+            self.assertEqual(len(errors), 1)
+
+            other_file_lock = FileLockTool(protected_file_path=file_name, timeout=0.05)
+            other_file_lock.acquire()
+            other_file_lock.release()
@@ -1,6 +1,10 @@
 import datetime
+import os
+import tempfile
 import unittest
-from pslx.schema.enums_pb2 import ModeType
+from google.protobuf.internal import api_implementation
+from pslx.schema.enums_pb2 import CompressionType, ModeType
+from pslx.schema.snapshots_pb2 import NodeSnapshot
 from pslx.util.file_util import FileUtil
 
 
@@ -81,6 +85,52 @@ class FileUtilTest(unittest.TestCase):
         FileUtil.write_lined_txt_to_file(data=data, file_name=self.TEST_DATA_PATH_1)
         self.assertEqual(data, FileUtil.read_lined_txt_from_file(file_name=self.TEST_DATA_PATH_1))
 
+    def test_read_proto_from_local_file(self):
+        proto = NodeSnapshot()
+        proto.node_name = 'test'
+        proto.children_names.append('child_1')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.pb')
+            with open(file_name, 'wb') as outfile:
+                outfile.write(proto.SerializeToString())
+            self.assertEqual(proto, FileUtil.read_proto_from_local_file(
+                proto_type=NodeSnapshot, local_file_name=file_name))
+            open(file_name, 'wb').close()
+            self.assertEqual(NodeSnapshot(), FileUtil.read_proto_from_local_file(
+                proto_type=NodeSnapshot, local_file_name=file_name))
+
+    def test_read_proto_from_file(self):
+        self.assertEqual(FileUtil.is_mmap_read_enabled(), api_implementation.Type() != 'python')
+        proto = NodeSnapshot()
+        proto.node_name = 'test'
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.pb')
+            FileUtil.write_proto_to_file(proto=proto, file_name=file_name)
+            self.assertEqual(proto, FileUtil.read_proto_from_file(proto_type=NodeSnapshot, file_name=file_name))
+            FileUtil.write_proto_to_file(proto=proto, file_name=file_name, compression_type=CompressionType.ZLIB)
+            self.assertEqual(proto, FileUtil.read_proto_from_file(proto_type=NodeSnapshot, file_name=file_name))
+
+    def test_get_local_path(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            file_name = os.path.join(tmp_dir, 'test.pb')
+            self.assertEqual(FileUtil.get_local_path(path=file_name), file_name)
+            self.assertEqual(FileUtil.get_local_path(path=file_name, must_exist=True), '')
+            open(file_name, 'wb').close()
+            self.assertEqual(FileUtil.get_local_path(path=file_name, must_exist=True), file_name)
+            self.assertEqual(FileUtil.get_local_path(path=tmp_dir, must_exist=True), '')
+
+    def test_decompress_proto(self):
+        proto = NodeSnapshot()
+        proto.node_name = 'test'
+        proto.children_names.append('child_1')
+        self.assertEqual(proto, FileUtil.decompress_proto(proto=proto))
+        self.assertEqual(NodeSnapshot(), FileUtil.decompress_proto(proto=NodeSnapshot()))
+        for compression_type in [CompressionType.ZLIB, CompressionType.LZMA]:
+            compressed_proto = FileUtil.compress_proto(proto=proto, compression_type=compression_type)
+            parsed_proto = NodeSnapshot()
+            parsed_proto.ParseFromString(compressed_proto.SerializeToString())
+            self.assertEqual(proto, FileUtil.decompress_proto(proto=parsed_proto))
+
     def test_get_cell_from_path(self):
         path = '/galaxy/aa-d/test'
         self.assertEqual('aa', FileUtil.get_cell_from_path(path))
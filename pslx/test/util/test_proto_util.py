@@ -1,6 +1,7 @@
 import unittest
-from pslx.schema.enums_pb2 import ModeType
-from pslx.schema.snapshots_pb2 import NodeSnapshot
+from pslx.core.exception import ProtobufMessageTypeNotExistException, ProtobufNameNotExistException
+from pslx.schema.enums_pb2 import ModeType, Status
+from pslx.schema.snapshots_pb2 import NodeSnapshot, OperatorSnapshot
 from pslx.util.proto_util import ProtoUtil
 
 
@@ -52,6 +53,79 @@ class ProtoUtilTest(unittest.TestCase):
         message_type_str = 'NodeSnapshot'
         self.assertEqual(ProtoUtil.infer_message_type_from_str(message_type_str=message_type_str), NodeSnapshot)
 
+    def test_infer_message_type_from_full_name(self):
+        self.assertEqual(ProtoUtil.infer_message_type_from_full_name(full_name='pslx.NodeSnapshot'), NodeSnapshot)
+        with self.assertRaises(ProtobufMessageTypeNotExistException):
+            ProtoUtil.infer_message_type_from_full_name(full_name='pslx.NotExistSnapshot')
+
     def test_infer_str_from_message_type(self):
         message_type = NodeSnapshot
         self.assertEqual(ProtoUtil.infer_str_from_message_type(message_type=message_type), 'NodeSnapshot')
+
+    def test_any_messages_to_columns(self):
+        operator_snapshot = OperatorSnapshot()
+        operator_snapshot.operator_name = 'test'
+        operator_snapshot.status = Status.SUCCEEDED
+        operator_snapshot.node_snapshot.children_names.append('children1')
+        any_messages = {
+            'key_1': ProtoUtil.message_to_any(message=operator_snapshot),
+            'key_2': ProtoUtil.message_to_any(message=NodeSnapshot()),
+        }
+        columns = ProtoUtil.any_messages_to_columns(
+            message_type=OperatorSnapshot,
+            any_messages=any_messages,
+            fields=['operator_name', 'status', 'node_snapshot']
+        )
+        self.assertListEqual(list(columns['key']), ['key_1'])
+        self.assertListEqual(list(columns['operator_name']), ['test'])
+        self.assertEqual(str(columns['status'].dtype), 'int32')
+        self.assertListEqual(list(columns['status']), [Status.SUCCEEDED])
+        self.assertEqual(columns['node_snapshot'][0], operator_snapshot.node_snapshot)
+
+    def test_any_messages_to_columns_unset_fields(self):
+        operator_snapshot = OperatorSnapshot()
+        operator_snapshot.operator_name = 'test'
+        operator_snapshot.status = Status.SUCCEEDED
+        operator_snapshot.node_snapshot.children_names.append('children1')
+        node_snapshot = NodeSnapshot()
+        node_snapshot.node_name = 'test'
+        node_snapshot.children_names.extend(['children1', 'children2'])
+        any_messages = {
+            'key_1': ProtoUtil.message_to_any(message=operator_snapshot),
+            'key_2': ProtoUtil.message_to_any(message=OperatorSnapshot()),
+            'key_3': ProtoUtil.message_to_any(message=node_snapshot),
+        }
+        columns = ProtoUtil.any_messages_to_columns(
+            message_type=OperatorSnapshot,
+            any_messages=any_messages
+        )
+        self.assertListEqual(list(columns['key']), ['key_1', 'key_2'])
+        self.assertListEqual(list(columns['operator_name']), ['test', ''])
+        self.assertEqual(str(columns['status'].dtype), 'int32')
+        self.assertListEqual(list(columns['status']), [Status.SUCCEEDED, 0])
+        self.assertEqual(columns['node_snapshot'][0], operator_snapshot.node_snapshot)
+        self.assertEqual(columns['node_snapshot'][1], NodeSnapshot())
+        self.assertIsNot(columns['node_snapshot'][1], OperatorSnapshot().node_snapshot)
+
+        columns = ProtoUtil.any_messages_to_columns(
+            message_type=NodeSnapshot,
+            any_messages=any_messages,
+            fields=['node_name', 'children_names']
+        )
+        self.assertListEqual(list(columns['key']), ['key_3'])
+        self.assertListEqual(list(columns['node_name']), ['test'])
+        self.assertListEqual(columns['children_names'][0], ['children1', 'children2'])
+
+    def test_get_values_by_field_path(self):
+        operator_snapshot = OperatorSnapshot()
+        operator_snapshot.status = Status.SUCCEEDED
+        operator_snapshot.node_snapshot.node_name = 'test'
+        operator_snapshot.node_snapshot.children_names.extend(['children1', 'children2'])
+        self.assertListEqual(ProtoUtil.get_values_by_field_path(
+            proto_message=operator_snapshot, field_path='status'), [Status.SUCCEEDED])
+        self.assertListEqual(ProtoUtil.get_values_by_field_path(
+            proto_message=operator_snapshot, field_path='node_snapshot.node_name'), ['test'])
+        self.assertListEqual(ProtoUtil.get_values_by_field_path(
+            proto_message=operator_snapshot, field_path='node_snapshot.children_names'), ['children1', 'children2'])
+        with self.assertRaises(ProtobufNameNotExistException):
+            ProtoUtil.get_field_descriptor_by_path(message_type=OperatorSnapshot, field_path='node_snapshot.foo')
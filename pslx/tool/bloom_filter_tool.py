@@ -0,0 +1,58 @@
+import hashlib
+import math
+from pslx.core.base import Base
+from pslx.schema.storage_pb2 import BloomFilter
+
+
+class BloomFilterTool(Base):
+    def __init__(self, capacity, false_positive_rate=0.01):
+        super().__init__()
+        assert 0 < false_positive_rate < 1
+        capacity = max(1, int(capacity))
+        self._num_bits = max(8, int(math.ceil(-capacity * math.log(false_positive_rate) / (math.log(2) ** 2))))
+        self._num_hashes = max(1, int(round(self._num_bits / capacity * math.log(2))))
+        self._bits = bytearray((self._num_bits + 7) // 8)
+        self._num_keys = 0
+
+    def get_num_bits(self):
+        return self._num_bits
+
+    def get_num_hashes(self):
+        return self._num_hashes
+
+    def get_num_keys(self):
+        return self._num_keys
+
+    def _get_bit_positions(self, key):
+        digest = hashlib.md5(key.encode('utf-8')).digest()
+        first_hash = int.from_bytes(digest[:8], 'little')
+        second_hash = int.from_bytes(digest[8:], 'little') | 1
+        return [(first_hash + index * second_hash) % self._num_bits for index in range(self._num_hashes)]
+
+    def add(self, key):
+        for position in self._get_bit_positions(key=key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self._num_keys += 1
+
+    def may_contain(self, key):
+        for position in self._get_bit_positions(key=key):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def to_proto(self):
+        bloom_filter = BloomFilter()
+        bloom_filter.bits = bytes(self._bits)
+        bloom_filter.num_bits = self._num_bits
+        bloom_filter.num_hashes = self._num_hashes
+        bloom_filter.num_keys = self._num_keys
+        return bloom_filter
+
+    @classmethod
+    def from_proto(cls, bloom_filter):
+        bloom_filter_tool = cls(capacity=1)
+        bloom_filter_tool._num_bits = bloom_filter.num_bits
+        bloom_filter_tool._num_hashes = bloom_filter.num_hashes
+        bloom_filter_tool._num_keys = bloom_filter.num_keys
+        bloom_filter_tool._bits = bytearray(bloom_filter.bits)
+        return bloom_filter_tool
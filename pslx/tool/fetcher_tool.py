@@ -26,14 +26,15 @@ class PartitionerFetcher(Base):
                     base_name='data.pb'
                 )
             )
-            all_data = proto_table.read_all()
-            if all_data:
+            max_key = proto_table.get_max_key()
+            if max_key is not None:
                 self._logger.info("Successfully get the latest data in partition dir [" +
                                   self._partitioner.get_dir_name() + '].')
-                max_key = max(all_data.keys())
-                return ProtoUtil.any_to_message(
-                    message_type=self.MESSAGE_TYPE,
-                    any_message=all_data[max_key]
+                return proto_table.read(
+                    params={
+                        'key': max_key,
+                        'message_type': self.MESSAGE_TYPE,
+                    }
                 )
             else:
                 return None
@@ -55,14 +56,15 @@ class PartitionerFetcher(Base):
                     base_name='data.pb'
                 )
             )
-            all_data = proto_table.read_all()
-            if all_data:
+            min_key = proto_table.get_min_key()
+            if min_key is not None:
                 self._logger.info("Successfully get the oldest data in partition dir [" +
                                   self._partitioner.get_dir_name() + '].')
-                min_key = min(all_data.keys())
-                return ProtoUtil.any_to_message(
-                    message_type=self.MESSAGE_TYPE,
-                    any_message=all_data[min_key]
+                return proto_table.read(
+                    params={
+                        'key': min_key,
+                        'message_type': self.MESSAGE_TYPE,
+                    }
                 )
             else:
                 return None
@@ -73,29 +75,24 @@ class PartitionerFetcher(Base):
 
     def fetch_range(self, start_time, end_time):
         try:
-            data = self._partitioner.read_range(
+            start_key, end_key = str(start_time.replace(tzinfo=None)), str(end_time.replace(tzinfo=None))
+            data_content = {}
+            for _, val in self._partitioner.iter_range(
                 params={
                     'start_time': start_time,
                     'end_time': end_time,
                 }
-            )
-            start_time, end_time = str(start_time.replace(tzinfo=None)), str(end_time.replace(tzinfo=None))
-            data_content = {}
-            for val in data.values():
-                data_content.update(val)
-            result = {}
+            ):
+                data_content.update({key: any_message for key, any_message in val.items()
+                                     if start_key <= key <= end_key})
             self._logger.info("Successfully get the range data in partition dir [" +
                               self._partitioner.get_dir_name() + '].')
-            for key in sorted(data_content.keys()):
-                if key < start_time or key > end_time:
-                    continue
-                else:
-                    item = ProtoUtil.any_to_message(
-                        message_type=self.MESSAGE_TYPE,
-                        any_message=data_content[key]
-                    )
-                    result[key] = item
-            return result
+            return {
+                key: ProtoUtil.any_to_message(
+                    message_type=self.MESSAGE_TYPE,
+                    any_message=data_content[key]
+                ) for key in sorted(data_content.keys())
+            }
         except Exception as err:
             self._logger.error("Fetch range for partition [" + self._partitioner.get_dir_name() +
                                "] with error " + str(err) + '.')
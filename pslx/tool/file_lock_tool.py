@@ -0,0 +1,129 @@
+import fcntl
+import os
+import threading
+import time
+from collections import defaultdict
+from pslx.core.base import Base
+from pslx.core.exception import FileLockToolException
+from pslx.util.file_util import FileUtil
+
+
+class FileLockTool(Base):
+    LOCK_FILE_SUFFIX = '.lock'
+    _LOCK_WAIT_STATS = defaultdict(lambda: {
+        'num_acquisitions': 0,
+        'total_wait_time': 0.0,
+        'max_wait_time': 0.0,
+    })
+    _STATS_LOCK = threading.Lock()
+    _PROCESS_LOCKS = defaultdict(threading.Lock)
+    _THREAD_LOCAL = threading.local()
+
+    def __init__(self, protected_file_path, timeout=-1):
+        super().__init__()
+        protected_file_path = protected_file_path[:-1] if protected_file_path[-1] == '/' else protected_file_path
+        self._lock_file_name = protected_file_path + self.LOCK_FILE_SUFFIX
+        self._local_lock_file_name = FileUtil.get_local_path(path=self._lock_file_name)
+        self._timeout = timeout
+        self._lock_file = None
+        self._wait_time = 0.0
+
+    def get_lock_file_name(self):
+        return self._lock_file_name
+
+    def get_wait_time(self):
+        return self._wait_time
+
+    @classmethod
+    def _get_held_locks(cls):
+        if not hasattr(cls._THREAD_LOCAL, 'held_locks'):
+            cls._THREAD_LOCAL.held_locks = defaultdict(int)
+        return cls._THREAD_LOCAL.held_locks
+
+    def _try_lock(self):
+        if self._local_lock_file_name:
+            try:
+                fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except BlockingIOError as _:
+                return False
+        else:
+            return self._PROCESS_LOCKS[self._lock_file_name].acquire(blocking=False)
+
+    def _lock(self):
+        if self._local_lock_file_name:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            self._PROCESS_LOCKS[self._lock_file_name].acquire()
+
+    def acquire(self):
+        held_locks = self._get_held_locks()
+        if held_locks[self._lock_file_name] > 0:
+            held_locks[self._lock_file_name] += 1
+            return
+
+        if self._local_lock_file_name:
+            os.makedirs(os.path.dirname(self._local_lock_file_name), exist_ok=True)
+            self._lock_file = open(self._local_lock_file_name, 'a')
+        else:
+            self._SYS_LOGGER.warning("Lock file [" + self._lock_file_name + "] is not local, only locking within the "
+                                     "process.")
+
+        start_time = time.time()
+        if self._timeout < 0:
+            self._lock()
+        else:
+            while not self._try_lock():
+                if time.time() - start_time >= self._timeout:
+                    if self._lock_file:
+                        self._lock_file.close()
+                        self._lock_file = None
+                    self._SYS_LOGGER.error("Acquiring lock [" + self._lock_file_name + "] timed out after " +
+                                           str(self._timeout) + " seconds.")
+                    raise FileLockToolException("Acquiring lock [" + self._lock_file_name + "] timed out after " +
+                                                str(self._timeout) + " seconds.")
+                time.sleep(0.01)
+        self._wait_time = time.time() - start_time
+        held_locks[self._lock_file_name] = 1
+
+        with self._STATS_LOCK:
+            lock_wait_stats = self._LOCK_WAIT_STATS[self._lock_file_name]
+            lock_wait_stats['num_acquisitions'] += 1
+            lock_wait_stats['total_wait_time'] += self._wait_time
+            lock_wait_stats['max_wait_time'] = max(lock_wait_stats['max_wait_time'], self._wait_time)
+        self._SYS_LOGGER.info("Acquired lock [" + self._lock_file_name + "] after waiting " + str(self._wait_time) +
+                              " seconds.")
+
+    def release(self):
+        held_locks = self._get_held_locks()
+        if held_locks[self._lock_file_name] == 0:
+            return
+        held_locks[self._lock_file_name] -= 1
+        if held_locks[self._lock_file_name] > 0:
+            return
+
+        if self._local_lock_file_name:
+            fcntl.flock(self._lock_file.fileno(), fcntl.LOCK_UN)
+            self._lock_file.close()
+            self._lock_file = None
+        else:
+            self._PROCESS_LOCKS[self._lock_file_name].release()
+        self._SYS_LOGGER.info("Released lock [" + self._lock_file_name + '].')
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    @classmethod
+    def get_lock_wait_stats(cls):
+        with cls._STATS_LOCK:
+            return {lock_file_name: dict(lock_wait_stats)
+                    for lock_file_name, lock_wait_stats in cls._LOCK_WAIT_STATS.items()}
+
+    @classmethod
+    def reset_lock_wait_stats(cls):
+        with cls._STATS_LOCK:
+            cls._LOCK_WAIT_STATS.clear()
@@ -19,6 +19,7 @@ class EnvUtil(object):
         "PSLX_RPC_FLUSH_RATE": 1,
         'PSLX_RPC_PASSWORD': 'admin',
         'PSLX_BACKEND_CONTAINER_TTL': 7,
+        'PSLX_SNAPSHOT_COMPRESSION_TYPE': 'NO_COMPRESSION',
     }
 
     @classmethod
@@ -1,14 +1,23 @@
+import base64
 import datetime
 import glob
 import json
+import lzma
+import mmap
 import os
+import threading
+import zlib
 from galaxy_py import gclient, gclient_ext
-from pslx.core.exception import FileNotExistException, DirNotExistException
-from pslx.schema.enums_pb2 import ModeType
+from google.protobuf.internal import api_implementation
+from pslx.core.exception import FileNotExistException, DirNotExistException, ProtobufValueNotExistException
+from pslx.schema.enums_pb2 import CompressionType, ModeType
+from pslx.schema.storage_pb2 import CompressedProto
 from pslx.util.env_util import EnvUtil
 
 
 class FileUtil(object):
+    TEMP_FILE_SUFFIX = '.tmp'
+
     @classmethod
     def base_name(cls, file_name):
         return os.path.basename(file_name)
@@ -161,23 +170,130 @@ class FileUtil(object):
     def read(cls, file_name):
         return gclient_ext.read_txt(file_name)
 
+    @classmethod
+    def is_temp_file(cls, file_name):
+        return file_name.endswith(cls.TEMP_FILE_SUFFIX)
+
+    @classmethod
+    def _get_temp_file_name(cls, file_name):
+        return file_name + '.' + str(os.getpid()) + '-' + str(threading.get_ident()) + cls.TEMP_FILE_SUFFIX
+
+    @classmethod
+    def _replace_file(cls, from_path, to_path):
+        local_from_path, local_to_path = cls.get_local_path(path=from_path), cls.get_local_path(path=to_path)
+        if local_from_path and local_to_path:
+            os.replace(local_from_path, local_to_path)
+        else:
+            gclient.move_file(from_path, to_path)
+
     @classmethod
     def write(cls, file_name, data, mode='w'):
-        return gclient.write(file_name, data, mode)
+        if 'w' not in mode:
+            return gclient.write(file_name, data, mode)
+        # Readers never see a partially written file, since the file is only replaced after the write finishes.
+        temp_file_name = cls._get_temp_file_name(file_name=file_name)
+        result = gclient.write(temp_file_name, data, mode)
+        cls._replace_file(from_path=temp_file_name, to_path=file_name)
+        return result
+
+    @classmethod
+    def write_proto_to_file(cls, proto, file_name, compression_type=CompressionType.NO_COMPRESSION):
+        if compression_type != CompressionType.NO_COMPRESSION:
+            proto = cls.compress_proto(proto=proto, compression_type=compression_type)
+        temp_file_name = cls._get_temp_file_name(file_name=file_name)
+        gclient_ext.write_proto_message(path=temp_file_name, data=proto)
+        cls._replace_file(from_path=temp_file_name, to_path=file_name)
 
     @classmethod
-    def write_proto_to_file(cls, proto, file_name):
-        gclient_ext.write_proto_message(path=file_name, data=proto)
+    def is_mmap_read_enabled(cls):
+        # The pure python backend copies the mapped buffer before parsing, so the memory map only helps the compiled
+        # backends.
+        return api_implementation.Type() != 'python'
 
     @classmethod
     def read_proto_from_file(cls, proto_type, file_name):
+        if cls.is_mmap_read_enabled():
+            local_file_name = cls.get_local_path(path=file_name, must_exist=True)
+            if local_file_name:
+                return cls.read_proto_from_local_file(proto_type=proto_type, local_file_name=local_file_name)
         proto = gclient_ext.read_proto_message(path=file_name, message_type=proto_type)
-        return proto
+        return cls.decompress_proto(proto=proto)
+
+    @classmethod
+    def read_protos_from_files(cls, proto_type, file_names):
+        proto_map = gclient_ext.read_proto_messages(paths=file_names, message_type=proto_type)
+        return {file_name: cls.decompress_proto(proto=proto) for file_name, proto in proto_map.items()}
+
+    @classmethod
+    def compress_proto(cls, proto, compression_type):
+        compressed_proto = CompressedProto()
+        compressed_proto.compression_type = compression_type
+        if compression_type == CompressionType.ZLIB:
+            compressed_proto.compressed_data = zlib.compress(proto.SerializeToString())
+        elif compression_type == CompressionType.LZMA:
+            compressed_proto.compressed_data = lzma.compress(proto.SerializeToString())
+        else:
+            raise ProtobufValueNotExistException("Unsupported compression type [" + str(compression_type) + '].')
+        return compressed_proto
+
+    @classmethod
+    def decompress_proto(cls, proto):
+        if proto is None or proto.ListFields() or proto.ByteSize() == 0:
+            return proto
+        compressed_proto = CompressedProto()
+        compressed_proto.ParseFromString(proto.SerializeToString())
+        if compressed_proto.compression_type == CompressionType.ZLIB:
+            serialized_proto = zlib.decompress(compressed_proto.compressed_data)
+        elif compressed_proto.compression_type == CompressionType.LZMA:
+            serialized_proto = lzma.decompress(compressed_proto.compressed_data)
+        else:
+            return proto
+        decompressed_proto = type(proto)()
+        decompressed_proto.ParseFromString(serialized_proto)
+        return decompressed_proto
+
+    @classmethod
+    def read_proto_from_local_file(cls, proto_type, local_file_name):
+        proto = proto_type()
+        with open(local_file_name, 'rb') as infile:
+            if os.fstat(infile.fileno()).st_size == 0:
+                return proto
+            with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+                with memoryview(mapped_file) as buffer:
+                    proto.ParseFromString(buffer)
+        return cls.decompress_proto(proto=proto)
+
+    @classmethod
+    def append_delimited_protos_to_file(cls, protos, file_name):
+        data = ''
+        for proto in protos:
+            serialized_proto = proto.SerializeToString()
+            data += str(len(serialized_proto)) + ' ' + base64.b64encode(serialized_proto).decode('ascii') + '\n'
+        gclient.write(path=file_name, data=data, mode='a')
+
+    @classmethod
+    def read_delimited_protos_from_file(cls, proto_type, file_name):
+        data = gclient_ext.read_txt(path=file_name)
+        protos = []
+        if not data:
+            return protos
+        for line in data.split('\n'):
+            try:
+                size, encoded_proto = line.split(' ')
+                serialized_proto = base64.b64decode(encoded_proto.encode('ascii'), validate=True)
+                if len(serialized_proto) != int(size):
+                    break
+                proto = proto_type()
+                proto.ParseFromString(serialized_proto)
+                protos.append(proto)
+            except Exception as _:
+                break
+        return protos
 
     @classmethod
     def write_json_to_file(cls, json_obj, file_name):
         data = json.dumps(json_obj, indent=2)
-        gclient.write(path=file_name, data=data)
+        cls.write(file_name=file_name, data=data)
 
     @classmethod
     def read_json_from_file(cls, file_name):
@@ -194,7 +310,7 @@ class FileUtil(object):
 
     @classmethod
     def write_lined_txt_to_file(cls, data, file_name):
-        gclient.write(path=file_name, data='\n'.join(data))
+        cls.write(file_name=file_name, data='\n'.join(data))
 
     @classmethod
     def parse_timestamp_to_dir(cls, timestamp):
@@ -250,6 +366,20 @@ class FileUtil(object):
         except Exception as _:
             return ''
 
+    @classmethod
+    def get_local_path(cls, path, must_exist=False):
+        this_cell = EnvUtil.get_other_env_variable(var='GALAXY_fs_cell')
+        cell_path = cls.convert_local_to_cell_path(path=path, cell=this_cell)
+        if '/galaxy/' not in cell_path:
+            local_path = '' if '/LOCAL' in cell_path else cell_path
+        elif not this_cell or cls.get_cell_from_path(path=cell_path) != this_cell:
+            local_path = ''
+        else:
+            local_path = cls.convert_cell_to_local_path(path=cell_path, cell=this_cell)
+        if local_path and must_exist and not os.path.isfile(local_path):
+            return ''
+        return local_path
+
     @classmethod
     def get_file_attr(cls, file_name):
         attr = gclient.get_attr(file_name)
@@ -1,4 +1,6 @@
+from google.protobuf import descriptor_pool, message_factory, symbol_database
 from google.protobuf.any_pb2 import Any
+from google.protobuf.descriptor import FieldDescriptor
 import google.protobuf.text_format as text_format
 import google.protobuf.json_format as json_format
 import importlib
@@ -133,6 +135,111 @@ class ProtoUtil(object):
         else:
             return None
 
+    @classmethod
+    def get_column_dtype(cls, field_descriptor):
+        if field_descriptor.label == FieldDescriptor.LABEL_REPEATED:
+            return object
+        cpp_type_to_dtype_map = {
+            FieldDescriptor.CPPTYPE_INT32: 'int32',
+            FieldDescriptor.CPPTYPE_INT64: 'int64',
+            FieldDescriptor.CPPTYPE_UINT32: 'uint32',
+            FieldDescriptor.CPPTYPE_UINT64: 'uint64',
+            FieldDescriptor.CPPTYPE_FLOAT: 'float32',
+            FieldDescriptor.CPPTYPE_DOUBLE: 'float64',
+            FieldDescriptor.CPPTYPE_BOOL: 'bool',
+            FieldDescriptor.CPPTYPE_ENUM: 'int32',
+        }
+        return cpp_type_to_dtype_map.get(field_descriptor.cpp_type, object)
+
+    @classmethod
+    def any_messages_to_columns(cls, message_type, any_messages, fields=None):
+        import numpy as np
+
+        fields_by_name = message_type.DESCRIPTOR.fields_by_name
+        if fields is None:
+            fields = [field.name for field in message_type.DESCRIPTOR.fields]
+        for field in fields:
+            if field not in fields_by_name:
+                raise ProtobufNameNotExistException(field + " is not a field of " + message_type.DESCRIPTOR.full_name)
+
+        # Each value is decoded once, and the fields set in it are collected into per-field lists of rows and values.
+        # The rows where a field is not set keep the default value of the column.
+        number_to_rows_and_values = {fields_by_name[field].number: ([], []) for field in fields}
+        number_to_appends = {number: (rows.append, values.append)
+                             for number, (rows, values) in number_to_rows_and_values.items()}
+        type_url_suffix = '/' + message_type.DESCRIPTOR.full_name
+        keys = []
+        for key, any_message in any_messages.items():
+            if not any_message.type_url.endswith(type_url_suffix):
+                continue
+            proto_message = message_type()
+            proto_message.ParseFromString(any_message.value)
+            row = len(keys)
+            keys.append(key)
+            for field_descriptor, value in proto_message.ListFields():
+                appends = number_to_appends.get(field_descriptor.number, None)
+                if appends is not None:
+                    appends[0](row)
+                    appends[1](value)
+
+        num_rows = len(keys)
+        columns = {'key': np.array(keys, dtype=object)}
+        for field in fields:
+            field_descriptor = fields_by_name[field]
+            rows, values = number_to_rows_and_values[field_descriptor.number]
+            dtype = cls.get_column_dtype(field_descriptor=field_descriptor)
+            if dtype is not object:
+                column = np.full(num_rows, field_descriptor.default_value, dtype=dtype)
+                if rows:
+                    column[np.array(rows, dtype=np.int64)] = np.array(values, dtype=dtype)
+                columns[field] = column
+                continue
+
+            column = np.empty(num_rows, dtype=object)
+            if field_descriptor.message_type and field_descriptor.message_type.GetOptions().map_entry:
+                to_value, default_value = dict, dict
+            elif field_descriptor.label == FieldDescriptor.LABEL_REPEATED:
+                to_value, default_value = list, list
+            elif field_descriptor.message_type:
+                to_value, default_value = None, type(getattr(message_type(), field))
+            else:
+                to_value, default_value = None, None
+                column.fill(field_descriptor.default_value)
+            if default_value is not None:
+                is_set = np.zeros(num_rows, dtype=bool)
+                is_set[rows] = True
+                for row in np.flatnonzero(~is_set):
+                    column[row] = default_value()
+            for row, value in zip(rows, values):
+                column[row] = to_value(value) if to_value else value
+            columns[field] = column
+        return columns
+
+    @classmethod
+    def get_field_descriptor_by_path(cls, message_type, field_path):
+        descriptor = message_type.DESCRIPTOR
+        field_names = field_path.split('.')
+        for index, field_name in enumerate(field_names):
+            field_descriptor = descriptor.fields_by_name.get(field_name, None)
+            is_last_field = index == len(field_names) - 1
+            if field_descriptor is None or (not is_last_field and (
+                    field_descriptor.message_type is None or field_descriptor.label == FieldDescriptor.LABEL_REPEATED)):
+                raise ProtobufNameNotExistException(field_path + " is not a field of " +
+                                                    message_type.DESCRIPTOR.full_name)
+            if not is_last_field:
+                descriptor = field_descriptor.message_type
+        return field_descriptor
+
+    @classmethod
+    def get_values_by_field_path(cls, proto_message, field_path):
+        field_descriptor = cls.get_field_descriptor_by_path(message_type=type(proto_message), field_path=field_path)
+        value = proto_message
+        for field_name in field_path.split('.'):
+            value = getattr(value, field_name)
+        if field_descriptor.label == FieldDescriptor.LABEL_REPEATED:
+            return list(value)
+        return [value]
+
     @classmethod
     def infer_message_type_from_str(cls, message_type_str, modules=None):
         if not modules:
@@ -148,6 +255,26 @@ class ProtoUtil(object):
                 pass
         raise ProtobufMessageTypeNotExistException
 
+    @classmethod
+    def infer_message_type_from_full_name(cls, full_name, modules=None):
+        if not modules:
+            modules = cls.MESSAGE_MODULE
+        elif not isinstance(modules, list):
+            modules = [modules]
+        try:
+            descriptor = descriptor_pool.Default().FindMessageTypeByName(full_name)
+        except KeyError as _:
+            # The message type is registered once its module is imported.
+            for module_name in modules:
+                importlib.import_module(module_name)
+            try:
+                descriptor = descriptor_pool.Default().FindMessageTypeByName(full_name)
+            except KeyError as _:
+                raise ProtobufMessageTypeNotExistException
+        if hasattr(message_factory, 'GetMessageClass'):
+            return message_factory.GetMessageClass(descriptor)
+        return symbol_database.Default().GetPrototype(descriptor)
+
     @classmethod
     def infer_str_from_message_type(cls, message_type):
         return message_type.__name__